@@ -0,0 +1,129 @@
+# coding='utf-8'
+
+"""
+Unique-anchor pre-alignment
+Witnesses of the same volume are almost identical over long stretches. Syllable n-grams
+occurring exactly once in each text are used as anchors and the longest chain of anchors in
+increasing order in both texts is kept, patience diff style. DMP then only runs on the gaps
+between anchors, which keeps its near-quadratic cost local even with Diff_Timeout = 0.
+"""
+import re
+from bisect import bisect_left
+
+from diff_match_patch import diff_match_patch
+
+TOKEN_PATTERN = re.compile("[^་། \n]+[་། \n]*|[་། \n]+")
+NGRAM_SIZE = 4
+
+
+def get_ngrams(text, n=NGRAM_SIZE):
+    """Collect the syllable n-grams of text with their character spans.
+
+    Args:
+        text (str): text to tokenize
+        n (int): number of syllables per n-gram
+
+    Returns:
+        dict: n-gram mapped to its (start, end) span or None if it occurs more than once
+    """
+    starts = [token.start() for token in TOKEN_PATTERN.finditer(text)]
+    starts.append(len(text))
+    ngrams = {}
+    for i in range(len(starts) - n):
+        start, end = starts[i], starts[i + n]
+        ngram = text[start:end]
+        ngrams[ngram] = None if ngram in ngrams else (start, end)
+    return ngrams
+
+
+def longest_increasing_chain(matches):
+    """Keep the longest chain of matches increasing in both texts.
+
+    Args:
+        matches (list): (text1 span, text2 span) sorted by text1 span
+
+    Returns:
+        list: longest subsequence of matches whose text2 spans are increasing
+    """
+    tails = []  # text2 start of the smallest tail of each chain length
+    tail_ids = []
+    parents = []
+    for i, (_, span2) in enumerate(matches):
+        length = bisect_left(tails, span2[0])
+        if length == len(tails):
+            tails.append(span2[0])
+            tail_ids.append(i)
+        else:
+            tails[length] = span2[0]
+            tail_ids[length] = i
+        parents.append(tail_ids[length - 1] if length else -1)
+    chain = []
+    walker = tail_ids[-1] if tail_ids else -1
+    while walker != -1:
+        chain.append(matches[walker])
+        walker = parents[walker]
+    return chain[::-1]
+
+
+def get_anchors(text1, text2, n=NGRAM_SIZE, ngrams1=None):
+    """Compute the equal regions of text1 and text2 anchored on unique syllable n-grams.
+
+    Args:
+        text1 (str): source text
+        text2 (str): target text
+        n (int): number of syllables per n-gram
+        ngrams1 (dict): n-grams of text1 computed beforehand by get_ngrams, to reuse them
+            when text1 is aligned with many texts
+
+    Returns:
+        list: non overlapping equal regions as (text1 start, text2 start, length)
+    """
+    if ngrams1 is None:
+        ngrams1 = get_ngrams(text1, n)
+    ngrams2 = get_ngrams(text2, n)
+    matches = []
+    for ngram, span1 in ngrams1.items():
+        span2 = ngrams2.get(ngram)
+        if span1 and span2:
+            matches.append((span1, span2))
+    matches.sort()
+
+    regions = []
+    for (start1, end1), (start2, end2) in longest_increasing_chain(matches):
+        if regions:
+            prev1, prev2, length = regions[-1]
+            if start1 - prev1 == start2 - prev2 and start1 <= prev1 + length:
+                regions[-1] = (prev1, prev2, end1 - prev1)  # same diagonal, extend the region
+                continue
+            if start1 < prev1 + length or start2 < prev2 + length:
+                continue  # overlaps the previous region on another diagonal
+        regions.append((start1, start2, end1 - start1))
+    return regions
+
+
+class anchored_diff_match_patch:
+    def __init__(self, gap_dmp=None):
+        if gap_dmp is None:
+            gap_dmp = diff_match_patch()
+            gap_dmp.Diff_Timeout = 0  # compute diff till end of file
+        self.gap_dmp = gap_dmp
+        self.dmp = diff_match_patch()
+
+    def diff_main(self, text1, text2, ngrams1=None):
+        diffs = []
+        walker1 = walker2 = 0
+        for start1, start2, length in get_anchors(text1, text2, ngrams1=ngrams1) + [(len(text1), len(text2), 0)]:
+            gap1 = text1[walker1:start1]
+            gap2 = text2[walker2:start2]
+            if gap1 and gap2:
+                diffs += list(self.gap_dmp.diff_main(gap1, gap2))
+            elif gap1:
+                diffs.append((-1, gap1))
+            elif gap2:
+                diffs.append((1, gap2))
+            if length:
+                diffs.append((0, text1[start1 : start1 + length]))
+            walker1 = start1 + length
+            walker2 = start2 + length
+        self.dmp.diff_cleanupMerge(diffs)
+        return diffs
@@ -1,25 +1,40 @@
+import os
 import re
+from concurrent.futures import ProcessPoolExecutor, as_completed
 from pathlib import Path
 import yaml
 from diff_match_patch import diff_match_patch
+
+from anchor_alignment import anchored_diff_match_patch, get_ngrams
+from diff_compose import get_transfer_diffs_path
+from diff_store import to_diff_store
 #from horology import timed
 
 tofu_lower_limit = 200000
 tofu_upper_limit = 1112064
+# tofu-IDs are limited to 1114111
+TOFU_PATTERN = re.compile(f"([{chr(tofu_lower_limit)}-{chr(tofu_upper_limit)}])")
+# first char of a pattern made of plain groups: an escaped symbol or newline, or a literal char
+LITERAL_START_PATTERN = re.compile(r"\(*(\\[^\w]|\\n|[^\\.^$*+?{}\[\]|()])(?![*?{])")
+OPTIONAL_GROUP_PATTERN = re.compile(r"\)[*?{]")
 
 #@timed(unit="min")
-def get_diffs(A, B):
+def get_diffs(A, B, ngrams=None):
     """Compute diff between source and target with DMP.
     Args:
         source (str): source text
         target (str): target text
+        ngrams (dict): syllable n-grams of source, DMP then only runs between their anchors
     Returns:
         list: list of diffs
     """
     print("Diff computation started...")
-    dmp = diff_match_patch()
-    dmp.Diff_Timeout = 0  # compute diff till end of file
-    diffs = dmp.diff_main(A, B)
+    if ngrams is None:
+        dmp = diff_match_patch()
+        dmp.Diff_Timeout = 0  # compute diff till end of file
+        diffs = dmp.diff_main(A, B)
+    else:
+        diffs = anchored_diff_match_patch().diff_main(A, B, ngrams1=ngrams)
     diffs_list = list(map(list, diffs))
     print("Diff computation completed")
     return diffs_list
@@ -51,54 +66,196 @@ def from_yaml(path):
 
 #@timed(unit="min")
 def to_text(diffs):
-    result = ""
-    for diff in diffs:
-        if diff[0] != -1:
-            result += diff[1]
+    result = "".join(diff[1] for diff in diffs if diff[0] != -1)
     return result
 
 
+def get_start_lookahead(patterns):
+    """Return a lookahead on the first chars of the patterns, to skip the positions none can match at.
+
+    re tries every branch of an alternation at every position. Only patterns starting with a
+    required literal char are handled: any alternation, optional group or other start gives
+    no lookahead.
+
+    Args:
+        patterns (list): regex patterns
+    Returns:
+        str: lookahead to prepend to the alternation, empty if a pattern can start with any char
+    """
+    chars = set()
+    for pattern in patterns:
+        start = LITERAL_START_PATTERN.match(pattern)
+        if start is None or "|" in pattern or OPTIONAL_GROUP_PATTERN.search(pattern):
+            return ""
+        char = start.group(1)
+        chars.add("\n" if char == "\\n" else char[-1])
+    return f"(?=[{''.join(re.escape(char) for char in sorted(chars))}])"
+
+
 def tag_to_tofu(content, annotations):
+    """Replace the annotations of content by tofu-IDs in a single scan.
+
+    The annotation patterns are combined in one alternation, so they are expected not to
+    overlap, as line breaks and page markers. The groups of a match are kept, each one as a
+    tofu-ID if it matches the pattern again, the rest of the match is deleted.
+
+    Args:
+        content (str): annotated text
+        annotations (list): ['annotation type', 'regex'] or a list of them
+
+    Returns:
+        str: content with tofu-IDs
+        list: (annotation type, annotation) of each tofu-ID, indexed by tofu-ID - tofu_lower_limit
+    """
     print("Mapping annotations to tofu-IDs")
-    new_content = content
     #  support
     if isinstance(annotations[0], str):
         annotations = [annotations]
 
-    tofu_mapping = {}
-    tofu_walker = 0
+    patterns = [annotation[1] for annotation in annotations]
+    alternation = "|".join(f"({pattern})" for pattern in patterns)
+    scanner = re.compile(f"{get_start_lookahead(patterns)}(?:{alternation})")
+    # group of each annotation in the scanner, followed by the groups of its pattern
+    annotation_groups = []
+    group = 0
     for annotation in annotations:
-        split_list = re.split(annotation[1], new_content)
-        for i, e in enumerate(split_list):
-            if re.search(annotation[1], e):
-                tofu = chr(tofu_walker + tofu_lower_limit)
-                tofu_walker += 1
-                tofu_mapping[tofu] = [annotation[0], e]
-                split_list[i] = tofu
-        new_content = "".join(split_list)
+        pattern = re.compile(annotation[1])
+        annotation_groups.append((annotation[0], pattern, group, group + 1 + pattern.groups))
+        group += pattern.groups + 1
+
+    # the split alternates text and the scanner.groups groups of each match
+    split_list = scanner.split(content)
+    parts = [split_list[0]]
+    tofu_mapping = []
+    for i in range(1, len(split_list), scanner.groups + 1):
+        for tag, pattern, start, end in annotation_groups:
+            if split_list[i + start] is not None:
+                break
+        for value in split_list[i + start + 1 : i + end]:
+            if value is None:
+                continue
+            if pattern.search(value):
+                parts.append(chr(len(tofu_mapping) + tofu_lower_limit))
+                tofu_mapping.append((tag, value))
+            else:
+                parts.append(value)
+        parts.append(split_list[i + scanner.groups])
+    new_content = "".join(parts)
     return new_content, tofu_mapping
 
 
-def filter_diff(diffs_list, tofu_mapping):
+def filter_diff(diffs_list, tofu_mapping, keep_source=False):
+    """Replace the tofu-IDs of the diffs by their annotation, tagged with its type.
+
+    Args:
+        diffs_list (list): diffs of the source with tofu-IDs and the target
+        tofu_mapping (list): (annotation type, annotation) of each tofu-ID
+        keep_source (bool): keep the source text without annotations found only in the
+            source, so that the diffs still align the source with the target
+
+    Returns:
+        list: [type, text, tag] diffs, transfered annotations are equalities with their tag
+    """
     print("Transfering annotations...")
     result = []
-    for i, (diff_type, diff_text) in enumerate(diffs_list):
+    for diff_type, diff_text in diffs_list:
         if diff_type == 0 or diff_type == 1:
             result.append([diff_type, diff_text, ""])
         elif diff_type == -1:
-            # tofu-IDs are limited to 1114111
-            if re.search(f"[{chr(tofu_lower_limit)}-{chr(tofu_upper_limit)}]", diff_text):
-                anns = re.split(f"([{chr(tofu_lower_limit)}-{chr(tofu_upper_limit)}])", diff_text)
-                for ann in anns:
-                    if ann:
-                        if tofu_mapping.get(ann):
-                            tag, value = tofu_mapping.get(ann)
-                            result.append([0, value, tag])
-                        else:
-                            result.append([-1, ann, ""])
+            anns = TOFU_PATTERN.split(diff_text)
+            if len(anns) == 1:
+                if keep_source:
+                    result.append([-1, diff_text, ""])
+                continue
+            for ann in anns:
+                if ann:
+                    tofu_id = ord(ann) - tofu_lower_limit if len(ann) == 1 else -1
+                    if 0 <= tofu_id < len(tofu_mapping):
+                        tag, value = tofu_mapping[tofu_id]
+                        result.append([0, value, tag])
+                    else:
+                        result.append([-1, ann, ""])
+    return result
+
+
+def format_output(filterred_diff, output="diff"):
+    """Return the transfered diff as a diff list, yaml or the annotated target text."""
+    if output == "diff":
+        result = filterred_diff
+    elif output == "yaml":
+        result = to_yaml(filterred_diff)
+    elif output == "txt":
+        result = to_text(filterred_diff)
     return result
 
 
+class PreparedSource:
+    """Source text tokenized once to transfer its annotations to many targets.
+
+    Args:
+        source (str): text version containing the annotations to transfer
+        patterns (list): ['annotation type', '(regex to detect the annotations)']
+        anchored (bool): index the syllable n-grams of the source so that the diff with each
+            target only runs between unique anchors, see anchor_alignment
+    """
+
+    def __init__(self, source, patterns, anchored=False):
+        self.tofu_text, self.tofu_mapping = tag_to_tofu(source, patterns)
+        self.ngrams = get_ngrams(self.tofu_text) if anchored else None
+
+    def transfer(self, target, output="diff"):
+        """Transfer the annotations of the source to target, see transfer."""
+        diffs = get_diffs(self.tofu_text, target, self.ngrams)
+        filterred_diff = filter_diff(diffs, self.tofu_mapping)
+        return format_output(filterred_diff, output)
+
+
+# source prepared once in each worker process of transfer_many
+_prepared_source = None
+
+
+def _init_worker(prepared_source):
+    global _prepared_source
+    _prepared_source = prepared_source
+
+
+def _transfer_worker(target, output):
+    return _prepared_source.transfer(target, output)
+
+
+def transfer_many(source, patterns, targets, output="diff", n_workers=None, anchored=False):
+    """Transfer the annotations of one source to many targets concurrently.
+
+    The source is tokenized once and sent once to each worker process.
+
+    Args:
+        source (str or PreparedSource): text version containing the annotations to transfer
+        patterns (list): ['annotation type', '(regex to detect the annotations)'], unused if
+            source is already prepared
+        targets (dict or list): texts receiving the annotations, by name or in a list
+        output (str): "diff", "yaml" or "txt", see transfer
+        n_workers (int): number of worker processes, defaults to the number of cpus
+        anchored (bool): anchor the diffs on the syllable n-grams of the source
+
+    Yields:
+        (tuple): target name or index and its output, as soon as each target is done
+    """
+    if not isinstance(source, PreparedSource):
+        source = PreparedSource(source, patterns, anchored)
+    if not isinstance(targets, dict):
+        targets = dict(enumerate(targets))
+    n_workers = min(n_workers or os.cpu_count() or 1, len(targets))
+    if n_workers <= 1:
+        for name, target in targets.items():
+            yield name, source.transfer(target, output)
+        return
+    print(f"[INFO] Transfering to {len(targets)} targets on {n_workers} workers ...")
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(source,)) as executor:
+        futures = {executor.submit(_transfer_worker, target, output): name for name, target in targets.items()}
+        for future in as_completed(futures):
+            yield futures[future], future.result()
+
+
 #@timed(unit="min")
 def transfer(source, patterns, target, output="diff"):
     """Extract annotations from with regex patterns and transfer to target
@@ -118,18 +275,26 @@ def transfer(source, patterns, target, output="diff"):
 
     print(f"Annotation transfer started...")
 
-    tofu_source, tofu_mapping = tag_to_tofu(source, patterns)
-    diffs = get_diffs(tofu_source, target)
+    return PreparedSource(source, patterns).transfer(target, output)
 
-    filterred_diff = filter_diff(diffs, tofu_mapping)
 
-    if output == "diff":
-        result = filterred_diff
-    elif output == "yaml":
-        result = to_yaml(filterred_diff)
-    elif output == "txt":
-        result = to_text(filterred_diff)
-    return result
+def transfer_to_file(source, patterns, target, out_path):
+    """Write the target with the transfered annotations, and the transfer diff next to it.
+
+    The stored diff aligns both the source and the target with the transfered text, so their
+    offsets are mapped to the transfered text without diffing again, see diff_compose.
+
+    Args:
+        source (str): text version containing the annotations to transfer
+        patterns (list): ['annotation type', '(regex to detect the annotations)']
+        target (str): text that will receive the transfered annotations
+        out_path (path): path of the transfered text
+    """
+    prepared = PreparedSource(source, patterns)
+    diffs = get_diffs(prepared.tofu_text, target)
+    transfer_diffs = filter_diff(diffs, prepared.tofu_mapping, keep_source=True)
+    out_path.write_text(to_text(transfer_diffs), encoding="utf-8")
+    to_diff_store(transfer_diffs, get_transfer_diffs_path(out_path))
 
 
 if __name__ == "__main__":
@@ -181,6 +346,5 @@ if __name__ == "__main__":
         encoding="utf-8"
     ).replace('\n', '')
     
-    annotated = transfer(source, annotation_patterns, target, "txt")
-    Path("annotated.txt").write_text(annotated, encoding="utf-8")
+    transfer_to_file(source, annotation_patterns, target, Path("annotated.txt"))
 
@@ -0,0 +1,177 @@
+# coding='utf-8'
+
+"""
+Multi-volume batch reconstruction
+Runs the body and footnotes flows of many volumes at the same time in a process pool. A
+flow is only started when the memory it is expected to need is available, and the merge
+of a volume is started as soon as both of its halves are done.
+"""
+import argparse
+import os
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from pathlib import Path
+
+import yaml
+
+from reconstruction import flow, get_text_paths, merge_volume
+from utils import set_dmp_workers
+
+DATA_DIR = Path("./data")
+TEXT_TYPES = ["body", "footnotes"]
+FLOW_BASE_MEMORY = 100 * 1024 ** 2  # 100 MB, interpreter and modules
+FLOW_MEMORY_FACTOR = 20  # bytes of memory per byte of input text
+MERGE_MEMORY = 200 * 1024 ** 2  # 200 MB
+
+
+def get_available_memory():
+    """Return the memory available for new processes in bytes, None if unknown."""
+    try:
+        with open("/proc/meminfo") as meminfo:
+            for line in meminfo:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    try:
+        return os.sysconf("SC_PAGE_SIZE") * os.sysconf("SC_AVPHYS_PAGES")
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def estimate_flow_memory(namsel_text_path, google_text_path):
+    """Estimate the peak memory of a flow from the size of its input texts.
+
+    Args:
+        namsel_text_path (path): namsel text path
+        google_text_path (path): google text path
+    Returns:
+        int: expected peak memory in bytes
+    """
+    input_size = namsel_text_path.stat().st_size + google_text_path.stat().st_size
+    return FLOW_BASE_MEMORY + FLOW_MEMORY_FACTOR * input_size
+
+
+def run_flow(base_path, text_type, image_info, backend=None, store=None):
+    """Run the flow of one volume part in a worker process."""
+    from diff_cache import DiffCache
+
+    namsel_text_path, google_text_path = get_text_paths(base_path, image_info[1], text_type)
+    flow(
+        base_path, namsel_text_path, google_text_path, text_type, image_info, backend=backend, cache=DiffCache(), store=store
+    )
+    return text_type
+
+
+def run_batch(work_id, vol_offsets, data_dir=DATA_DIR, max_workers=None, max_memory=None, backend=None, store=None):
+    """Reconstruct many volumes, running their body and footnotes flows concurrently.
+
+    Args:
+        work_id (str): kangyur W1PD96682 or tengyur W1PD95844
+        vol_offsets (dict): volume number mapped to its image source offset
+        data_dir (path): directory holding one v<vol_num:03> directory per volume
+        max_workers (int): number of processes, defaults to the number of cpus
+        max_memory (int): memory budget in bytes, defaults to the available memory
+        backend (str): body diff backend, see utils.get_dmp
+        store (path): sqlite database every volume is also written to, see volume_store
+    Returns:
+        dict: volume number mapped to "merged", "incomplete" or the errors of the failing steps
+    """
+    max_workers = max_workers or os.cpu_count() or 1
+    if max_memory is None:
+        max_memory = get_available_memory() or max_workers * FLOW_BASE_MEMORY
+    pending = []
+    status = {}
+    errors = {}
+    parts_done = {}
+    for vol_num, offset in sorted(vol_offsets.items()):
+        base_path = Path(data_dir) / f"v{vol_num:03}"
+        image_info = [work_id, vol_num, offset]
+        parts_done[vol_num] = set()
+        errors[vol_num] = []
+        jobs = []
+        missing = []
+        for text_type in TEXT_TYPES:
+            namsel_text_path, google_text_path = get_text_paths(base_path, vol_num, text_type)
+            if not (namsel_text_path.is_file() and google_text_path.is_file()):
+                missing.append(text_type)
+                continue
+            memory = estimate_flow_memory(namsel_text_path, google_text_path)
+            jobs.append((memory, run_flow, (base_path, text_type, image_info, backend, store), vol_num))
+        if missing:
+            # a volume is only merged with both parts, so none of them is run
+            status[vol_num] = f"{' and '.join(missing)} input texts not found"
+            print(f"[ERROR] Volume {vol_num} {status[vol_num]}")
+            continue
+        pending.extend(jobs)
+
+    running = {}
+    used_memory = 0
+    dmp_workers = max(1, (os.cpu_count() or 1) // max_workers)
+    with ProcessPoolExecutor(max_workers=max_workers, initializer=set_dmp_workers, initargs=(dmp_workers,)) as executor:
+        while pending or running:
+            # start every job fitting in the budget, or the next one alone if nothing is running
+            for job in list(pending):
+                memory, func, args, vol_num = job
+                if len(running) >= max_workers:
+                    break
+                if running and used_memory + memory > max_memory:
+                    continue
+                pending.remove(job)
+                running[executor.submit(func, *args)] = (memory, vol_num, func, args)
+                used_memory += memory
+            done, _ = wait(running, return_when=FIRST_COMPLETED)
+            for future in done:
+                memory, vol_num, func, args = running.pop(future)
+                used_memory -= memory
+                try:
+                    result = future.result()
+                except Exception as error:
+                    step = args[1] if func is run_flow else "merge"
+                    print(f"[ERROR] Volume {vol_num} {step} failed: {error!r}")
+                    errors[vol_num].append(f"{step}: {error!r}")
+                    status[vol_num] = "; ".join(errors[vol_num])
+                    continue
+                if result in TEXT_TYPES:
+                    print(f"[INFO] Volume {vol_num} {result} done")
+                    parts_done[vol_num].add(result)
+                    if len(parts_done[vol_num]) == len(TEXT_TYPES):
+                        base_path, _, image_info, _, store = args
+                        pending.insert(0, (MERGE_MEMORY, merge_volume, (base_path, image_info, store), vol_num))
+                else:
+                    status[vol_num] = "merged" if result else "incomplete"
+                    print(f"[INFO] Volume {vol_num} {status[vol_num]}")
+    for vol_num in vol_offsets:
+        status.setdefault(vol_num, "incomplete")
+    return status
+
+
+def parse_volumes(volumes):
+    """Parse volume arguments like ["1", "5-8"] to a list of volume numbers."""
+    vol_nums = []
+    for volume in volumes:
+        if "-" in volume:
+            start, end = volume.split("-")
+            vol_nums += list(range(int(start), int(end) + 1))
+        else:
+            vol_nums.append(int(volume))
+    return vol_nums
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reconstruct many pedurma volumes in parallel.")
+    parser.add_argument("work_id", choices=["W1PD96682", "W1PD95844"])
+    parser.add_argument("volumes", nargs="+", help="volume numbers or ranges like 70-75")
+    parser.add_argument("--offset", type=int, default=16, help="image source offset of every volume")
+    parser.add_argument("--offsets", type=Path, help="yaml mapping volume numbers to their offset")
+    parser.add_argument("--data-dir", type=Path, default=DATA_DIR)
+    parser.add_argument("--workers", type=int)
+    parser.add_argument("--backend")
+    parser.add_argument("--store", type=Path, help="sqlite database the volumes are also written to")
+    args = parser.parse_args()
+    offsets = {}
+    if args.offsets:
+        offsets = yaml.safe_load(args.offsets.read_text(encoding="utf-8"))
+    vol_offsets = {vol_num: offsets.get(vol_num, args.offset) for vol_num in parse_volumes(args.volumes)}
+    status = run_batch(args.work_id, vol_offsets, args.data_dir, args.workers, backend=args.backend, store=args.store)
+    for vol_num, vol_status in sorted(status.items()):
+        print(f"v{vol_num:03}: {vol_status}")
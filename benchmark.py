@@ -0,0 +1,417 @@
+# coding='utf-8'
+
+"""
+Pipeline benchmark
+Times every stage of the reconstruction on the tests fixtures and the shipped volumes, saves
+the timings as json and compares them with a baseline run to flag regressions. The scaling
+mode times the stages on synthetic volumes of growing size and reports how each one grows.
+
+    python benchmark.py --save baseline.json
+    python benchmark.py --compare baseline.json --threshold 0.2
+    python benchmark.py --scaling 0.5 1 2 4 --plot scaling.png
+"""
+import argparse
+import io
+import json
+import math
+import sys
+import tempfile
+import time
+import tracemalloc
+from collections import namedtuple
+from contextlib import redirect_stdout
+from pathlib import Path
+
+import reconstruction
+import synthetic
+from preprocess import preprocess_google_notes, preprocess_namsel_notes
+
+# witness paths are (namsel, google), footnotes google is None when only the namsel ocr is
+# shipped, then only its preprocessing is timed
+Case = namedtuple("Case", ["name", "vol_path", "body", "footnotes", "image_info"])
+
+CASES = [
+    Case("test1", Path("tests/test1"), ("input/b.txt", "input/a.txt"), None, ["W1PD96682", 74, 18]),
+    Case("test2", Path("tests/test2"), ("input/b.txt", "input/a.txt"), None, ["W1PD96682", 74, 18]),
+    Case("test3", Path("tests/test3"), ("input/nam.txt", "input/base.txt"), None, ["W1PD96682", 73, 16]),
+    Case("test4", Path("tests/test4"), ("input/b.txt", "input/a.txt"), None, ["W1PD96682", 73, 16]),
+    Case(
+        "v073",
+        Path("data/v073"),
+        ("body/73N-body.txt", "body/73E-body_transfered.txt"),
+        ("footnotes/73N-footnotes.txt", "footnotes/73G-footnotes.txt"),
+        ["W1PD96682", 73, 16],
+    ),
+    Case("v074", Path("data/v074"), ("body/74N.txt", "body/74E.txt"), None, ["W1PD96682", 74, 18]),
+    Case(
+        "v074-b",
+        Path("data/v074-b"),
+        ("body/74bN-body.txt", "body/74bG-body.txt"),
+        ("footnote/74bN-footnote.txt", "footnote/74bG-footnote.txt"),
+        ["W1PD96682", 74, 18],
+    ),
+    Case(
+        "v074-c",
+        Path("data/v074-c"),
+        ("body/74cN-body.txt", "body/74cG-body.txt"),
+        ("footnote/74cN-footnote.txt", "footnote/74cG-footnote.txt"),
+        ["W1PD96682", 74, 18],
+    ),
+    Case("v075", Path("data/v075"), None, ("footnote/75aN-footnote.txt", None), ["W1PD96682", 75, 16]),
+]
+FOOTNOTES_ANNOTATIONS = [
+    ["marker", "(<m.+?>)"],
+    ["marker", "([①-⑩])"],
+    ["pg_ref", "(<r.+?>)"],
+    ["pedurma_page", "(<p.+?>)"],
+]
+DEFAULT_THRESHOLD = 0.2
+MIN_REGRESSION = 0.005  # seconds, timer noise below it is never a regression
+
+
+def time_stage(timings, name, func, repeat):
+    """Run func repeat times and keep its best wall and cpu time under name.
+
+    The tracemalloc peak is recorded as well when tracemalloc is tracing.
+
+    Args:
+        timings (dict): stage timings of a case
+        name (str): stage name
+        func (callable): stage, without arguments
+        repeat (int): number of runs
+    Returns:
+        object: value returned by func or None if the stage failed
+    """
+    best_wall = best_cpu = None
+    value = None
+    peak_memory = 0
+    for _ in range(repeat):
+        value = None  # the previous run's output must not count in the memory peak
+        if tracemalloc.is_tracing():
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            with redirect_stdout(io.StringIO()):
+                value = func()
+        except Exception as error:
+            timings[name] = {"error": repr(error)}
+            return None
+        wall_time = time.perf_counter() - wall_start
+        cpu_time = time.process_time() - cpu_start
+        best_wall = wall_time if best_wall is None else min(best_wall, wall_time)
+        best_cpu = cpu_time if best_cpu is None else min(best_cpu, cpu_time)
+        if tracemalloc.is_tracing():
+            peak_memory = max(peak_memory, tracemalloc.get_traced_memory()[1])
+    timings[name] = {"wall_time": round(best_wall, 5), "cpu_time": round(best_cpu, 5)}
+    if tracemalloc.is_tracing():
+        timings[name]["peak_memory_mb"] = round(peak_memory / 1024 ** 2, 2)
+    return value
+
+
+def bench_body(case, timings, out_dir, backend, repeat):
+    """Time the body stages of a case, returns the body result path if one was produced."""
+    if case.body is None:
+        return None
+    namsel_text = (case.vol_path / case.body[0]).read_text(encoding="utf-8")
+    google_text = (case.vol_path / case.body[1]).read_text(encoding="utf-8")
+    diffs = time_stage(
+        timings, "body.diff", lambda: list(map(list, reconstruction.get_diffs(namsel_text, google_text, backend=backend))), repeat
+    )
+    if diffs is None:
+        return None
+    reconstruction.to_store(diffs, out_dir, type_="diffs")
+    filtered_diffs = time_stage(
+        timings, "body.filter", lambda: reconstruction.filter_diffs(out_dir / "diffs.bin", "body", case.image_info), repeat
+    )
+    if filtered_diffs is None:
+        return None
+    reconstruction.to_store(filtered_diffs, out_dir, type_="filtered_diffs")
+    text = time_stage(
+        timings,
+        "body.format",
+        lambda: reconstruction.format_diff(out_dir / "filtered_diffs.bin", case.image_info, type_="body"),
+        repeat,
+    )
+    if text is None:
+        return None
+    text = time_stage(timings, "body.renumber", lambda: reconstruction.reformatting_body(text), repeat)
+    if text is None:
+        return None
+    result_path = out_dir / "body_result.txt"
+    result_path.write_text(text, encoding="utf-8")
+    return result_path
+
+
+def bench_footnotes(case, timings, out_dir, repeat):
+    """Time the footnotes stages of a case, returns the footnotes yaml path if one was produced."""
+    namsel_text = (case.vol_path / case.footnotes[0]).read_text(encoding="utf-8")
+    clean_namsel_text = time_stage(timings, "footnotes.preprocess_namsel", lambda: preprocess_namsel_notes(namsel_text), repeat)
+    if case.footnotes[1] is None or clean_namsel_text is None:
+        return None
+    google_text = (case.vol_path / case.footnotes[1]).read_text(encoding="utf-8")
+    clean_google_text = time_stage(
+        timings,
+        "footnotes.preprocess_google",
+        lambda: preprocess_google_notes(reconstruction.rm_google_ocr_header(google_text)),
+        repeat,
+    )
+    diffs = time_stage(
+        timings,
+        "footnotes.diff",
+        lambda: list(map(list, reconstruction.transfer(clean_namsel_text, FOOTNOTES_ANNOTATIONS, clean_google_text))),
+        repeat,
+    )
+    if diffs is None:
+        return None
+    reconstruction.to_store(diffs, out_dir, type_="diffs")
+    filtered_diffs = time_stage(
+        timings,
+        "footnotes.filter",
+        lambda: reconstruction.filter_footnotes_diffs(out_dir / "diffs.bin", case.image_info[1]),
+        repeat,
+    )
+    if filtered_diffs is None:
+        return None
+    reconstruction.to_store(filtered_diffs, out_dir, type_="filtered_diffs")
+    text = time_stage(
+        timings,
+        "footnotes.format",
+        lambda: reconstruction.format_diff(out_dir / "filtered_diffs.bin", case.image_info, type_="footnotes"),
+        repeat,
+    )
+    if text is None:
+        return None
+    footnotes = time_stage(
+        timings,
+        "footnotes.postprocess",
+        lambda: reconstruction.postprocess_footnotes(reconstruction.reformat_footnotes(text)),
+        repeat,
+    )
+    if footnotes is None:
+        return None
+    reconstruction.to_yaml(footnotes, out_dir, type_="footnotes")
+    return out_dir / "footnotes.yaml"
+
+
+def bench_merge(case, timings, out_dir, body_path, footnotes_path, repeat):
+    """Time merge, add_link and docx, on the shipped result of a part the case did not produce."""
+    body_path = body_path or case.vol_path / "body" / "result.txt"
+    footnotes_path = footnotes_path or case.vol_path / "footnotes" / "footnotes.yaml"
+    if not (body_path.is_file() and footnotes_path.is_file()):
+        return
+    merged = time_stage(timings, "merge", lambda: reconstruction.merge_footnote(body_path, footnotes_path), repeat)
+    if merged is None:
+        return
+    time_stage(timings, "add_link", lambda: reconstruction.add_link(merged[0], case.image_info), repeat)
+
+    def docx():
+        import to_docx
+
+        to_docx.create_docx(to_docx.split_text(merged[1]), ["1a", "1a"], out_dir / "combined.txt")
+
+    time_stage(timings, "docx", docx, repeat)
+
+
+def run_case(case, backend, repeat):
+    """Time every stage of a case.
+
+    Returns:
+        dict: stage timings
+    """
+    timings = {}
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        out_dir = Path(tmp_dir)
+        (out_dir / "body").mkdir()
+        (out_dir / "footnotes").mkdir()
+        body_path = bench_body(case, timings, out_dir / "body", backend, repeat)
+        footnotes_path = None
+        if case.footnotes:
+            footnotes_path = bench_footnotes(case, timings, out_dir / "footnotes", repeat)
+        bench_merge(case, timings, out_dir, body_path, footnotes_path, repeat)
+    return timings
+
+
+def run_benchmark(cases=CASES, backend="node", repeat=3):
+    """Time every stage of the cases.
+
+    Args:
+        cases (list): cases to run, missing inputs are skipped
+        backend (str): body diff backend, see utils.get_dmp
+        repeat (int): runs per stage, the best one is kept
+    Returns:
+        dict: run settings and stage timings per case
+    """
+    results = {"backend": backend, "repeat": repeat, "python": sys.version.split()[0], "cases": {}}
+    for case in cases:
+        if not case.vol_path.is_dir():
+            print(f"[INFO] {case.name} not found, skipped")
+            continue
+        print(f"[INFO] Benchmarking {case.name}...")
+        results["cases"][case.name] = run_case(case, backend, repeat)
+    return results
+
+
+def run_scaling(scales, backend="node", repeat=1, seed=0):
+    """Time every stage on synthetic volumes of growing size, with tracemalloc peaks.
+
+    Args:
+        scales (list): volume sizes as multiples of a real volume, see synthetic.generate_volume
+        backend (str): body diff backend, see utils.get_dmp
+        repeat (int): runs per stage, the best one is kept
+        seed (int): random seed of the synthetic volumes
+    Returns:
+        dict: run settings, input chars and stage timings per scale
+    """
+    results = {"backend": backend, "repeat": repeat, "python": sys.version.split()[0], "sizes": {}, "cases": {}}
+    tracemalloc.start()
+    try:
+        for scale in scales:
+            name = f"x{scale}"
+            print(f"[INFO] Benchmarking synthetic volume {name}...")
+            with tempfile.TemporaryDirectory() as tmp_dir:
+                vol_path = synthetic.write_volume(tmp_dir, 73, scale=scale, seed=seed)
+                case = Case(
+                    name,
+                    vol_path,
+                    ("body/73N-body.txt", "body/73E-body_transfered.txt"),
+                    ("footnotes/73N-footnotes.txt", "footnotes/73G-footnotes.txt"),
+                    ["W1PD96682", 73, 16],
+                )
+                results["sizes"][name] = sum(
+                    len((vol_path / path).read_text(encoding="utf-8")) for path in case.body + case.footnotes
+                )
+                results["cases"][name] = run_case(case, backend, repeat)
+    finally:
+        tracemalloc.stop()
+    return results
+
+
+def get_growth(results):
+    """Estimate how the wall time of each stage grows with the input size.
+
+    Returns:
+        dict: stage mapped to the exponent k of time ~ size^k between the smallest and the
+            largest scale, about 1 for linear stages and 2 for quadratic ones
+    """
+    names = sorted(results["sizes"], key=results["sizes"].get)
+    smallest, largest = names[0], names[-1]
+    size_ratio = results["sizes"][largest] / results["sizes"][smallest]
+    growth = {}
+    for stage_name, timing in results["cases"][largest].items():
+        first = results["cases"][smallest].get(stage_name, {})
+        if size_ratio <= 1 or not first.get("wall_time") or "wall_time" not in timing:
+            continue
+        growth[stage_name] = round(math.log(timing["wall_time"] / first["wall_time"]) / math.log(size_ratio), 2)
+    return growth
+
+
+def plot_scaling(results, path):
+    """Plot wall time and memory peak against input size for each stage."""
+    try:
+        import matplotlib
+
+        matplotlib.use("Agg")
+        import matplotlib.pyplot as plt
+    except ImportError:
+        print("[INFO] matplotlib is not installed, no plot")
+        return
+    names = sorted(results["sizes"], key=results["sizes"].get)
+    sizes = [results["sizes"][name] for name in names]
+    stage_names = {stage_name for name in names for stage_name in results["cases"][name]}
+    figure, (time_axis, memory_axis) = plt.subplots(1, 2, figsize=(14, 6))
+    for stage_name in sorted(stage_names):
+        timings = [results["cases"][name].get(stage_name, {}) for name in names]
+        points = [(size, timing) for size, timing in zip(sizes, timings) if "wall_time" in timing]
+        if not points:
+            continue
+        time_axis.plot([size for size, _ in points], [timing["wall_time"] for _, timing in points], marker="o", label=stage_name)
+        memory_axis.plot(
+            [size for size, _ in points], [timing.get("peak_memory_mb", 0) for _, timing in points], marker="o", label=stage_name
+        )
+    for axis, label in [(time_axis, "wall time (s)"), (memory_axis, "tracemalloc peak (MB)")]:
+        axis.set_xscale("log")
+        axis.set_yscale("log")
+        axis.set_xlabel("input chars")
+        axis.set_ylabel(label)
+    time_axis.legend(fontsize="small")
+    figure.tight_layout()
+    figure.savefig(str(path))
+
+
+def compare(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Compare stage timings with a baseline run.
+
+    Args:
+        results (dict): current run
+        baseline (dict): baseline run
+        threshold (float): relative slowdown above which a stage is a regression
+    Returns:
+        list: (case, stage, baseline wall time, current wall time) of every regression
+    """
+    regressions = []
+    for case_name, timings in results["cases"].items():
+        baseline_timings = baseline["cases"].get(case_name, {})
+        for stage_name, timing in timings.items():
+            baseline_timing = baseline_timings.get(stage_name, {})
+            if "wall_time" not in timing or "wall_time" not in baseline_timing:
+                continue
+            before, after = baseline_timing["wall_time"], timing["wall_time"]
+            if after > before * (1 + threshold) and after - before > MIN_REGRESSION:
+                regressions.append((case_name, stage_name, before, after))
+    return regressions
+
+
+def print_results(results, baseline=None):
+    line = f"backend: {results['backend']}"
+    if baseline is not None:
+        line += f", baseline backend: {baseline.get('backend')}"
+    print(line)
+    if baseline is not None and baseline.get("backend") != results["backend"]:
+        print("[INFO] baseline was run with another diff backend, body.diff timings are not comparable")
+    for case_name, timings in results["cases"].items():
+        print(case_name)
+        for stage_name, timing in timings.items():
+            if "error" in timing:
+                print(f"    {stage_name:<30} failed: {timing['error'][:60]}")
+                continue
+            line = f"    {stage_name:<30} {timing['wall_time']:>10.4f}s"
+            baseline_timing = (baseline or {}).get("cases", {}).get(case_name, {}).get(stage_name, {})
+            if "wall_time" in baseline_timing and baseline_timing["wall_time"]:
+                line += f" {timing['wall_time'] / baseline_timing['wall_time']:>7.2f}x baseline"
+            print(line)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Benchmark the reconstruction pipeline stages.")
+    parser.add_argument("cases", nargs="*", help="case names, all by default")
+    parser.add_argument("--backend", default="node", help="body diff backend, node like the pipeline")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--save", type=Path, help="json file to save the timings to")
+    parser.add_argument("--compare", type=Path, help="baseline json file to compare with")
+    parser.add_argument("--threshold", type=float, default=DEFAULT_THRESHOLD)
+    parser.add_argument("--scaling", type=float, nargs="+", help="time synthetic volumes of these sizes instead")
+    parser.add_argument("--plot", type=Path, help="image file to plot the scaling run to")
+    args = parser.parse_args()
+    if args.scaling:
+        results = run_scaling(args.scaling, args.backend, args.repeat)
+    else:
+        cases = [case for case in CASES if not args.cases or case.name in args.cases]
+        results = run_benchmark(cases, args.backend, args.repeat)
+    baseline = None
+    if args.compare:
+        baseline = json.loads(args.compare.read_text(encoding="utf-8"))
+    print_results(results, baseline)
+    if args.scaling:
+        for stage_name, exponent in get_growth(results).items():
+            print(f"[INFO] {stage_name} grows as size^{exponent}")
+        if args.plot:
+            plot_scaling(results, args.plot)
+    if args.save:
+        args.save.write_text(json.dumps(results, indent=2), encoding="utf-8")
+    if baseline is not None:
+        regressions = compare(results, baseline, args.threshold)
+        for case_name, stage_name, before, after in regressions:
+            print(f"[REGRESSION] {case_name} {stage_name}: {before:.4f}s -> {after:.4f}s")
+        if regressions:
+            sys.exit(1)
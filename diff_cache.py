@@ -0,0 +1,133 @@
+# coding='utf-8'
+
+"""
+Content-addressed diff cache
+Diff results are stored on disk under a hash of both inputs plus the backend name and
+version, so re-running a volume whose witnesses did not change skips the diff entirely.
+Entries are zlib compressed json, written atomically so several processes can share one
+cache directory, and the least recently used entries are evicted past a size limit.
+"""
+import hashlib
+import json
+import os
+import tempfile
+import zlib
+from pathlib import Path
+
+from utils import BASE_DIR
+
+CACHE_DIR = BASE_DIR / "diff_cache"
+MAX_CACHE_SIZE = 2 * 1024 ** 3  # 2 GB
+CACHE_SUFFIX = ".json.z"
+# backends implemented in this repo, their source is part of their version
+BACKEND_MODULES = {"syllable": "syllable_diff.py", "anchored": "anchor_alignment.py"}
+
+
+def get_backend_version(backend):
+    """Return a version string for a diff backend, any change invalidates cached diffs.
+
+    Args:
+        backend (str): diff backend name
+
+    Returns:
+        str: backend version
+    """
+    if backend == "node":
+        from utils import get_dmp_exe_path
+
+        binary_stat = Path(get_dmp_exe_path()).stat()
+        return f"node-dmp-{binary_stat.st_size}-{int(binary_stat.st_mtime)}"
+    elif backend in ["python", "syllable", "anchored"]:
+        import diff_match_patch
+
+        version = f"{backend}-{diff_match_patch.__version__}"
+        if backend in BACKEND_MODULES:
+            source = (Path(__file__).parent / BACKEND_MODULES[backend]).read_bytes()
+            version += f"-{hashlib.sha256(source).hexdigest()[:16]}"
+        return version
+    elif backend == "transfer":
+        import antx
+
+        return f"antx-{antx.__version__}"
+    return backend
+
+
+def make_key(text1, text2, backend, extra=""):
+    """Compute the cache key of a diff from the normalised texts given to the diff.
+
+    Args:
+        text1 (str): source text
+        text2 (str): target text
+        backend (str): diff backend name
+        extra (str): any other parameter changing the diff, like transfer patterns
+
+    Returns:
+        str: hex digest
+    """
+    sha = hashlib.sha256()
+    for part in [get_backend_version(backend), extra, str(len(text1)), text1, text2]:
+        sha.update(part.encode("utf-8"))
+        sha.update(b"\0")
+    return sha.hexdigest()
+
+
+class DiffCache:
+    """On-disk diff cache with LRU eviction, safe to share between processes."""
+
+    def __init__(self, cache_dir=CACHE_DIR, max_size=MAX_CACHE_SIZE):
+        self.cache_dir = Path(cache_dir)
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self.max_size = max_size
+
+    def _path(self, key):
+        return self.cache_dir / f"{key}{CACHE_SUFFIX}"
+
+    def get(self, key):
+        """Return the cached diffs of key or None on a miss."""
+        path = self._path(key)
+        try:
+            content = path.read_bytes()
+            os.utime(path)  # mark as recently used
+        except FileNotFoundError:
+            return None
+        return json.loads(zlib.decompress(content).decode("utf-8"))
+
+    def put(self, key, diffs):
+        """Store diffs under key and evict old entries if the cache is too big."""
+        content = zlib.compress(json.dumps(diffs, ensure_ascii=False).encode("utf-8"))
+        fd, tmp_path = tempfile.mkstemp(dir=str(self.cache_dir), suffix=".tmp")
+        with os.fdopen(fd, "wb") as tmp_file:
+            tmp_file.write(content)
+        os.replace(tmp_path, self._path(key))
+        self.evict()
+
+    def evict(self):
+        """Delete least recently used entries until the cache fits in max_size."""
+        entries = []
+        total_size = 0
+        for path in self.cache_dir.glob(f"*{CACHE_SUFFIX}"):
+            try:
+                path_stat = path.stat()
+            except FileNotFoundError:
+                continue
+            entries.append((path_stat.st_mtime, path_stat.st_size, path))
+            total_size += path_stat.st_size
+        entries.sort()
+        for _, size, path in entries:
+            if total_size <= self.max_size:
+                break
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+            total_size -= size
+
+    def get_or_compute(self, key, compute):
+        """Return cached diffs of key, computing and storing them with compute() on a miss."""
+        diffs = self.get(key)
+        if diffs is not None:
+            print("[INFO] Diff loaded from cache")
+            return diffs
+        diffs = [list(diff) for diff in compute()]
+        self.put(key, diffs)
+        return diffs
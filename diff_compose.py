@@ -0,0 +1,244 @@
+# coding='utf-8'
+
+"""
+Diff composition
+The body flow diffs the namsel text against 73E-body_transfered.txt, which annotation
+transfer made by aligning the namsel text with the clean etext. The transfer diff already
+aligns both of them with the transfered text, so the flow diff is derived from it by
+composing diffs: a diff of A and B composed with a diff of B and C is a diff of A and C.
+Only the spots where the composition deletes and inserts next to each other are diffed
+again, locally. The diffs of the chain also give offset maps, an offset of the namsel text
+is mapped to the transfered text through the DiffIndex of each diff, see diff_index.
+
+The derived diff is a diff of the same texts, but dmp places an edit inside repeated chars
+from the whole texts, so the two diffs can differ by where such an edit sits. The body
+filter reads markers from these places, so reconstruction.flow keeps diffing the texts.
+"""
+from diff_match_patch import diff_match_patch
+
+from anchor_alignment import anchored_diff_match_patch, get_anchors
+from diff_index import DiffIndex
+
+DELETE, EQUAL, INSERT = -1, 0, 1
+SIDE_SAMPLE_LEN = 5000  # chars compared to find which text of the transfer the namsel text is
+
+
+def get_transfer_diffs_path(transfered_text_path):
+    """Return the path of the transfer diff stored next to a transfered text."""
+    return transfered_text_path.with_suffix(".diffs.bin")
+
+
+def append_diff(diffs, op, text):
+    """Append a diff, merged with the last one if they have the same type."""
+    if not text:
+        return
+    if diffs and diffs[-1][0] == op:
+        diffs[-1] = (op, diffs[-1][1] + text)
+    else:
+        diffs.append((op, text))
+
+
+def get_text1(diffs):
+    return "".join(diff[1] for diff in diffs if diff[0] != INSERT)
+
+
+def get_text2(diffs):
+    return "".join(diff[1] for diff in diffs if diff[0] != DELETE)
+
+
+def transfer_to_diffs(transfer_diffs, side="target"):
+    """Convert the output of annotation transfer to a diff of one of its texts and the transfered text.
+
+    From the target, the transfered annotations are insertions and the source text is
+    dropped. From the source, the annotations are kept as they are in the source text, its
+    other text is deleted and the target text inserted.
+
+    Args:
+        transfer_diffs (list): [type, text, tag] diffs of annotation_transfer.transfer_to_file
+        side (str): "source" or "target"
+
+    Returns:
+        list: diffs of the source or the target of the transfer and the transfered text
+    """
+    diffs = []
+    for op, text, tag in transfer_diffs:
+        if op == DELETE:
+            if side == "source":
+                append_diff(diffs, DELETE, text)
+        elif side == "target" and tag:
+            append_diff(diffs, INSERT, text)
+        else:
+            append_diff(diffs, op, text)
+    return diffs
+
+
+def get_anchored_len(text1, text2):
+    return sum(length for _, _, length in get_anchors(text1, text2))
+
+
+def get_transfer_side(namsel_text, transfer_diffs):
+    """Find whether the namsel text was the source or the target of the transfer.
+
+    Args:
+        namsel_text (str): namsel text
+        transfer_diffs (list): [type, text, tag] diffs of annotation_transfer.transfer_to_file
+
+    Returns:
+        str: "source" or "target", the text sharing the most anchored chars with the namsel text
+    """
+    sample = namsel_text[:SIDE_SAMPLE_LEN]
+    sides = {}
+    for side in ["target", "source"]:
+        side_text = get_text1(transfer_to_diffs(transfer_diffs, side))
+        if side_text == namsel_text:
+            return side
+        sides[side] = get_anchored_len(sample, side_text[:SIDE_SAMPLE_LEN])
+    return max(sides, key=sides.get)
+
+
+def compose_diffs(diffs1, diffs2):
+    """Compose a diff of text A and B with a diff of text B and C in one walk.
+
+    Args:
+        diffs1 (list): diffs of A and B
+        diffs2 (list): diffs of B and C
+
+    Returns:
+        list: diffs of A and C, a deletion and an insertion of the same text may follow each
+            other where the B text differs from both, see refine_diffs
+    """
+    diffs = []
+    i = j = 0
+    offset1 = offset2 = 0  # chars of diffs1[i] and diffs2[j] already composed
+    while i < len(diffs1) or j < len(diffs2):
+        if i < len(diffs1) and diffs1[i][0] == DELETE:
+            append_diff(diffs, DELETE, diffs1[i][1])
+            i += 1
+            continue
+        if j < len(diffs2) and diffs2[j][0] == INSERT:
+            append_diff(diffs, INSERT, diffs2[j][1])
+            j += 1
+            continue
+        if i == len(diffs1) or j == len(diffs2):
+            raise ValueError("The diffs to compose do not share their middle text")
+        op1, text1 = diffs1[i][:2]
+        op2, text2 = diffs2[j][:2]
+        length = min(len(text1) - offset1, len(text2) - offset2)
+        chunk = text1[offset1 : offset1 + length]
+        if chunk != text2[offset2 : offset2 + length]:
+            raise ValueError("The diffs to compose do not share their middle text")
+        if op1 == EQUAL and op2 == EQUAL:
+            append_diff(diffs, EQUAL, chunk)
+        elif op1 == EQUAL:
+            append_diff(diffs, DELETE, chunk)
+        elif op2 == EQUAL:
+            append_diff(diffs, INSERT, chunk)
+        offset1 += length
+        offset2 += length
+        if offset1 == len(text1):
+            i, offset1 = i + 1, 0
+        if offset2 == len(text2):
+            j, offset2 = j + 1, 0
+    return diffs
+
+
+def refine_diffs(diffs, dmp=None):
+    """Diff again each run of deletions and insertions between two equalities.
+
+    Args:
+        diffs (list): diffs, composed ones usually
+        dmp (diff_match_patch): diff engine of the runs, plain DMP without timeout by default
+
+    Returns:
+        list: diffs with the runs diffed again
+    """
+    if dmp is None:
+        dmp = diff_match_patch()
+        dmp.Diff_Timeout = 0
+    refined = []
+    deleted, inserted = [], []
+    for op, text in diffs + [(EQUAL, "")]:
+        if op == DELETE:
+            deleted.append(text)
+        elif op == INSERT:
+            inserted.append(text)
+        else:
+            if deleted and inserted:
+                for run_op, run_text in dmp.diff_main("".join(deleted), "".join(inserted)):
+                    append_diff(refined, run_op, run_text)
+            else:
+                append_diff(refined, DELETE, "".join(deleted))
+                append_diff(refined, INSERT, "".join(inserted))
+            deleted, inserted = [], []
+            append_diff(refined, EQUAL, text)
+    return refined
+
+
+def bridge_diffs(text1, text2):
+    """Diff two texts expected to be almost the same, like a text and its hand-edited version."""
+    if text1 == text2:
+        return [(EQUAL, text1)] if text1 else []
+    return list(anchored_diff_match_patch().diff_main(text1, text2))
+
+
+def get_transfer_chain(namsel_text, transfered_text, transfer_diffs):
+    """Return the chain of diffs going from the namsel text to the transfered text.
+
+    The text of the transfer the namsel text was is bridged to the namsel text, it may have
+    been transfered with its line breaks removed, and the transfered text made by the
+    transfer is bridged to the one read, which reviewers may have edited. The chain so
+    always starts from the given namsel text and ends with the given transfered text.
+
+    Args:
+        namsel_text (str): namsel text
+        transfered_text (str): text read from 73E-body_transfered.txt
+        transfer_diffs (list): [type, text, tag] diffs of annotation_transfer.transfer_to_file
+
+    Returns:
+        list: the namsel bridge, the transfer diff of the namsel side and the transfered bridge
+    """
+    side = get_transfer_side(namsel_text, transfer_diffs)
+    side_to_transfered = transfer_to_diffs(transfer_diffs, side)
+    return [
+        bridge_diffs(namsel_text, get_text1(side_to_transfered)),
+        side_to_transfered,
+        bridge_diffs(get_text2(side_to_transfered), transfered_text),
+    ]
+
+
+def get_offset_maps(chain):
+    """Return the offset map, a DiffIndex, of each diff of a chain."""
+    return [DiffIndex(diffs) for diffs in chain]
+
+
+def map_offset(offset, offset_maps):
+    """Map an offset of the first text of a diff chain to the same char in its last text.
+
+    Args:
+        offset (int): char offset in the first text
+        offset_maps (list): offset map of each diff of the chain, see get_offset_maps
+
+    Returns:
+        int: offset in the last text, a char dropped on the way is mapped to where its diff is
+    """
+    for offset_map in offset_maps:
+        offset = offset_map.map_offset(offset)
+    return offset
+
+
+def derive_transfered_diffs(namsel_text, transfered_text, transfer_diffs):
+    """Derive the diff of the namsel text and the transfered text from the transfer diff.
+
+    Args:
+        namsel_text (str): namsel text
+        transfered_text (str): text read from 73E-body_transfered.txt
+        transfer_diffs (list): [type, text, tag] diffs of annotation_transfer.transfer_to_file
+
+    Returns:
+        list: diffs of namsel_text and transfered_text, see get_transfer_chain
+    """
+    namsel_bridge, side_to_transfered, transfered_bridge = get_transfer_chain(
+        namsel_text, transfered_text, transfer_diffs
+    )
+    diffs = compose_diffs(compose_diffs(namsel_bridge, side_to_transfered), transfered_bridge)
+    return refine_diffs(diffs)
@@ -0,0 +1,162 @@
+# coding='utf-8'
+
+"""
+Diff offset index
+Maps positions between the two texts of a diff list. The start of every diff in text1 and
+in text2 is kept in prefix-sum arrays, so the diff holding an offset, the offset of the same
+char in the other text or the diffs of a range, like a page, are found with a bisection
+instead of walking the diff list again. A PageIndex keeps the index and the page spans of a
+diff list together, so reading many pages costs one pass over the diffs.
+"""
+import re
+import sys
+from array import array
+from bisect import bisect_left, bisect_right
+from pathlib import Path
+
+from diff_store import DiffStore
+
+PAGE_PATTERN = re.compile(r"\[(\d+[a-z])\]")
+
+
+class DiffIndex:
+    """Start offsets of each diff of a diff list in text1 and text2.
+
+    A side is 1 for text1, where insertions are empty, or 2 for text2, where deletions are.
+
+    Args:
+        diffs (iterable): diffs as [type, text] or [type, text, tag], a DiffStore as well
+    """
+
+    def __init__(self, diffs):
+        self.ops = array("b")
+        self.starts1 = array("Q", [0])
+        self.starts2 = array("Q", [0])
+        start1 = start2 = 0
+        for diff in diffs:
+            op, length = diff[0], len(diff[1])
+            if op != 1:
+                start1 += length
+            if op != -1:
+                start2 += length
+            self.ops.append(op)
+            self.starts1.append(start1)
+            self.starts2.append(start2)
+
+    def __len__(self):
+        return len(self.ops)
+
+    def _starts(self, side):
+        return self.starts1 if side == 1 else self.starts2
+
+    def find(self, offset, side=1):
+        """Return the index of the diff holding the char at offset of a text.
+
+        Diffs empty on that side are skipped, the end of the text is in the last diff.
+        """
+        starts = self._starts(side)
+        if not 0 <= offset <= starts[-1]:
+            raise IndexError(f"offset {offset} out of text{side}")
+        return min(bisect_right(starts, offset), len(self)) - 1
+
+    def map_offset(self, offset, side=1):
+        """Map an offset of a text to the offset of the same char in the other text.
+
+        A char only in that text is mapped to where its diff is in the other text.
+
+        Args:
+            offset (int): char offset in the text of side
+            side (int): 1 to map from text1 to text2, 2 to map from text2 to text1
+
+        Returns:
+            int: offset in the other text
+        """
+        if not len(self):
+            return 0
+        index = self.find(offset, side)
+        starts, other_starts = (self.starts1, self.starts2) if side == 1 else (self.starts2, self.starts1)
+        if self.ops[index] == 0:
+            return other_starts[index] + offset - starts[index]
+        return other_starts[index]
+
+    def get_range(self, start, end, side=1):
+        """Return the range of the diffs overlapping the chars start to end of a text.
+
+        Diffs empty on that side are included when they are between two chars of the range.
+        """
+        starts = self._starts(side)
+        first = bisect_right(starts, start) - 1
+        last = bisect_left(starts, end, lo=max(first, 0))
+        return range(max(first, 0), min(last, len(self)))
+
+
+def get_text(diffs, side=1):
+    """Return text1 or text2 of a diff list."""
+    skipped_op = 1 if side == 1 else -1
+    return "".join(diff[1] for diff in diffs if diff[0] != skipped_op)
+
+
+def get_page_name(match):
+    """Return the page name of a page annotation match, its first group or the whole match."""
+    return match.group(1) if match.re.groups else match.group()
+
+
+def iter_page_spans(text, pattern=PAGE_PATTERN):
+    """Yield the name and (start, end) span of each page of a text, from its annotation to the next one.
+
+    Args:
+        text (str): text with page annotations like [12a]
+        pattern (re.Pattern): page annotation pattern, whose first group, or whole match, is the page name
+
+    Yields:
+        tuple: page name and span, in text order
+    """
+    matches = list(pattern.finditer(text))
+    for match, next_match in zip(matches, matches[1:] + [None]):
+        yield get_page_name(match), (match.start(), next_match.start() if next_match else len(text))
+
+
+def get_page_spans(text, pattern=PAGE_PATTERN):
+    """Return the span of each page of a text, see iter_page_spans, by page name."""
+    return dict(iter_page_spans(text, pattern))
+
+
+class PageIndex:
+    """Diff index and page spans of a diff list, built once to read any number of its pages.
+
+    Args:
+        diffs (list): diff list or DiffStore
+        side (int): text holding the page annotations
+        pattern (re.Pattern): page annotation pattern, whose first group, or whole match, is the page name
+    """
+
+    def __init__(self, diffs, side=2, pattern=PAGE_PATTERN):
+        self.diffs = diffs
+        self.side = side
+        self.diff_index = DiffIndex(diffs)
+        # a page name found twice keeps its last span, like get_page_spans, but both starts
+        page_spans = list(iter_page_spans(get_text(diffs, side), pattern))
+        self.spans = dict(page_spans)
+        self.page_starts = [span[0] for _, span in page_spans]
+
+    def get_page_range(self, page):
+        """Return the range of the diffs overlapping a page, empty if the page is not found."""
+        span = self.spans.get(page)
+        if span is None:
+            return range(0)
+        return self.diff_index.get_range(*span, self.side)
+
+    def get_page_diffs(self, page):
+        """Return the diffs of a page like 12a, empty if the page is not found."""
+        return [self.diffs[index] for index in self.get_page_range(page)]
+
+    def get_page_starts(self):
+        """Return the index of the diff holding each page annotation, in text order."""
+        return sorted({self.diff_index.find(start, self.side) for start in self.page_starts})
+
+
+if __name__ == "__main__":
+    # print the diffs of a page for review: python diff_index.py data/v073/body/diffs.bin 12a
+    with DiffStore(Path(sys.argv[1])) as diffs:
+        for diff in PageIndex(diffs).get_page_diffs(sys.argv[2]):
+            print(diff)
@@ -0,0 +1,166 @@
+# coding='utf-8'
+
+"""
+Binary diff store
+Columnar on-disk format for diff lists replacing the yaml intermediates. A store holds an
+op-code array, a tag-code array, the utf-8 texts of all diffs concatenated in one buffer and
+the byte offsets of each text in that buffer. The file is memory mapped on load, so diffs
+are decoded only when accessed and slicing a store copies nothing.
+
+Layout: header | tag names (json) | padding | offsets (uint64, n+1) | ops (int8, n) |
+tags (uint8, n) | text (utf-8)
+"""
+import json
+import mmap
+import struct
+from array import array
+from pathlib import Path
+
+import yaml
+
+MAGIC = b"PDDS"
+VERSION = 1
+HEADER = struct.Struct("<4sIQI")  # magic, version, number of diffs, tag names length
+
+
+def _padding(size, alignment=8):
+    return -size % alignment
+
+
+def to_diff_store(diffs, path):
+    """Write a diff list to a binary diff store.
+
+    Args:
+        diffs (list): diffs as [type, text] or [type, text, tag]
+        path (path): path object of the store
+    """
+    tag_names = [""]
+    tag_codes = {"": 0}
+    offsets = array("Q", [0])
+    ops = array("b")
+    tags = array("B")
+    texts = []
+    text_len = 0
+    for diff in diffs:
+        tag = diff[2] if len(diff) > 2 else ""
+        if tag not in tag_codes:
+            tag_codes[tag] = len(tag_names)
+            tag_names.append(tag)
+        encoded = diff[1].encode("utf-8")
+        text_len += len(encoded)
+        texts.append(encoded)
+        offsets.append(text_len)
+        ops.append(diff[0])
+        tags.append(tag_codes[tag])
+    tag_names_json = json.dumps(tag_names, ensure_ascii=False).encode("utf-8")
+    head = HEADER.pack(MAGIC, VERSION, len(ops), len(tag_names_json)) + tag_names_json
+    with Path(path).open("wb") as store_file:
+        store_file.write(head)
+        store_file.write(b"\0" * _padding(len(head)))
+        store_file.write(offsets.tobytes())
+        store_file.write(ops.tobytes())
+        store_file.write(tags.tobytes())
+        for text in texts:
+            store_file.write(text)
+
+
+class DiffStore:
+    """Memory mapped read access to a binary diff store.
+
+    Indexing returns a diff as [type, text, tag], slicing returns a DiffStore view.
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        self._file = self.path.open("rb")
+        self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        buffer = memoryview(self._mmap)
+        magic, version, n_diffs, tag_names_len = HEADER.unpack_from(buffer)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"{self.path} is not a diff store")
+        start = HEADER.size
+        self.tag_names = json.loads(bytes(buffer[start : start + tag_names_len]).decode("utf-8"))
+        start += tag_names_len
+        start += _padding(start)
+        self._offsets = buffer[start : start + 8 * (n_diffs + 1)].cast("Q")
+        start += 8 * (n_diffs + 1)
+        self._ops = buffer[start : start + n_diffs].cast("b")
+        start += n_diffs
+        self._tags = buffer[start : start + n_diffs]
+        start += n_diffs
+        self._text = buffer[start:]
+        self.start = 0
+        self.stop = n_diffs
+
+    def _view(self, start, stop):
+        view = object.__new__(DiffStore)
+        view.__dict__.update(self.__dict__)
+        view.start = start
+        view.stop = stop
+        return view
+
+    def __len__(self):
+        return self.stop - self.start
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            start, stop, step = index.indices(len(self))
+            if step != 1:
+                raise ValueError("diff store slices must be contiguous")
+            return self._view(self.start + start, self.start + max(start, stop))
+        if index < 0:
+            index += len(self)
+        if not 0 <= index < len(self):
+            raise IndexError("diff index out of range")
+        index += self.start
+        return [self._ops[index], self.text(index - self.start), self.tag_names[self._tags[index]]]
+
+    def __iter__(self):
+        for index in range(len(self)):
+            yield self[index]
+
+    def text(self, index):
+        """Decode the text of the diff at index."""
+        index += self.start
+        return str(self._text[self._offsets[index] : self._offsets[index + 1]], "utf-8")
+
+    def op(self, index):
+        """Return the diff type of the diff at index without decoding its text."""
+        return self._ops[self.start + index]
+
+    def to_list(self, with_tags=True):
+        """Return the diffs as a list of mutable lists."""
+        if with_tags:
+            return [diff for diff in self]
+        return [diff[:2] for diff in self]
+
+    def to_yaml(self, path, with_tags=True):
+        """Export the diffs as yaml for human review."""
+        list_yaml = yaml.safe_dump(self.to_list(with_tags), allow_unicode=True)
+        Path(path).write_text(list_yaml, encoding="utf-8")
+
+    def close(self):
+        for view in [self._offsets, self._ops, self._tags, self._text]:
+            view.release()
+        self._mmap.close()
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def from_diff_store(path, with_tags=True):
+    """Load a diff list from a binary diff store.
+
+    Args:
+        path (path): path object of the store
+        with_tags (bool): whether to keep the tag of each diff
+
+    Returns:
+        list: list of diffs
+    """
+    with DiffStore(path) as store:
+        return store.to_list(with_tags)
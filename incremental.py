@@ -0,0 +1,310 @@
+# coding='utf-8'
+
+"""
+Incremental body reconstruction
+Re-run the body of a volume after a hand edit of its inputs without redoing the whole
+volume. Both witnesses are cut at every shared page anchor, see sharding, and each page
+shard is fingerprinted by its content. The cut points and fingerprints are kept in a
+manifest next to diffs.bin and result.txt, so on the next run only the shards whose
+fingerprint is new are diffed again, the others reuse their diffs from diffs.bin. The
+pedurma pages holding the new diffs, plus a margin of pages on each side, are filtered
+and formatted again and spliced into the previous result.txt.
+
+Only body/result.txt is spliced, filtered_diffs.bin is not written. The footnotes have no
+page shards, their flow diffs them in full, and the combined and marker outputs are made
+again in full by reconstruction.merge_volume from result.txt and footnotes.yaml, which
+costs a pass over the texts and no diff.
+"""
+import argparse
+import hashlib
+import json
+from bisect import bisect_left
+from pathlib import Path
+
+from diff_cache import make_key
+from diff_index import PageIndex
+from reconstruction import (
+    BODY_PAGE_PATTERN,
+    get_page_pattern,
+    get_text_paths,
+    iter_filter_diffs,
+    iter_format_diff,
+    load_diffs,
+    reformatting_body,
+    stream_body,
+    to_store,
+)
+from sharding import BODY_ANCHORS, diff_shard, get_cut_points, run_sharded, stitch_diffs
+
+MANIFEST_NAME = "incremental.json"
+MARGIN = 1  # pages filtered again on each side of the pages holding new diffs
+FILTER_CONTEXT = 64  # diffs given to the filter before and after the re-filtered pages
+
+
+def get_file_hash(path):
+    return hashlib.sha256(Path(path).read_bytes()).hexdigest()
+
+
+def split_texts(text1, text2, cuts):
+    """Split both texts at cut points into shards as (text1 shard, text2 shard)."""
+    cuts = [[0, 0]] + cuts + [[len(text1), len(text2)]]
+    return [(text1[start1:end1], text2[start2:end2]) for (start1, start2), (end1, end2) in zip(cuts, cuts[1:])]
+
+
+def split_diffs(diffs, cuts):
+    """Split a diff list at cut points of both texts, undoing sharding.stitch_diffs.
+
+    Args:
+        diffs (iterable): diffs of the whole texts
+        cuts (list): cut points as [text1 offset, text2 offset]
+
+    Returns:
+        list: diff list of each shard
+    """
+    shard_diffs = [[]]
+    cut_walker = 0
+    pos1 = pos2 = 0
+    for diff in diffs:
+        op, text = diff[0], diff[1]
+        is_split = False
+        while cut_walker < len(cuts):
+            cut1, cut2 = cuts[cut_walker]
+            # chars of the diff before the cut, the cut has to be on the diff on both sides
+            if op == 0:
+                before = cut1 - pos1 if cut1 - pos1 == cut2 - pos2 else -1
+            elif op == -1:
+                before = cut1 - pos1 if cut2 == pos2 else -1
+            else:
+                before = cut2 - pos2 if cut1 == pos1 else -1
+            if not 0 <= before < len(text):
+                break
+            if before:
+                shard_diffs[-1].append([op, text[:before]])
+            shard_diffs.append([])
+            cut_walker += 1
+            is_split = True
+            text = text[before:]
+            pos1 += before if op != 1 else 0
+            pos2 += before if op != -1 else 0
+        if text or not is_split:
+            shard_diffs[-1].append([op, text])
+        pos1 += len(text) if op != 1 else 0
+        pos2 += len(text) if op != -1 else 0
+    if cut_walker < len(cuts):
+        raise ValueError(f"cut {cuts[cut_walker]} is not a boundary of the diffs")
+    return shard_diffs
+
+
+def get_common_ends(old_keys, keys):
+    """Return the numbers of shards shared by the start and by the end of two shard lists."""
+    prefix = 0
+    while prefix < min(len(old_keys), len(keys)) and old_keys[prefix] == keys[prefix]:
+        prefix += 1
+    suffix = 0
+    while suffix < min(len(old_keys), len(keys)) - prefix and old_keys[-1 - suffix] == keys[-1 - suffix]:
+        suffix += 1
+    return prefix, suffix
+
+
+def load_manifest(dir_path, image_info, backend):
+    """Return the manifest of the previous run if its outputs are still the ones it made, else None."""
+    manifest_path = dir_path / MANIFEST_NAME
+    diffs_path = dir_path / "diffs.bin"
+    result_path = dir_path / "result.txt"
+    if not (manifest_path.is_file() and diffs_path.is_file() and result_path.is_file()):
+        return None
+    manifest = json.loads(manifest_path.read_text(encoding="utf-8"))
+    if (
+        manifest["vol_num"] != image_info[1]
+        or manifest["backend"] != backend
+        or manifest["diffs"] != get_file_hash(diffs_path)
+        or manifest["result"] != get_file_hash(result_path)
+    ):
+        print("[INFO] Outputs changed since the last incremental run, reconstructing the whole body ...")
+        return None
+    return manifest
+
+
+def get_page_diffs(page_index, vol_num):
+    """Return the index of each pedurma page diff, each one gives a page annotation of the result.
+
+    The page index holds the page numbers of the namsel text, only the diffs holding one are
+    checked like iter_filter_diffs does.
+    """
+    page_pattern = get_page_pattern(vol_num)
+    diffs = page_index.diffs
+    return [i for i in page_index.get_page_starts() if diffs[i][0] == -1 and page_pattern.search(diffs[i][1])]
+
+
+def get_shards_span(diff_index, cuts, first_shard, end_shard):
+    """Return the first and end index of the diffs of the shards from first_shard to end_shard excluded."""
+    bounds = [[0, 0]] + cuts + [[diff_index.starts1[-1], diff_index.starts2[-1]]]
+    (start1, start2), (end1, end2) = bounds[first_shard], bounds[end_shard]
+    ranges = [diff_index.get_range(start1, end1, side=1), diff_index.get_range(start2, end2, side=2)]
+    return min(diff_range.start for diff_range in ranges), max(diff_range.stop for diff_range in ranges)
+
+
+def get_filter_start(diffs, index):
+    """Move the start of a filtered span back until it starts with three diffs kept as they are.
+
+    The filter looks back at the last three diffs it kept after each diff only in namsel.
+    """
+    index = max(index, 0)
+    while index > 0 and -1 in [diff[0] for diff in diffs[index : index + 3]]:
+        index -= 1
+    return index
+
+
+def get_filter_end(diffs, index):
+    """Move the end of a filtered span forward until it ends with a diff kept as it is.
+
+    The filter edits the diff after each diff only in namsel.
+    """
+    index = min(index, len(diffs))
+    while index < len(diffs) and diffs[index - 1][0] == -1:
+        index += 1
+    return index
+
+
+def splice_pages(result, diffs, page_diffs, old_n_pages, span, image_info, margin=MARGIN):
+    """Filter and format again the pages of a diff span and splice them into the previous result.
+
+    A page ends with its annotation. The pages from the one before the span to the one after
+    it, widened by margin, are replaced, the pages before and after them are kept as they are.
+
+    Args:
+        result (str): previous body result
+        diffs (list): new diffs of the whole body
+        page_diffs (list): index of each pedurma page diff in diffs
+        old_n_pages (int): number of page annotations in result
+        span (tuple): first and end index of the new diffs
+        image_info (list): contains work_id, volume number and image source offset
+        margin (int): pages filtered again on each side of the span
+
+    Returns:
+        str: new body result, None if the filtered pages do not line up with the page diffs
+        int: number of pages filtered again
+    """
+    # replaced text runs from after the annotation of page first to the end of the one of page last
+    first = max(bisect_left(page_diffs, span[0]) - 1 - margin, -1)
+    last = min(bisect_left(page_diffs, span[1]) + margin, len(page_diffs))
+    start = get_filter_start(diffs, page_diffs[first] - FILTER_CONTEXT) if first >= 0 else 0
+    end = get_filter_end(diffs, page_diffs[last] + FILTER_CONTEXT + 1) if last < len(page_diffs) else len(diffs)
+    text = "".join(iter_format_diff(iter_filter_diffs(diffs[start:end], image_info), image_info, type_="body"))
+    ann_ends = [ann.end() for ann in BODY_PAGE_PATTERN.finditer(text)]
+    first_page = bisect_left(page_diffs, start)
+    if len(ann_ends) != bisect_left(page_diffs, end) - first_page:
+        return None, 0
+    new_start = ann_ends[first - first_page] if first >= 0 else 0
+    new_end = ann_ends[last - first_page] if last < len(page_diffs) else len(text)
+
+    old_ann_ends = [ann.end() for ann in BODY_PAGE_PATTERN.finditer(result)]
+    if len(old_ann_ends) != old_n_pages:
+        return None, 0
+    old_start = old_ann_ends[first] if first >= 0 else 0
+    # the pages after the span are the same, counted from the end
+    old_last = last + len(old_ann_ends) - len(page_diffs)
+    old_end = old_ann_ends[old_last] if last < len(page_diffs) else len(result)
+    pages = reformatting_body(text[new_start:new_end])
+    return result[:old_start] + pages + result[old_end:], last - first
+
+
+def update_body(text1, text2, dir_path, image_info, backend="node", n_workers=1, margin=MARGIN, review=False):
+    """Reconstruct the body diffing and filtering again only the pages changed since the last run.
+
+    The first run, or a run after the outputs were made by another flow, diffs every page
+    shard and filters the whole body.
+
+    Args:
+        text1 (str): namsel body text
+        text2 (str): transfered body text
+        dir_path (path): body directory where diffs.bin, result.txt and the manifest are
+        image_info (list): contains work_id, volume number and image source offset
+        backend (str): diff backend, see utils.get_dmp
+        n_workers (int): number of processes diffing the changed shards
+        margin (int): pages filtered again on each side of the changed pages
+        review (bool): whether to also dump the diffs as yaml for human review
+
+    Returns:
+        dict: numbers of shards, of shards diffed again and of pages filtered again
+    """
+    cuts = get_cut_points(text1, text2, BODY_ANCHORS)
+    shards = split_texts(text1, text2, cuts)
+    keys = [make_key(*shard, backend) for shard in shards]
+    manifest = load_manifest(dir_path, image_info, backend)
+    previous = {}
+    if manifest:
+        old_diffs = load_diffs(dir_path / "diffs.bin")
+        previous = dict(zip(manifest["keys"], split_diffs(old_diffs, manifest["cuts"])))
+        del old_diffs
+    shard_diffs = [previous.get(key) for key in keys]
+    changed = [i for i, shard in enumerate(shard_diffs) if shard is None]
+    counts = {"shards": len(shards), "diffed_shards": len(changed), "refiltered_pages": 0}
+    if manifest and keys == manifest["keys"]:
+        print("[INFO] No page changed since the last run.")
+        return counts
+    print(f"[INFO] Diffing {len(changed)} of {len(shards)} page shards ...")
+    new_diffs = run_sharded(diff_shard, [(*shards[i], backend) for i in changed], n_workers)
+    for i, shard in zip(changed, new_diffs):
+        shard_diffs[i] = [[op, text] for op, text in shard]
+    diffs = stitch_diffs(shard_diffs)
+    page_index = PageIndex(diffs, side=1, pattern=get_page_pattern(image_info[1]))
+    page_diffs = get_page_diffs(page_index, image_info[1])
+
+    result_path = dir_path / "result.txt"
+    result = None
+    if manifest:
+        # shards moved, added or removed are all between the unchanged first and last shards
+        prefix, suffix = get_common_ends(manifest["keys"], keys)
+        result, counts["refiltered_pages"] = splice_pages(
+            result_path.read_text(encoding="utf-8"),
+            diffs,
+            page_diffs,
+            manifest["pages"],
+            get_shards_span(page_index.diff_index, cuts, prefix, len(keys) - suffix),
+            image_info,
+            margin,
+        )
+    if result is None:
+        print("[INFO] Filtering the whole body ...")
+        with result_path.open("w", encoding="utf-8") as result_file:
+            stream_body(diffs, image_info, result_file)
+        counts["refiltered_pages"] = len(page_diffs) + 1
+    else:
+        result_path.write_text(result, encoding="utf-8")
+    to_store(diffs, dir_path, type_="diffs", review=review)
+    manifest = {
+        "vol_num": image_info[1],
+        "backend": backend,
+        "cuts": cuts,
+        "keys": keys,
+        "pages": len(page_diffs),
+        "diffs": get_file_hash(dir_path / "diffs.bin"),
+        "result": get_file_hash(result_path),
+    }
+    (dir_path / MANIFEST_NAME).write_text(json.dumps(manifest), encoding="utf-8")
+    return counts
+
+
+if __name__ == "__main__":
+    # after a hand edit of the body inputs: python incremental.py data/v073 73
+    parser = argparse.ArgumentParser(description="Reconstruct again the body pages changed by an edit.")
+    parser.add_argument("base_path", type=Path, help="volume directory like data/v073")
+    parser.add_argument("vol_num", type=int)
+    parser.add_argument("--work-id", default="W1PD96682", choices=["W1PD96682", "W1PD95844"])
+    parser.add_argument("--offset", type=int, default=16, help="image source offset of the volume")
+    parser.add_argument("--backend", default="node")
+    parser.add_argument("--workers", type=int, default=1)
+    parser.add_argument("--margin", type=int, default=MARGIN)
+    args = parser.parse_args()
+    namsel_text_path, google_text_path = get_text_paths(args.base_path, args.vol_num, "body")
+    counts = update_body(
+        namsel_text_path.read_text(encoding="utf-8"),
+        google_text_path.read_text(encoding="utf-8"),
+        args.base_path / "body",
+        [args.work_id, args.vol_num, args.offset],
+        args.backend,
+        args.workers,
+        args.margin,
+    )
+    print(f"[INFO] {counts}")
@@ -0,0 +1,161 @@
+# coding='utf-8'
+
+"""
+Stage instrumentation
+Records wall time, cpu time, peak memory and counts (chars, diffs, markers, pages) of every
+pipeline stage run while a Metrics collector is active, and writes them as a json report per
+volume. Outside of a collector the stages cost a function call, so it can be left on.
+"""
+import json
+import sys
+import time
+import tracemalloc
+from contextlib import contextmanager
+from functools import wraps
+from pathlib import Path
+
+try:
+    import resource
+except ImportError:  # windows
+    resource = None
+
+try:
+    import fcntl
+except ImportError:  # windows
+    fcntl = None
+
+_collector = None
+
+
+def get_peak_rss():
+    """Return the peak resident memory of the process in MB, None if unknown."""
+    if resource is None:
+        return None
+    peak_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # ru_maxrss is in bytes on mac and in kilobytes elsewhere
+    return round(peak_rss / 1024 ** (2 if sys.platform == "darwin" else 1), 1)
+
+
+class Metrics:
+    """Collector of stage metrics.
+
+    Args:
+        trace_memory (bool): whether to also record the tracemalloc peak of each stage, which
+            is more precise than the process peak RSS but slows python allocations down.
+    """
+
+    def __init__(self, trace_memory=False):
+        self.trace_memory = trace_memory
+        self.stages = []
+
+    @contextmanager
+    def stage(self, name, **counts):
+        """Record a stage, counts known only at the end can be added to the yielded dict."""
+        if self.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+            tracemalloc.reset_peak()
+        wall_start = time.perf_counter()
+        cpu_start = time.process_time()
+        try:
+            yield counts
+        finally:
+            record = {
+                "stage": name,
+                "wall_time": round(time.perf_counter() - wall_start, 4),
+                "cpu_time": round(time.process_time() - cpu_start, 4),
+                "peak_rss_mb": get_peak_rss(),
+            }
+            if self.trace_memory:
+                record["tracemalloc_peak_mb"] = round(tracemalloc.get_traced_memory()[1] / 1024 ** 2, 1)
+            record["counts"] = counts
+            self.stages.append(record)
+
+    def to_dict(self):
+        return {
+            "wall_time": round(sum(record["wall_time"] for record in self.stages), 4),
+            "cpu_time": round(sum(record["cpu_time"] for record in self.stages), 4),
+            "peak_rss_mb": get_peak_rss(),
+            "stages": self.stages,
+        }
+
+
+@contextmanager
+def collect(metrics):
+    """Make metrics the collector of every stage run inside the block."""
+    global _collector
+    previous, _collector = _collector, metrics
+    try:
+        yield metrics
+    finally:
+        _collector = previous
+
+
+@contextmanager
+def stage(name, **counts):
+    """Record a stage in the active collector, if any.
+
+    Args:
+        name (str): stage name
+        counts: counts known at the start of the stage like input chars
+    Yields:
+        dict: counts, counts known at the end of the stage can be added to it
+    """
+    if _collector is None:
+        yield counts
+    else:
+        with _collector.stage(name, **counts) as stage_counts:
+            yield stage_counts
+
+
+def measured(name=None, count=None):
+    """Decorate a function to record it as a stage.
+
+    Args:
+        name (str): stage name, defaults to the function name
+        count (callable): maps (result, *args) to a dict of counts
+    """
+
+    def decorator(func):
+        stage_name = name or func.__name__
+
+        @wraps(func)
+        def wrapper(*args, **kwargs):
+            if _collector is None:
+                return func(*args, **kwargs)
+            with _collector.stage(stage_name) as counts:
+                result = func(*args, **kwargs)
+                if count is not None:
+                    counts.update(count(result, *args))
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def text_counts(result, text, *args):
+    """Count input and output chars of a text to text stage."""
+    return {"input_chars": len(text), "output_chars": len(result)}
+
+
+def update_report(report_path, part, metrics):
+    """Write the metrics of one part of a volume to the volume json report.
+
+    The body and footnotes of a volume may run in different processes, so the report is
+    read and rewritten under a file lock.
+
+    Args:
+        report_path (path): json report path
+        part (str): report section like body, footnotes or merge
+        metrics (Metrics): collected metrics
+    """
+    report_path = Path(report_path)
+    with report_path.with_suffix(".lock").open("w") as lock_file:
+        if fcntl is not None:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+        report = {}
+        if report_path.is_file():
+            report = json.loads(report_path.read_text(encoding="utf-8"))
+        report[part] = metrics.to_dict()
+        report_path.write_text(json.dumps(report, indent=2, ensure_ascii=False), encoding="utf-8")
@@ -0,0 +1,33 @@
+# coding='utf-8'
+
+"""
+Rule normalizer
+The preprocess rule tables are lists of [pattern, replacement] applied with one re.sub after
+the other. Normalizer compiles the patterns of a table once, so normalizing a text only runs
+the substitutions.
+"""
+import re
+
+
+class Normalizer:
+    """Compiled preprocess rule table.
+
+    Args:
+        patterns (list): [pattern, template] rules applied in order, as with re.sub
+    """
+
+    def __init__(self, patterns):
+        self.patterns = patterns
+        self.rules = [(re.compile(pattern), template) for pattern, template in patterns]
+
+    def __call__(self, text):
+        """Normalize text.
+
+        Args:
+            text (str): text to normalize
+        Returns:
+            str: normalized text
+        """
+        for pattern, template in self.rules:
+            text = pattern.sub(template, text)
+        return text
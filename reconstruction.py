@@ -10,16 +10,72 @@ A and B, then filter the annotations(dmp diffs) we want to transfer and then app
 text B.
 """
 import re
-from itertools import zip_longest
+from collections import namedtuple
+from itertools import count, zip_longest
+from functools import lru_cache
 import unicodedata
 from pathlib import Path
 from functools import partial
 import yaml
-from diff_match_patch import diff_match_patch
 from preprocess import preprocess_google_notes, preprocess_namsel_notes
-from utils import optimized_diff_match_patch
+from utils import get_dmp
+from sharding import FOOTNOTES_ANCHORS, get_sharded_diffs, get_sharded_transfer
+from diff_cache import DiffCache, make_key
+from diff_store import DiffStore, from_diff_store, to_diff_store
 from antx import transfer
 from horology import timed
+from metrics import Metrics, collect, measured, stage, text_counts, update_report
+from normalizer import Normalizer
+from volume import get_image_link, load_volume
+from volume_store import VolumeStore, write_body_result
+
+ABS_MARKER_PATTERNS = [re.compile("[①-⓪]+"), re.compile("[༠-༩]+"), re.compile("[0-9]+")]
+EXCEP_MARKER_PATTERNS = [re.compile("<m(.+?)>"), re.compile("(.*#.*)")]
+SPACES_PATTERN = re.compile("\u0020+")
+CIRCLE_NUMBER_PATTERN = re.compile("[①-⓪]")
+MULTI_MARKER_PATTERN = re.compile(r"(\n<\d+,)([①-⓪]{2,})(>.+)")
+MULTI_NUMBER_PATTERN = re.compile(r"\d+\S+(\d+)")
+DIGIT_PATTERN = re.compile(r"\d")
+TIB_DIGITS = {"༠": "0", "༡": "1", "༢": "2", "༣": "3", "༤": "4", "༥": "5", "༦": "6", "༧": "7", "༨": "8", "༩": "9"}
+CIRCLE_NUMBERS = {
+    "⓪": "0",
+    "①": "1",
+    "②": "2",
+    "③": "3",
+    "④": "4",
+    "⑤": "5",
+    "⑥": "6",
+    "⑦": "7",
+    "⑧": "8",
+    "⑨": "9",
+    "⑩": "10",
+    "⑪": "11",
+    "⑫": "12",
+    "⑬": "13",
+    "⑭": "14",
+    "⑮": "15",
+    "⑯": "16",
+    "⑰": "17",
+    "⑱": "18",
+    "⑲": "19",
+    "⑳": "20",
+}
+MARKER_PATTERN = re.compile("<.+?>")
+NOTE_PATTERN = re.compile("<.+?>(.+?)")
+BODY_PAGE_PATTERN = re.compile(r"<p\S+?>")
+PAGE_REF_PATTERN = re.compile("<r.+?>")
+FILTER_LOOKBEHIND = 8
+# google ocr page headers, see strip_ocr_headers
+OCR_HEADER_PATTERN = "\n\n\n\n{1,18}.+\n(.{1,30}\n)?(.{1,15}\n)?(.{1,15}\n)?(.{1,15}\n)?"
+OCR_PAGE_BREAK = "\n\n\n\n"
+OCR_HEADER_MAX_NEWLINES = 21
+OCR_HEADER_LINES = (30, 15, 15, 15)
+NEWLINES_PATTERN = re.compile("\n*")
+PUNCTS = frozenset(["་", "།", "༔", ":", "། །", "༄", "༅"])
+VOWELS = ["\u0F74", "\u0F72", "\u0F7A", "\u0F7C"]
+EDITION_MARKS_NORMALIZER = Normalizer([["〈〈?", "«"], ["〉〉?", "»"], ["《", "«"], ["》", "»"]])
+
+DiffMarker = namedtuple("DiffMarker", ["kind", "marker", "value", "clean"])
 
 
 #@timed(unit="min")
@@ -33,53 +89,131 @@ def preprocess_footnotes(B, A):
         str: normalised target text
         str: normalised source text
     """
-    patterns = [["〈〈?", "«"], ["〉〉?", "»"], ["《", "«"], ["》", "»"]]
-    clean_namsel_text = B
-    clean_google_text = A
-    for pattern in patterns:
-        clean_namsel_text = re.sub(pattern[0], pattern[1], clean_namsel_text)
-        clean_google_text = re.sub(pattern[0], pattern[1], clean_google_text)
+    clean_namsel_text = EDITION_MARKS_NORMALIZER(B)
+    clean_google_text = EDITION_MARKS_NORMALIZER(A)
     return clean_namsel_text, clean_google_text
 
 
+def strip_ocr_headers(text):
+    """Remove the page headers of google ocr in a single scan.
+
+    Gives the result of re.sub(OCR_HEADER_PATTERN, "\\n\\n\\n", text) without its backtracking on
+    long runs of blank lines: a page break is a run of at least 4 newlines, of which at most the
+    last 21 are replaced, the header is the next line and then at most a line of up to 30 chars
+    and three lines of up to 15 chars, up to the first longer or empty line.
+
+    Args:
+        text (str): google ocr
+
+    Returns:
+        str: header removed
+        list: number of headers removed on each page, the first page being the text before the
+            first page break
+    """
+    chunks = []
+    headers_per_page = [0]
+    copied = 0
+    pos = 0
+    while True:
+        run_start = text.find(OCR_PAGE_BREAK, pos)
+        if run_start == -1:
+            break
+        run_end = NEWLINES_PATTERN.match(text, run_start).end()
+        line_end = text.find("\n", run_end)
+        if line_end == -1:
+            # no header line ending with a newline, nor any page break left
+            headers_per_page.append(0)
+            break
+        headers_per_page.append(1)
+        pos = line_end + 1
+        for max_len in OCR_HEADER_LINES:
+            if pos == len(text) or text[pos] == "\n":
+                break
+            line_end = text.find("\n", pos + 1, pos + max_len + 1)
+            if line_end == -1:
+                break
+            pos = line_end + 1
+        chunks.append(text[copied : max(run_start, run_end - OCR_HEADER_MAX_NEWLINES)])
+        chunks.append("\n\n\n")
+        copied = pos
+    chunks.append(text[copied:])
+    return "".join(chunks), headers_per_page
+
+
 #@timed(unit="min")
 def rm_google_ocr_header(text):
     """Remove header of google ocr.
 
+    The headers removed per page are recorded in the stage metrics, pages without header hint
+    at a header missed by the ocr layout or at a page break inside a page.
+
     Args:
         text (str): google ocr
 
     Returns:
         str: header removed
     """
-    header_pattern = "\n\n\n\n{1,18}.+\n(.{1,30}\n)?(.{1,15}\n)?(.{1,15}\n)?(.{1,15}\n)?"
-    result = re.sub(header_pattern, "\n\n\n", text)
+    with stage("rm_google_ocr_header", input_chars=len(text)) as counts:
+        result, headers_per_page = strip_ocr_headers(text)
+        counts["output_chars"] = len(result)
+        counts["pages"] = len(headers_per_page)
+        counts["headers"] = sum(headers_per_page)
+        counts["pages_without_header"] = [
+            page for page, headers in enumerate(headers_per_page) if not headers
+        ]
     return result
 
 
 
 @timed(unit="min")
-def get_diffs(text1, text2, optimized= True):
+def get_diffs(text1, text2, optimized= True, n_workers=1, backend=None, cache=None):
     """Compute diff between source and target with DMP.
 
     Args:
         source (str): source text
         target (str): target text
         optimized (bool): whether to use optimized dmp with node.
+        n_workers (int): number of processes, text is diffed page shard by page shard if more than one.
+        backend (str): diff backend ("node", "python", "syllable" or "anchored"), overrides optimized.
+        cache (DiffCache): diff cache, diffs of unchanged texts are loaded from it if given.
     Returns:
         list: list of diffs
     """
     print("[INFO] Computing diffs ...")
-    if optimized:
-        dmp = optimized_diff_match_patch()
+    if backend is None:
+        backend = "node" if optimized else "python"
+    if cache is not None:
+        key = make_key(text1, text2, backend, extra=f"shards={n_workers}")
+        return cache.get_or_compute(key, partial(get_diffs, text1, text2, n_workers=n_workers, backend=backend))
+    if n_workers > 1:
+        diffs = get_sharded_diffs(text1, text2, n_workers, backend=backend)
     else:
-        dmp = diff_match_patch()
-        dmp.Diff_Timeout = 0  # compute diff till end of file
-    diffs = dmp.diff_main(text1, text2)
+        dmp = get_dmp(backend)
+        diffs = dmp.diff_main(text1, text2)
     print("[INFO] Diff computed!")
     return diffs
 
 
+def get_footnotes_diffs(source, annotations, target, n_workers=1, cache=None):
+    """Transfer annotations from namsel footnotes to google footnotes.
+
+    Args:
+        source (str): preprocessed namsel footnotes
+        annotations (list): ['annotation type', '(regex to detect the annotations)']
+        target (str): preprocessed google footnotes
+        n_workers (int): number of processes, text is transfered page shard by page shard if more than one.
+        cache (DiffCache): diff cache, diffs of unchanged texts are loaded from it if given.
+    Returns:
+        list: list of diffs with annotation tags
+    """
+    if cache is not None:
+        key = make_key(source, target, "transfer", extra=f"{annotations} shards={n_workers}")
+        return cache.get_or_compute(key, partial(get_footnotes_diffs, source, annotations, target, n_workers))
+    if n_workers > 1:
+        return get_sharded_transfer(source, annotations, target, n_workers, FOOTNOTES_ANCHORS)
+    return transfer(source, annotations, target)
+
+
 #@timed(unit="min")
 def to_yaml(list_, vol_path, type_=None):
     """Dump list to yaml and write the yaml to a file on mentioned path.
@@ -110,6 +244,69 @@ def from_yaml(path):
     return diffs_list
 
 
+def to_store(list_, vol_path, type_=None, review=False):
+    """Write diff list to a binary diff store on mentioned path.
+
+    Args:
+        list_ (list): list of diffs
+        vol_path (path): base path object
+        type_ (str, optional): type of list you want to store. Defaults to None.
+        review (bool): whether to also dump the list as yaml for human review.
+    """
+    to_diff_store(list_, vol_path / f"{type_}.bin")
+    if review:
+        to_yaml(list_, vol_path, type_=type_)
+
+
+def load_diffs(path):
+    """Load diff list from a binary diff store or from a yaml dump.
+
+    Args:
+        path (path): path object of the store or the yaml
+    Returns:
+        list: list of diffs
+    """
+    if path.suffix == ".yaml":
+        return from_yaml(path)
+    return from_diff_store(path)
+
+
+def iter_diffs(path):
+    """Iterate over the diffs of a binary diff store without loading the whole list.
+
+    Args:
+        path (path): path object of the store or the yaml
+    Yields:
+        list: diff
+    """
+    if path.suffix == ".yaml":
+        yield from from_yaml(path)
+        return
+    with DiffStore(path) as diffs:
+        yield from diffs
+
+
+def iter_windows(diffs):
+    """Iterate over diffs with their left and right neighbours.
+
+    The diffs are copied, so edits made to the right neighbour are kept when it becomes
+    the current diff without touching the input diffs.
+
+    Args:
+        diffs (iterable): diffs
+    Yields:
+        list: previous, current and next diff, None at the edges
+    """
+    prev_diff = cur_diff = None
+    for diff in diffs:
+        next_diff = list(diff)
+        if cur_diff is not None:
+            yield [prev_diff, cur_diff, next_diff]
+        prev_diff, cur_diff = cur_diff, next_diff
+    if cur_diff is not None:
+        yield [prev_diff, cur_diff, None]
+
+
 # HACK is that useful?
 # @timed(unit="min")
 def rm_noise(diff):
@@ -120,17 +317,11 @@ def rm_noise(diff):
     Returns:
         str: cleaned diff text
     """
-    result = diff
-    patterns = [
-        "\n",
-        "\u0020+",
-        "་+?",
-    ]
-    for pattern in patterns:
-        noise = re.search(pattern, diff)
-        if noise:
-            result = result.replace(noise[0], "")
-    return result
+    result = diff.replace("\n", "")
+    spaces = SPACES_PATTERN.search(diff)
+    if spaces:
+        result = result.replace(spaces[0], "")
+    return result.replace("་", "")
 
 
 #@timed(unit="min")
@@ -180,14 +371,9 @@ def get_abs_marker(diff):
         str: footnotes marker
     """
     marker_ = ""
-    patterns = [
-        "[①-⓪]+",
-        "[༠-༩]+",
-        "[0-9]+",
-    ]
-    for pattern in patterns:
-        if re.search(pattern, diff):
-            marker = re.search(pattern, diff)
+    for pattern in ABS_MARKER_PATTERNS:
+        marker = pattern.search(diff)
+        if marker:
             marker_ += marker[0]
     return marker_
 
@@ -203,11 +389,9 @@ def get_excep_marker(diff):
         str: exception marker
     """
     marker_ = ""
-    patterns = ["<m(.+?)>", "(.*#.*)"]
-    for pattern in patterns:
-        marker = re.search(pattern, diff)
-        if re.search(pattern, diff):
-            marker = re.search(pattern, diff)
+    for pattern in EXCEP_MARKER_PATTERNS:
+        marker = pattern.search(diff)
+        if marker:
             marker_ = marker.group(1)
     return marker_
 
@@ -222,10 +406,7 @@ def is_punct(char):
     Returns:
         flag: true if char is punctuation false if not
     """
-    if char in ["་", "།", "༔", ":", "། །", "༄", "༅"]:
-        return True
-    else:
-        return False
+    return char in PUNCTS
 
 
 # @timed(unit="min")
@@ -238,12 +419,7 @@ def isvowel(char):
     Returns:
         boolean: true for vowel and false for otherwise
     """
-    flag = False
-    vowels = ["\u0F74", "\u0F72", "\u0F7A", "\u0F7C"]
-    for pattern in vowels:
-        if re.search(pattern, char):
-            flag = True
-    return flag
+    return any(vowel in char for vowel in VOWELS)
 
 
 # @timed(unit="min")
@@ -354,14 +530,7 @@ def get_marker(diff):
     Returns:
         str: marker
     """
-    if get_abs_marker(diff):
-        marker = get_abs_marker(diff)
-        return marker
-    elif get_excep_marker(diff):
-        marker = get_excep_marker(diff)
-        return marker
-    else:
-        return ""
+    return classify_diff(diff).marker
 
 
 # @timed(unit="min")
@@ -375,32 +544,9 @@ def is_circle_number(footnotes_marker):
         str: number inside the circle
     """
     value = ""
-    number = re.search("[①-⓪]", footnotes_marker)
+    number = CIRCLE_NUMBER_PATTERN.search(footnotes_marker)
     if number:
-        circle_num = {
-            "⓪": "0",
-            "①": "1",
-            "②": "2",
-            "③": "3",
-            "④": "4",
-            "⑤": "5",
-            "⑥": "6",
-            "⑦": "7",
-            "⑧": "8",
-            "⑨": "9",
-            "⑩": "10",
-            "⑪": "11",
-            "⑫": "12",
-            "⑬": "13",
-            "⑭": "14",
-            "⑮": "15",
-            "⑯": "16",
-            "⑰": "17",
-            "⑱": "18",
-            "⑲": "19",
-            "⑳": "20",
-        }
-        value = circle_num.get(number[0])
+        value = CIRCLE_NUMBERS.get(number[0])
     return value
 
 
@@ -414,27 +560,10 @@ def translate_tib_number(footnotes_marker):
         str: footnotes marker having numbers in roman numeral
     """
     value = ""
-    if re.search("\d+\S+(\d+)", footnotes_marker):
+    if MULTI_NUMBER_PATTERN.search(footnotes_marker):
         return value
-    tib_num = {
-        "༠": "0",
-        "༡": "1",
-        "༢": "2",
-        "༣": "3",
-        "༤": "4",
-        "༥": "5",
-        "༦": "6",
-        "༧": "7",
-        "༨": "8",
-        "༩": "9",
-    }
-    numbers = re.finditer("\d", footnotes_marker)
-    if numbers:
-        for number in numbers:
-            if re.search("[༠-༩]", number[0]):
-                value += tib_num.get(number[0])
-            else:
-                value += number[0]
+    for number in DIGIT_PATTERN.finditer(footnotes_marker):
+        value += TIB_DIGITS.get(number[0], number[0])
     return value
 
 
@@ -447,19 +576,32 @@ def get_value(footnotes_marker):
     Returns:
         str: numbers in footnotes marker
     """
-    value = ""
-    if is_circle_number(footnotes_marker):
-        value = is_circle_number(footnotes_marker)
-        return value
-    elif translate_tib_number(footnotes_marker):
-        value = translate_tib_number(footnotes_marker)
-        return value
-    return value
+    return is_circle_number(footnotes_marker) or translate_tib_number(footnotes_marker) or ""
+
+
+@lru_cache(maxsize=65536)
+def classify_diff(diff):
+    """Classify a diff text once for both the filtering and the formatting stages.
+
+    Args:
+        diff (str): diff text
+    Returns:
+        DiffMarker: marker kind ("absolute", "exception" or ""), marker, numeric value of
+            absolute marker and noise-stripped diff text
+    """
+    clean = rm_noise(diff)
+    marker = get_abs_marker(diff)
+    if marker:
+        return DiffMarker("absolute", marker, get_value(marker), clean)
+    marker = get_excep_marker(diff)
+    if marker:
+        return DiffMarker("exception", marker, "", clean)
+    return DiffMarker("", "", "", clean)
 
 
 
 #@timed(unit="min")
-def format_diff(filter_diffs_yaml_path, image_info, type_=None):
+def format_diff(filter_diffs_path, image_info, type_=None):
     """Format list of diff on target text.
 
     Args:
@@ -469,30 +611,38 @@ def format_diff(filter_diffs_yaml_path, image_info, type_=None):
     Returns:
         str: target text with transfered annotations with markers.
     """
-    diffs = from_yaml(filter_diffs_yaml_path)
+    diffs = load_diffs(filter_diffs_path)
+    return "".join(iter_format_diff(diffs, image_info, type_=type_))
+
+
+def iter_format_diff(diffs, image_info, type_=None):
+    """Format filtered diffs on target text chunk by chunk.
+
+    Args:
+        diffs (iterable): filtered diffs
+        image_info (list): contains work_id, volume number and image source offset
+        type_ (str): diff type can be footnotes or body
+    Yields:
+        str: chunk of target text with transfered annotations with markers.
+    """
     vol_num = image_info[1]
-    result = ""
     for diff_type, diff_text, diff_tag in diffs:
         if diff_type == 1 or diff_type == 0:
             if diff_tag:
                 if diff_tag == "pedurma-page" and type_ == "body":
-                    result += get_pg_ann(diff_text, vol_num)
+                    yield get_pg_ann(diff_text, vol_num)
                 if diff_tag == "marker":
-                    if get_abs_marker(diff_text):
-                        marker = get_abs_marker(diff_text)
-                        value = get_value(marker)
-                        result += f"<{value},{marker}>"
-                    elif get_excep_marker(diff_text):
-                        marker = get_excep_marker(diff_text)
-                        result += f"<{marker}>"
+                    diff_marker = classify_diff(diff_text)
+                    if diff_marker.kind == "absolute":
+                        yield f"<{diff_marker.value},{diff_marker.marker}>"
+                    elif diff_marker.kind == "exception":
+                        yield f"<{diff_marker.marker}>"
                     else:
-                        result += f"<{diff_text}>"
+                        yield f"<{diff_text}>"
                 elif diff_tag == "pg_ref":
-                    result += diff_text
+                    yield diff_text
             else:
-                result += diff_text
-
-    return result
+                yield diff_text
 
 
 #@timed(unit="min")
@@ -505,19 +655,59 @@ def reformatting_body(text):
     Returns:
         str: formatted text
     """
-    result = ""
-    page_anns = re.findall("<p\S+?>", text)
-    pages = re.split("<p\S+?>", text)
+    result = []
+    page_anns = BODY_PAGE_PATTERN.findall(text)
+    pages = BODY_PAGE_PATTERN.split(text)
     for page, ann in zip_longest(pages, page_anns, fillvalue=""):
-        markers = re.finditer("<.+?>", page)
-        for i, marker in enumerate(markers, 1):
-            repl = f"<{i},{marker[0][1:-1]}>"
-            page = page.replace(marker[0], repl, 1)
-        result += page + ann
-    return result
+        result.append(renumber_markers(page))
+        result.append(ann)
+    return "".join(result)
+
+
+def stream_body(diffs, image_info, out_file):
+    """Filter, format and reformat body diffs page by page, writing each page once complete.
+
+    Args:
+        diffs (iterable): unfiltered body diffs
+        image_info (list): contains work_id, volume number and image source offset
+        out_file (file): text file the reformatted body is written to
+    Returns:
+        int: number of pages written
+    """
+    n_pages = 0
+    buffer = []
+    filtered_diffs = iter_filter_diffs(diffs, image_info)
+    for chunk in iter_format_diff(filtered_diffs, image_info, type_="body"):
+        buffer.append(chunk)
+        if not (chunk.startswith("<p") and chunk.endswith(">")):
+            continue
+        # the text ends with ">", so no page annotation can overlap the next chunks
+        text = "".join(buffer)
+        page_anns = BODY_PAGE_PATTERN.findall(text)
+        pages = BODY_PAGE_PATTERN.split(text)
+        for page, ann in zip(pages, page_anns):
+            out_file.write(renumber_markers(page) + ann)
+        n_pages += len(page_anns)
+        buffer = [pages[-1]]
+    out_file.write(reformatting_body("".join(buffer)))
+    return n_pages
+
+
+def renumber_markers(page):
+    """Prefix every marker of a page with its incremental number in a single pass.
+
+    Args:
+        page (str): content of page
+
+    Returns:
+        str: page with '<marker>' replaced by '<i,marker>'
+    """
+    counter = count(1)
+    return MARKER_PATTERN.sub(lambda marker: f"<{next(counter)},{marker[0][1:-1]}>", page)
 
 
 # @timed(unit="min")
+@measured(count=text_counts)
 def add_link(text, image_info):
     """Add link of source image page.
 
@@ -528,27 +718,12 @@ def add_link(text, image_info):
         str: target text with source image page link
     """
     result = ""
-
-    work = image_info[0]
-    vol = image_info[1]
-    pref = f"I{work[1:-3]}"
-    igroup = f"{pref}{783+vol}" if work == "W1PD96682" else f"{pref}{845+vol}"
-    offset = image_info[2]
-
     lines = text.splitlines()
     for line in lines:
         # detect page numbers and convert to image url
-        if re.search("<p.+?>", line):
-            pg_no = re.search("<p\d+-(\d+)>", line)
-            if re.search("[0-9]", pg_no.group(1)):
-                if len(pg_no.group(1)) > 3:
-                    pg_no = int(pg_no.group(1)[:3]) + offset
-                else:
-                    pg_no = int(pg_no.group(1)) + offset
-                link = f"[https://www.tbrc.org/browser/ImageService?work={work}&igroup={igroup}&image={pg_no}&first=1&last=2000&fetchimg=yes]"
-                result += line + "\n" + link + "\n"
-            else:
-                result += line + "\n"
+        link = get_image_link(line, image_info) if re.search("<p.+?>", line) else None
+        if link:
+            result += line + "\n" + link + "\n"
         else:
             result += line + "\n"
     return result
@@ -664,6 +839,7 @@ def double_marker_handler(result):
 
 
 #@timed(unit="min")
+@measured(count=text_counts)
 def reformat_footnotes(text):
     """Replace edition name with their respective unique id and brings every footnotes to newline.
     
@@ -694,7 +870,7 @@ def reformat_footnotes(text):
 
 
 #@timed(unit="min")
-def filter_diffs(diffs_yaml_path, type, image_info):
+def filter_diffs(diffs_path, type, image_info):
     """Filter diff of text A and text B.
 
     Args:
@@ -705,11 +881,49 @@ def filter_diffs(diffs_yaml_path, type, image_info):
     Returns:
         list: filtered diff
     """
+    return list(iter_filter_diffs(load_diffs(diffs_path), image_info))
+
+
+def flush_filtered(result):
+    """Pop the filtered diffs that the next filtering steps can no longer reach.
+
+    Filtering edits only the last few filtered diffs and looks back until the first marker
+    or punctuation, so everything before the last such stopper out of that tail is final.
+
+    Args:
+        result (list): filtered diffs not yielded yet
+    Returns:
+        list: final filtered diffs
+    """
+    for i in range(len(result) - FILTER_LOOKBEHIND, 0, -1):
+        if result[i][2] == "marker" or is_punct(result[i][1]):
+            done = result[:i]
+            del result[:i]
+            return done
+    return []
+
+
+def get_page_pattern(vol_num):
+    """Return the pattern of the pedurma page numbers like 73-12 of a volume in namsel diffs."""
+    return re.compile(f"{vol_num}་?\D་?\d+")
+
+
+def iter_filter_diffs(diffs, image_info):
+    """Filter diff of text A and text B looking at one diff and its neighbours at a time.
+
+    Args:
+        diffs (iterable): diffs
+        image_info (list): contains work_id, volume number and source image offset.
+
+    Yields:
+        list: filtered diff
+    """
     left_diff = [0, ""]
     result = []
-    vol_num = image_info[1]
-    diffs = from_yaml(diffs_yaml_path)
-    for i, diff in enumerate(diffs):
+    page_pattern = get_page_pattern(image_info[1])
+    for window in iter_windows(diffs):
+        yield from flush_filtered(result)
+        diff = window[1]
         if diff[0] == 0:  # in both
             result.append([diff[0], diff[1], ""])
         
@@ -717,28 +931,28 @@ def filter_diffs(diffs_yaml_path, type, image_info):
             result.append([diff[0], diff[1], ""])
         elif diff[0] == -1:  # in source
             
-            if re.search(
-                f"{vol_num}་?\D་?\d+", diff[1]
-            ):  # checking diff text is page or not
+            if page_pattern.search(diff[1]):  # checking diff text is page or not
                 result.append([1, diff[1], "pedurma-page"])
             else:
                 
-                if i > 0:  # extracting left context of current diff
-                    left_diff = diffs[i - 1]
-                if i < len(diffs) - 1:  # extracting right context of current diff
-                    right_diff = diffs[i + 1]
-                diff_ = rm_noise(diff[1])  # removes unwanted new line, space and punct
+                if window[0] is not None:  # extracting left context of current diff
+                    left_diff = window[0]
+                if window[2] is not None:  # extracting right context of current diff
+                    right_diff = window[2]
+                diff_marker = classify_diff(diff[1])
+                diff_ = diff_marker.clean  # removes unwanted new line, space and punct
+                marker = diff_marker.marker
                 if left_diff[0] == 0 and right_diff[0] == 0:
                     # checks if current diff text is located in middle of a syllable
-                    if is_midsyl(left_diff[1], right_diff[1],) and get_marker(diff[1]):
+                    if is_midsyl(left_diff[1], right_diff[1],) and marker:
                         handle_mid_syl(
-                            result, diffs, left_diff, i, diff, right_diff, marker_type="marker"
+                            result, window, left_diff, 1, diff, right_diff, marker_type="marker"
                         )
                     # checks if current diff text contains absolute marker or not
-                    elif get_marker(diff[1]):
+                    elif marker:
                         # Since cur diff is not mid syl, hence if any right diff starts with tseg will
                         # be shift to left last as there are no marker before tseg.
-                        tseg_shifter(result, diffs, left_diff, i, right_diff)
+                        tseg_shifter(result, window, left_diff, 1, right_diff)
                         result.append([1, diff_, "marker"])
                     # Since diff type of -1 is from namsel and till now we are not able to detect
                     # marker from cur diff, we will consider it as candidate marker.
@@ -751,27 +965,27 @@ def filter_diffs(diffs_yaml_path, type, image_info):
                         elif is_midsyl(left_diff[1], right_diff[1]):
                             handle_mid_syl(
                                 result,
-                                diffs,
+                                window,
                                 left_diff,
-                                i,
+                                1,
                                 diff,
                                 right_diff,
                                 marker_type="marker",
                             )
 
                         else:
-                            tseg_shifter(result, diffs, left_diff, i, right_diff)
+                            tseg_shifter(result, window, left_diff, 1, right_diff)
                             result.append([1, diff_, "marker"])
                 elif right_diff[0] == 1:
                     # Check if current diff is located in middle of syllabus or not.
-                    if is_midsyl(left_diff[1], right_diff[1]) and get_marker(diff[1]):
+                    if is_midsyl(left_diff[1], right_diff[1]) and marker:
                         handle_mid_syl(
-                            result, diffs, left_diff, i, diff, right_diff, marker_type="marker"
+                            result, window, left_diff, 1, diff, right_diff, marker_type="marker"
                         )
-                    elif get_marker(diff[1]):
+                    elif marker:
                         # Since cur diff is not mid syl, hence if any right diff starts with tseg will
                         # be shift to left last as there are no marker before tseg.
-                        tseg_shifter(result, diffs, left_diff, i, right_diff)
+                        tseg_shifter(result, window, left_diff, 1, right_diff)
                         result.append([1, diff_, "marker"])
                         # if "#" in right_diff[1]:
                         #     diffs[i + 1][1] = diffs[i + 1][1].replace("#", "")
@@ -784,28 +998,26 @@ def filter_diffs(diffs_yaml_path, type, image_info):
                             elif is_midsyl(left_diff[1], right_diff[1]):
                                 handle_mid_syl(
                                     result,
-                                    diffs,
+                                    window,
                                     left_diff,
-                                    i,
+                                    1,
                                     diff,
                                     right_diff,
                                     marker_type="marker",
                                 )
                             else:
-                                tseg_shifter(result, diffs, left_diff, i, right_diff)
+                                tseg_shifter(result, window, left_diff, 1, right_diff)
                                 result.append([1, diff_, "marker"])
                                 # if "#" in right_diff[1]:
                                 #     diffs[i + 1][1] = diffs[i + 1][1].replace("#", "")
                     # if diff_ is not empty and right diff is ['\n', ' '] then make it candidate markrer
                 double_marker_handler(result)
 
-    filter_diffs = result
-
-    return filter_diffs
+    yield from result
 
 
 #@timed(unit="min")
-def filter_footnotes_diffs(diffs_yaml_path, vol_num):
+def filter_footnotes_diffs(diffs_path, vol_num):
     """Filter the diffs of google ocr output and namsel ocr output.
 
     Args:
@@ -815,7 +1027,7 @@ def filter_footnotes_diffs(diffs_yaml_path, vol_num):
     Returns:
         list: filtered diff containing notes from google ocr o/p and marker from namsel ocr o/p
     """
-    diffs = from_yaml(diffs_yaml_path)
+    diffs = load_diffs(diffs_path)
     left_diff = [0, "", ""]
     filtered_diffs = []
     for i, diff in enumerate(diffs):
@@ -843,6 +1055,7 @@ def filter_footnotes_diffs(diffs_yaml_path, vol_num):
 
 
 #@timed(unit="min")
+@measured(count=lambda result, *args: {"pages": len(result)})
 def postprocess_footnotes(footnotes):
     """Save the formatted footnotes to dictionary with key as page ref and value as footnotes in that page.
     
@@ -853,24 +1066,21 @@ def postprocess_footnotes(footnotes):
     """
     result = []
 
-    page_refs = re.findall("<r.+?>", footnotes)
-    pages = re.split("<r.+?>", footnotes)[1:]
+    page_refs = PAGE_REF_PATTERN.findall(footnotes)
+    pages = PAGE_REF_PATTERN.split(footnotes)[1:]
 
     first_ref = page_refs[0]
     table = first_ref.maketrans("༡༢༣༤༥༦༧༨༩༠", "1234567890", "<r>")
     start = int(first_ref.translate(table))
     print(f'number of page ref found -{len(page_refs)} number of page found-{len(pages)}')
     for walker, (page, page_ref) in enumerate(zip_longest(pages, page_refs, fillvalue=""), start):
-        markers = re.finditer("<.+?>", page)
         marker_l = []
-        for i, marker in enumerate(markers, 1):
-            repl = f"<{i},{marker[0][1:-1]}>"
-            page = page.replace(marker[0], repl, 1)
+        page = renumber_markers(page)
         marker_list = [footnotes.strip() for footnotes in page.splitlines()]
         marker_list[0] = f"{walker:03}-{page_ref[1:-1]}"
         # Removes the noise marker without footnote
         for marker in marker_list:
-            if re.search("<.+?>(.+?)", marker):
+            if NOTE_PATTERN.search(marker):
                 marker_l.append(marker)
             else:
                 if "<" not in marker:
@@ -881,23 +1091,26 @@ def postprocess_footnotes(footnotes):
 
 #@timed(unit="min")
 def demultiply_diffs(text):
-    """ '<12,⓪⓪>note' --> '<12,⓪>note\n<12,⓪>note' 
+    """ '<12,⓪⓪>note' --> '<12,⓪>note\n<12,⓪>note' for any number of circled markers, in one scan.
+
+    A run of tibetan digits like <67,༦༧> is a single number, so only circled markers are
+    demultiplied.
 
     Arguments:
-        text {str} -- [description]
+        text {str} -- footnotes with one note per line
 
     Returns:
-        str -- [description]
+        str -- footnotes with one line per marker
     """
-    patterns = [
-        ["(\n<\d+,)([①-⓪])([①-⓪])([①-⓪])([①-⓪])([①-⓪])(>.+)","\g<1>\g<2>\g<7>\g<1>\g<3>\g<7>\g<1>\g<4>\g<7>\g<1>\g<5>\g<7>\g<1>\g<6>\g<7>"],
-        ["(\n<\d+,)([①-⓪])([①-⓪])([①-⓪])([①-⓪])(>.+)","\g<1>\g<2>\g<6>\g<1>\g<3>\g<6>\g<1>\g<4>\g<6>\g<1>\g<5>\g<6>"],
-        ["(\n<\d+,)([①-⓪])([①-⓪])([①-⓪])(>.+)","\g<1>\g<2>\g<5>\g<1>\g<3>\g<5>\g<1>\g<4>\g<5>"],
-        ["(\n<\d+,)([①-⓪])([①-⓪])(>.+)","\g<1>\g<2>\g<4>\g<1>\g<3>\g<4>"],
-    ]
-    for p in patterns:
-        text = re.sub(p[0], p[1], text)
-    return text
+    chunks = []
+    walker = 0
+    for match in MULTI_MARKER_PATTERN.finditer(text):
+        chunks.append(text[walker : match.start()])
+        prefix, markers, note = match.groups()
+        chunks += [f"{prefix}{marker}{note}" for marker in markers]
+        walker = match.end()
+    chunks.append(text[walker:])
+    return "".join(chunks)
 
 #@timed(unit="min")
 def rm_diff_tag(filtered_diffs):
@@ -906,42 +1119,8 @@ def rm_diff_tag(filtered_diffs):
         result.append([diff[0], diff[1]])
     return result
 
-# @timed(unit="min")
-def merge_footnotes_per_page(page, foot_notes):
-    """Merge the footnote of a certain page to its body text.
-
-    Args:
-        page (str): content in page
-        foot_notes (list): list of footnotes
-
-    Returns:
-        str: content of page attached with their footnote adjacent to their marker
-    """
-    with_marker = page
-    without_marker = page  
-    markers = re.finditer("<.+?>", page)
-    for i, (marker, foot_note) in enumerate(zip(markers, foot_notes[1:])):
-        marker_parts = marker[0][1:-1].split(",")
-        body_incremental = marker_parts[0]
-        body_value = marker_parts[1]
-        footnotes_parts = foot_note.split(">")
-        footnotes_incremental = footnotes_parts[0].split(",")[0][1:]
-        footnotes_value = footnotes_parts[0].split(",")[1]
-        note = footnotes_parts[1]
-        repl1 = f"<{body_incremental},{body_value};{footnotes_incremental},{footnotes_value},{note}>"
-        repl2 = f"<{note}>"
-        with_marker = with_marker.replace(marker[0], repl1, 1)
-        without_marker = without_marker.replace(marker[0], repl2, 1)
-    if foot_notes:
-        result_with_marker  = with_marker + f"/{foot_notes[0]}/"
-        # result_without_marker = without_marker + f"/{foot_notes[0]}/"
-    else:
-        result_with_marker  = with_marker
-    result_without_marker = without_marker
-    return result_with_marker, result_without_marker
-
-
 #@timed(unit="min")
+@measured(count=lambda result, *args: {"output_chars": len(result[0])})
 def merge_footnote(body_text_path, footnote_yaml_path):
     """Merge footnotes of a whole text abjacent to the marker in their content.
 
@@ -952,35 +1131,25 @@ def merge_footnote(body_text_path, footnote_yaml_path):
     Returns:
         str: footnote combined with their respective marker in text content 
     """
-    body_text = body_text_path.read_text(encoding="utf-8")
-    footnotes = from_yaml(footnote_yaml_path)
-    pages = re.split("<p.+?>", body_text)[:-1]
-    page_ann = re.findall("<p.+?>", body_text)
-    result_with_marker = ""
-    result_without_marker = ""
-    print(f'Page found {len(pages)} Page ref found {len(page_ann)}')
-    for i, (page, footnotes) in enumerate(zip_longest(pages, footnotes, fillvalue=[])):
-        with_marker = ''
-        without_marker = ''
-        try:
-            with_marker, without_marker = merge_footnotes_per_page(page, footnotes)
-            result_with_marker += with_marker
-            result_without_marker += without_marker
-        except:
-            result_with_marker += f'pages: {len(page)}, footnotes: {len(footnotes)}'
-        try:
-            with_marker = page_ann[i]
-            result_with_marker += with_marker
-            #result_without_marker += without_marker
-        except:
-            result_with_marker += 'page missing!'
-    result_without_marker = result_without_marker.replace("\n", "")
-    result_without_marker = re.sub("(\[.+?\])", r"\n\1", result_without_marker)
-    return result_with_marker, result_without_marker
+    volume = load_volume(body_text_path, footnote_yaml_path)
+    return volume.to_combined_marker(), volume.to_combined()
 
 
 #@timed(unit="min")
-def flow(vol_path, source_path, target_path, text_type, image_info):
+def flow(
+    vol_path,
+    source_path,
+    target_path,
+    text_type,
+    image_info,
+    n_workers=1,
+    backend=None,
+    cache=None,
+    review=False,
+    stream=False,
+    store=None,
+    incremental=False,
+):
     """ - diff is computed between B and A text
         - footnotes and footnotes markers are filtered from diffs
         - they are applied to B text with markers
@@ -990,37 +1159,120 @@ def flow(vol_path, source_path, target_path, text_type, image_info):
         A_path (path): path of text A (clean)
         text_type (str): type of text can be either body or footnote
         image_info (list): Contains work_id, volume number and source image offset
+        n_workers (int): number of processes used to diff the volume page shard by page shard
+        backend (str): body diff backend, see utils.get_dmp
+        cache (DiffCache): diff cache used to skip the diff of unchanged texts
+        review (bool): whether to also dump the diff stores as yaml for human review
+        stream (bool): whether to stream the body from the diff store to result.txt page by
+            page instead of keeping the filtered diffs and the whole text in memory
+        store (path): sqlite database the result is also written to, see volume_store
+        incremental (bool): whether to diff and filter again only the body pages changed since
+            the last incremental run, see incremental. Only body/result.txt is spliced, the
+            footnotes are still diffed in full and merge_volume makes the combined outputs again
     """
-    volume_no = image_info[1]
-    namsel_text = source_path.read_text(encoding="utf-8")
-    google_text = target_path.read_text(encoding="utf-8")
-    diffs_to_yaml = partial(to_yaml, type_="diffs")  # customising to_yaml function for diff list
-    filtered_diffs_to_yaml = partial(
-        to_yaml, type_="filtered_diffs"
-    )  # customising to_yaml function for filtered diffs list
+    metrics = Metrics()
+    with collect(metrics):
+        run_flow_stages(
+            vol_path,
+            source_path,
+            target_path,
+            text_type,
+            image_info,
+            n_workers,
+            backend,
+            cache,
+            review,
+            stream,
+            store,
+            incremental,
+        )
+    update_report(vol_path / "metrics.json", text_type, metrics)
+    print("Done")
+
+
+def count_tags(diffs, tag):
+    """Count the diffs having tag."""
+    return sum(1 for diff in diffs if diff[2] == tag)
+
+
+def run_flow_stages(
+    vol_path,
+    source_path,
+    target_path,
+    text_type,
+    image_info,
+    n_workers,
+    backend,
+    cache,
+    review,
+    stream,
+    store,
+    incremental,
+):
+    """Run the stages of flow, each one recorded in the active metrics collector."""
+    with stage("read") as counts:
+        namsel_text = source_path.read_text(encoding="utf-8")
+        google_text = target_path.read_text(encoding="utf-8")
+        counts["input_chars"] = len(namsel_text) + len(google_text)
+    diffs_to_store = partial(to_store, type_="diffs", review=review)  # customising to_store function for diff list
+    filtered_diffs_to_store = partial(
+        to_store, type_="filtered_diffs", review=review
+    )  # customising to_store function for filtered diffs list
     footnotes_to_yaml = partial(to_yaml, type_="footnotes")
 
     dir_path = vol_path / text_type
 
-    diffs_yaml_path = dir_path / "diffs.yaml"
-    filtered_diffs_yaml_path = dir_path / "filtered_diffs.yaml"
+    diffs_path = dir_path / "diffs.bin"
+    filtered_diffs_path = dir_path / "filtered_diffs.bin"
     # Text_type can be either body of the text or footnote footnote.
     if text_type == "body":
         # patterns = [['google_marker','(#)'],["pages", "\[\d+[ab]\]"]]
         # transformed_namsel = transfer(google_text, patterns, namsel_text, output='txt')
         # namsel_text = transformed_namsel.replace('#་','་#')
         # google_text = google_text.replace('#','')
-        print("Calculating diffs...")
-        diffs = get_diffs(namsel_text, google_text)
-        diffs_list = list(map(list, diffs))
-        diffs_to_yaml(diffs_list, dir_path)
-        print("Filtering diffs...")
-        filtered_diffs = filter_diffs(diffs_yaml_path, "body", image_info)
-        #filtered_diffs = rm_diff_tag(filtered_diffs)
-        filtered_diffs_to_yaml(filtered_diffs, dir_path)
-        new_text = format_diff(filtered_diffs_yaml_path, image_info, type_="body")
-        new_text = reformatting_body(new_text)
-        (dir_path / f"result.txt").write_text(new_text, encoding="utf-8")
+        if incremental:
+            # only the pages changed since the last incremental run are diffed and filtered again
+            from incremental import update_body
+
+            with stage("incremental_body", input_chars=len(namsel_text) + len(google_text)) as counts:
+                body_counts = update_body(
+                    namsel_text, google_text, dir_path, image_info, backend or "node", n_workers, review=review
+                )
+                counts.update(body_counts)
+        else:
+            print("Calculating diffs...")
+            with stage("diff", input_chars=len(namsel_text) + len(google_text)) as counts:
+                diffs = get_diffs(namsel_text, google_text, n_workers=n_workers, backend=backend, cache=cache)
+                diffs_list = list(map(list, diffs))
+                counts["diffs"] = len(diffs_list)
+            with stage("store_diffs", diffs=len(diffs_list)):
+                diffs_to_store(diffs_list, dir_path)
+            if stream:
+                del diffs, diffs_list  # only the store is read from here on
+                print("Streaming diffs...")
+                with stage("stream_body") as counts:
+                    with (dir_path / "result.txt").open("w", encoding="utf-8") as result_file:
+                        counts["pages"] = stream_body(iter_diffs(diffs_path), image_info, result_file)
+                        counts["output_bytes"] = result_file.tell()
+            else:
+                print("Filtering diffs...")
+                with stage("filter_diffs") as counts:
+                    filtered_diffs = filter_diffs(diffs_path, "body", image_info)
+                    counts["filtered_diffs"] = len(filtered_diffs)
+                    counts["markers"] = count_tags(filtered_diffs, "marker")
+                    counts["pages"] = count_tags(filtered_diffs, "pedurma-page")
+                #filtered_diffs = rm_diff_tag(filtered_diffs)
+                with stage("store_filtered_diffs", filtered_diffs=len(filtered_diffs)):
+                    filtered_diffs_to_store(filtered_diffs, dir_path)
+                with stage("format_diff") as counts:
+                    new_text = format_diff(filtered_diffs_path, image_info, type_="body")
+                    counts["output_chars"] = len(new_text)
+                with stage("reformatting_body", input_chars=len(new_text)):
+                    new_text = reformatting_body(new_text)
+                (dir_path / f"result.txt").write_text(new_text, encoding="utf-8")
+        if store:
+            with stage("store_volume"):
+                write_body_result(store, (dir_path / "result.txt").read_text(encoding="utf-8"), image_info)
 
 
     elif text_type == "footnotes":
@@ -1034,24 +1286,88 @@ def flow(vol_path, source_path, target_path, text_type, image_info):
         clean_google_text = preprocess_google_notes(google_text)
         clean_namsel_text = preprocess_namsel_notes(namsel_text)
         print("Calculating diffs..")
-        diffs = transfer(clean_namsel_text, annotations, clean_google_text)
-        diffs_list = list(map(list, diffs))
-        diffs_to_yaml(diffs_list, dir_path)
-        filtered_diffs = filter_footnotes_diffs(diffs_yaml_path, image_info[1])
-        filtered_diffs_to_yaml(filtered_diffs, dir_path)
-        new_text = format_diff(filtered_diffs_yaml_path, image_info, type_="footnotes")
+        with stage("diff", input_chars=len(clean_namsel_text) + len(clean_google_text)) as counts:
+            diffs = get_footnotes_diffs(clean_namsel_text, annotations, clean_google_text, n_workers, cache)
+            diffs_list = list(map(list, diffs))
+            counts["diffs"] = len(diffs_list)
+        with stage("store_diffs", diffs=len(diffs_list)):
+            diffs_to_store(diffs_list, dir_path)
+        with stage("filter_diffs") as counts:
+            filtered_diffs = filter_footnotes_diffs(diffs_path, image_info[1])
+            counts["filtered_diffs"] = len(filtered_diffs)
+            counts["markers"] = count_tags(filtered_diffs, "marker")
+        with stage("store_filtered_diffs", filtered_diffs=len(filtered_diffs)):
+            filtered_diffs_to_store(filtered_diffs, dir_path)
+        with stage("format_diff") as counts:
+            new_text = format_diff(filtered_diffs_path, image_info, type_="footnotes")
+            counts["output_chars"] = len(new_text)
         reformatted_footnotes = reformat_footnotes(new_text)
         formatted_yaml = postprocess_footnotes(reformatted_footnotes)
         footnotes_to_yaml(formatted_yaml, dir_path)
+        if store:
+            with stage("store_volume"), VolumeStore(store) as volume_store:
+                volume_store.write_footnotes(formatted_yaml, image_info)
         (dir_path / "result.txt").write_text(reformatted_footnotes, encoding="utf-8")
     else:
         print("Type not found")
-    print("Done")
+
+
+def get_text_paths(base_path, vol_num, text_type):
+    """Return the namsel and google text paths of a volume part.
+
+    Args:
+        base_path (path): volume directory like data/v073
+        vol_num (int): volume number
+        text_type (str): body or footnotes
+    Returns:
+        path: namsel text path
+        path: google text path
+    """
+    if text_type == "body":
+        google_text_path = base_path / text_type / f"{vol_num}E-{text_type}_transfered.txt"
+    else:
+        google_text_path = base_path / text_type / f"{vol_num}G-{text_type}.txt"
+    namsel_text_path = base_path / text_type / f"{vol_num}N-{text_type}.txt"
+    return namsel_text_path, google_text_path
+
+
+def merge_volume(base_path, image_info, store=None):
+    """Merge the reconstructed body and footnotes of a volume once both are done.
+
+    Args:
+        base_path (path): volume directory like data/v073
+        image_info (list): contains work_id, volume number and image source offset
+        store (path): sqlite database the merged volume is also written to, see volume_store
+    Returns:
+        bool: True if both parts were found and merged
+    """
+    vol_num = image_info[1]
+    body_result_path = base_path / "body/result.txt"
+    footnote_yaml_path = base_path / "footnotes/footnotes.yaml"
+    if not (body_result_path.is_file() and footnote_yaml_path.is_file()):
+        return False
+    print("Merge start..")
+    metrics = Metrics()
+    with collect(metrics):
+        volume = load_volume(body_result_path, footnote_yaml_path)
+        with stage("serialize") as counts:
+            merge_marker = volume.to_combined_marker(image_info)
+            merge = volume.to_combined()
+            counts["output_chars"] = len(merge_marker)
+        if store:
+            with stage("store_volume"), VolumeStore(store) as volume_store:
+                volume_store.write_body(volume, image_info)
+    to_yaml(volume.merge_report, base_path, type_="merge_report")
+    update_report(base_path / "metrics.json", "merge", metrics)
+    (base_path / f"{vol_num}_combined_marker.txt").write_text(merge_marker, encoding="utf-8")
+    (base_path / f"{vol_num}_combined.txt").write_text(merge, encoding="utf-8")
+    print("Merge complete.")
+    return True
 
 
 if __name__ == "__main__":
     vol_num = 73
-    # only works text by text or note by note for now
+    # only works text by text or note by note for now, see batch.py to run many volumes
     # TODO: run on whole volumes/instances by parsing the BDRC outlines to find and identify text type and get the image locations
     image_info = [
         "W1PD96682",
@@ -1060,26 +1376,9 @@ if __name__ == "__main__":
     ]  # [<kangyur: W1PD96682/tengyur: W1PD95844>, <volume>, <offset>]
     text_types = ["body","footnotes"]
     base_path = Path(f'./data/v{vol_num:03}')
+    cache = DiffCache()
     for text_type in text_types:
-        if text_type == 'body':
-            google_text_path = base_path / text_type / f'{vol_num}E-{text_type}_transfered.txt'
-        else:
-            google_text_path = base_path / text_type / f'{vol_num}G-{text_type}.txt'
-        namsel_text_path = base_path / text_type / f'{vol_num}N-{text_type}.txt'
-        flow(base_path, namsel_text_path, google_text_path, text_type, image_info)
+        namsel_text_path, google_text_path = get_text_paths(base_path, vol_num, text_type)
+        flow(base_path, namsel_text_path, google_text_path, text_type, image_info, cache=cache)
         print(f'{text_type} part done..')
-    body_result_path = base_path / f'body/result.txt'
-    footnote_yaml_path = base_path / f'footnotes/footnotes.yaml'
-    merge_marker = ''
-    merge = ''
-    if body_result_path.is_file() and footnote_yaml_path.is_file():
-        print('Merge start..')
-        merge_marker, merge = merge_footnote(body_result_path, footnote_yaml_path)
-        merge_marker = add_link(merge_marker, image_info)
-        (base_path / f"{vol_num}_combined_marker.txt").write_text(
-            merge_marker, encoding="utf-8"
-        )
-        (base_path / f"{vol_num}_combined.txt").write_text(
-            merge, encoding="utf-8"
-        )
-        print('Merge complete.')
+    merge_volume(base_path, image_info)
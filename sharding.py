@@ -0,0 +1,230 @@
+# coding='utf-8'
+
+"""
+Page-sharded diffing
+Cut both witnesses of a volume at shared page anchors, diff the shards in a process pool
+and stitch the shard diffs back into a single diff list. A cut is only made where both
+texts share a unique snippet, so every shard boundary falls inside an equality and the
+stitched diff looks like the monolithic one at the boundaries.
+"""
+import re
+from concurrent.futures import ProcessPoolExecutor
+
+from antx import transfer
+
+from utils import get_dmp
+
+BODY_ANCHORS = [r"\[\d+[ab]\]", r"<p\d+-\d+>", r"\d+—\d+"]
+FOOTNOTES_ANCHORS = ["<r.+?>"]
+
+SNIPPET_LEN = 32
+MAX_SYNC_TRIES = 16
+UNIQUE_WINDOW = 2000
+
+
+def get_anchor_offsets(text, patterns):
+    """Find the end offsets of page anchors in text.
+
+    Args:
+        text (str): text to search
+        patterns (list): regex patterns of page anchors
+
+    Returns:
+        list: sorted end offsets of the anchors
+    """
+    offsets = set()
+    for pattern in patterns:
+        for anchor in re.finditer(pattern, text):
+            offsets.add(anchor.end())
+    return sorted(offsets)
+
+
+def find_unique(text, snippet, start=0, end=None):
+    """Return the offset of snippet in text[start:end] if it occurs there exactly once, else -1."""
+    index = text.find(snippet, start, end)
+    if index == -1 or text.find(snippet, index + 1, end) != -1:
+        return -1
+    return index
+
+
+def sync_cut(text, other, offset, prev_cut):
+    """Find a cut point shared by text and other right after offset in text.
+
+    A snippet only has to be unique up to a window after its expected offset, UNIQUE_WINDOW chars
+    plus a tenth of the distance from the previous cut, so finding a cut costs about that distance
+    instead of a scan to the end of both texts.
+
+    Args:
+        text (str): text containing the anchor
+        other (str): the other witness
+        offset (int): anchor end offset in text
+        prev_cut (list): previous cut as [text offset, other offset]
+
+    Returns:
+        list: [text offset, other offset] of the cut or None if no shared snippet found
+    """
+    for walker in range(offset, offset + SNIPPET_LEN * MAX_SYNC_TRIES, SNIPPET_LEN):
+        snippet = text[walker : walker + SNIPPET_LEN]
+        if len(snippet) < SNIPPET_LEN:
+            continue
+        distance = walker - prev_cut[0]
+        window = UNIQUE_WINDOW + distance // 10
+        if find_unique(text, snippet, prev_cut[0], walker + window) != walker:
+            continue
+        expected = prev_cut[1] + distance * len(other) // len(text)
+        other_index = find_unique(other, snippet, prev_cut[1], expected + window)
+        if other_index != -1:
+            return [walker, other_index]
+    return None
+
+
+def get_cut_points(text1, text2, anchor_patterns, n_shards=None):
+    """Compute the cut points of both texts at page anchors shared by both witnesses.
+
+    Args:
+        text1 (str): source text
+        text2 (str): target text
+        anchor_patterns (list): regex patterns of page anchors
+        n_shards (int): number of shards wanted, texts are cut at every shared anchor if None
+
+    Returns:
+        list: cut points as [text1 offset, text2 offset]
+    """
+    candidates = []
+    for text_idx, text in enumerate([text1, text2]):
+        for offset in get_anchor_offsets(text, anchor_patterns):
+            candidates.append((offset / len(text), text_idx, offset))
+    candidates.sort()
+
+    cuts = []
+    prev_cut = [0, 0]
+    for fraction, text_idx, offset in candidates:
+        if n_shards:
+            if len(cuts) == n_shards - 1:
+                break
+            if fraction < (len(cuts) + 1) / n_shards:
+                continue
+        if text_idx == 0:
+            cut = sync_cut(text1, text2, offset, prev_cut)
+        else:
+            cut = sync_cut(text2, text1, offset, prev_cut[::-1])
+            cut = cut[::-1] if cut else None
+        if cut and cut[0] > prev_cut[0] and cut[1] > prev_cut[1]:
+            cuts.append(cut)
+            prev_cut = cut
+    return cuts
+
+
+def split_shards(text1, text2, anchor_patterns, n_shards):
+    """Split both texts into shards cut at shared page anchors.
+
+    Args:
+        text1 (str): source text
+        text2 (str): target text
+        anchor_patterns (list): regex patterns of page anchors
+        n_shards (int): number of shards wanted
+
+    Returns:
+        list: shards as (text1 shard, text2 shard)
+    """
+    cuts = [[0, 0]] + get_cut_points(text1, text2, anchor_patterns, n_shards)
+    cuts.append([len(text1), len(text2)])
+    shards = []
+    for (start1, start2), (end1, end2) in zip(cuts, cuts[1:]):
+        shards.append((text1[start1:end1], text2[start2:end2]))
+    return shards
+
+
+def stitch_diffs(shard_diffs):
+    """Join shard diffs into one diff list, merging the equalities split at shard boundaries.
+
+    Args:
+        shard_diffs (list): diff list of each shard
+
+    Returns:
+        list: stitched diff list
+    """
+    diffs = []
+    for shard in shard_diffs:
+        for i, diff in enumerate(shard):
+            if i == 0 and diffs and diffs[-1][0] == diff[0] and not any(diff[2:] + diffs[-1][2:]):
+                diffs[-1] = type(diff)([diff[0], diffs[-1][1] + diff[1], *diff[2:]])
+            else:
+                diffs.append(diff)
+    return diffs
+
+
+def diff_shard(shard):
+    """Compute diff of a single shard, run inside the worker processes.
+
+    Args:
+        shard (tuple): text1 shard, text2 shard and diff backend name
+
+    Returns:
+        list: list of diffs
+    """
+    text1, text2, backend = shard
+    return list(get_dmp(backend).diff_main(text1, text2))
+
+
+def transfer_shard(shard):
+    """Transfer annotations of a single shard, run inside the worker processes.
+
+    Args:
+        shard (tuple): source shard, target shard and annotation patterns
+
+    Returns:
+        list: list of diffs with annotation tags
+    """
+    source, target, annotations = shard
+    return transfer(source, annotations, target)
+
+
+def run_sharded(worker, shards, n_workers):
+    """Run worker over shards in a process pool keeping the shard order."""
+    if n_workers <= 1 or len(shards) == 1:
+        return [worker(shard) for shard in shards]
+    with ProcessPoolExecutor(max_workers=n_workers) as executor:
+        return list(executor.map(worker, shards))
+
+
+def get_sharded_diffs(text1, text2, n_workers, anchor_patterns=BODY_ANCHORS, backend="node", n_shards=None):
+    """Compute diff between text1 and text2 shard by shard in a process pool.
+
+    Args:
+        text1 (str): source text
+        text2 (str): target text
+        n_workers (int): number of worker processes
+        anchor_patterns (list): regex patterns of page anchors
+        backend (str): diff backend, see utils.get_dmp
+        n_shards (int): number of shards, defaults to twice the number of workers
+
+    Returns:
+        list: list of diffs
+    """
+    n_shards = n_shards or n_workers * 2
+    shards = split_shards(text1, text2, anchor_patterns, n_shards)
+    print(f"[INFO] Diffing {len(shards)} shards on {n_workers} workers ...")
+    shard_diffs = run_sharded(diff_shard, [(*shard, backend) for shard in shards], n_workers)
+    return stitch_diffs(shard_diffs)
+
+
+def get_sharded_transfer(source, annotations, target, n_workers, anchor_patterns=FOOTNOTES_ANCHORS, n_shards=None):
+    """Transfer annotations from source to target shard by shard in a process pool.
+
+    Args:
+        source (str): text containing the annotations
+        annotations (list): ['annotation type', '(regex to detect the annotations)']
+        target (str): text receiving the annotations
+        n_workers (int): number of worker processes
+        anchor_patterns (list): regex patterns of page anchors
+        n_shards (int): number of shards, defaults to twice the number of workers
+
+    Returns:
+        list: list of diffs with annotation tags
+    """
+    n_shards = n_shards or n_workers * 2
+    shards = split_shards(source, target, anchor_patterns, n_shards)
+    print(f"[INFO] Transfering {len(shards)} shards on {n_workers} workers ...")
+    shard_diffs = run_sharded(transfer_shard, [(*shard, annotations) for shard in shards], n_workers)
+    return stitch_diffs(shard_diffs)
@@ -0,0 +1,94 @@
+# coding='utf-8'
+
+"""
+Hierarchical syllable-then-character diff
+Tibetan text splits cleanly on tsheg and shad, so the texts are first encoded as one
+character per syllable (like dmp's diff_linesToChars does for lines) and diffed at syllable
+level. Line returns keep their own code so dmp's line mode still applies on top of the
+syllable level. Only the changed hunks are then refined character by character. The output
+is a standard dmp diff list.
+"""
+import re
+
+from diff_match_patch import diff_match_patch
+
+SYLLABLE_PATTERN = re.compile("[^་། \n]+[་། ]*|[་། ]+|\n")
+LINE_RETURN_CODE = ord("\n")
+
+
+def syllables_to_chars(text1, text2):
+    """Encode each syllable of both texts as a single character.
+
+    Args:
+        text1 (str): source text
+        text2 (str): target text
+
+    Returns:
+        str: encoded text1
+        str: encoded text2
+        list: syllable of each code, the code is the index in the list
+    """
+    # codes below the line return are left unused so "\n" can be encoded as itself
+    syllable_array = [""] * LINE_RETURN_CODE + ["\n"]
+    syllable_hash = {"\n": LINE_RETURN_CODE}
+
+    def encode(text):
+        chars = []
+        for syllable in SYLLABLE_PATTERN.findall(text):
+            code = syllable_hash.get(syllable)
+            if code is None:
+                code = len(syllable_array)
+                syllable_array.append(syllable)
+                syllable_hash[syllable] = code
+            chars.append(chr(code))
+        return "".join(chars)
+
+    return encode(text1), encode(text2), syllable_array
+
+
+def chars_to_syllables(diffs, syllable_array):
+    """Decode syllable level diffs back to text."""
+    return [(diff_type, "".join(syllable_array[ord(char)] for char in diff_text)) for diff_type, diff_text in diffs]
+
+
+class syllable_diff_match_patch:
+    def __init__(self):
+        self.dmp = diff_match_patch()
+        self.dmp.Diff_Timeout = 0  # compute diff till end of file
+
+    def refine(self, diffs):
+        """Diff the deleted and inserted syllables of every changed hunk at character level.
+
+        Args:
+            diffs (list): syllable level diffs
+
+        Returns:
+            list: character level diffs
+        """
+        result = []
+        deleted = ""
+        inserted = ""
+        for diff_type, diff_text in diffs + [(0, "")]:
+            if diff_type == -1:
+                deleted += diff_text
+            elif diff_type == 1:
+                inserted += diff_text
+            else:
+                if deleted and inserted:
+                    result += self.dmp.diff_main(deleted, inserted, False)
+                elif deleted:
+                    result.append((-1, deleted))
+                elif inserted:
+                    result.append((1, inserted))
+                deleted = ""
+                inserted = ""
+                if diff_text:
+                    result.append((0, diff_text))
+        self.dmp.diff_cleanupMerge(result)
+        return result
+
+    def diff_main(self, text1, text2):
+        chars1, chars2, syllable_array = syllables_to_chars(text1, text2)
+        syllable_diffs = self.dmp.diff_main(chars1, chars2)
+        diffs = chars_to_syllables(syllable_diffs, syllable_array)
+        return self.refine(diffs)
@@ -0,0 +1,165 @@
+# coding='utf-8'
+
+"""
+Synthetic pedurma volumes
+Builds body and footnotes witness pairs of any size in the layout of the data/ volumes, so the
+pipeline stages can be timed from a fraction of a volume to many volumes. The clean text is
+drawn from common Tibetan syllables; the namsel witnesses get pedurma page numbers, footnote
+markers in the styles found in the ocr (①, Tibetan numerals, <m…>, #) and ocr noise.
+"""
+import random
+from pathlib import Path
+
+import yaml
+
+SYLLABLES = [
+    "ཀ", "ཁ", "ག", "ང", "ཅ", "ཆ", "ཇ", "ཉ", "ཏ", "ཐ", "ད", "ན", "པ", "ཕ", "བ", "མ", "ཙ", "ཚ", "ཛ", "ཝ",
+    "ཞ", "ཟ", "འ", "ཡ", "ར", "ལ", "ཤ", "ས", "ཧ", "ཨ", "དང", "ནི", "ནས", "ཏེ", "དེ", "ཀྱི", "གྱི", "གྱིས",
+    "ཀྱིས", "ལས", "ཞིང", "བྱ", "བྱས", "མི", "ཡིན", "ཡོད", "མེད", "ཐམས", "ཅད", "སེམས", "ཅན", "རྣམས",
+    "བཅོམ", "ལྡན", "འདས", "དགེ", "སློང", "ཆོས", "སངས", "རྒྱས", "བྱང", "ཆུབ", "ཁྱིམ", "བདག", "ཕྱུག",
+    "ནོར", "མང", "ལོངས", "སྤྱོད", "ཆེ", "བུ", "མོ", "ཚེ", "གཞི", "གླེང", "མཉན", "དུ", "ཕྱིར", "བཞིན",
+    "འགྲོ", "བ", "པོ", "མ", "ཞེས", "བྱ", "བ", "ནི", "ཡང", "གང", "ལ", "ཤེས", "རབ", "སྙིང", "རྗེ",
+]
+EDITIONS = ["«གཡུང་»", "«ལི་»", "«པེ་»", "«སྣར་»", "«ཅོ་»", "«ཞོལ་»", "«སྡེ་»"]
+TITLE = "རྒྱ་གར་སྐད་དུ། ཀརྨ་ཤ་ཏ་ཀ། བོད་སྐད་དུ། ལས་བརྒྱ་ཐམ་པ་པ། བམ་པོ་དང་པོ།\n"
+TIB_DIGITS = "༠༡༢༣༤༥༦༧༨༩"
+OCR_CONFUSIONS = {"ཁ": "ག", "ག": "ཁ", "ད": "ང", "ང": "ད", "པ": "བ", "བ": "པ", "ི": "ེ", "ེ": "ི", "ུ": "ོ"}
+MARKER_STYLES = {"circle": 0.6, "tibetan": 0.2, "tagged": 0.1, "hash": 0.1}
+
+VOLUME_PAGES = 724  # pedurma pages of data/v073
+MAX_PAGE_NOTES = 20  # circled numbers only go up to ⑳
+LINES_PER_PAGE = 25
+SYLLABLES_PER_LINE = 16
+LINES_PER_FOLIO_SIDE = 7
+
+
+def to_tib_number(number):
+    return "".join(TIB_DIGITS[int(digit)] for digit in str(number))
+
+
+def to_circle_number(number):
+    if not 1 <= number <= MAX_PAGE_NOTES:
+        raise ValueError(f"no circled number for {number}")
+    return chr(0x245F + number)
+
+
+def make_marker(number, style):
+    """Write the footnote marker number in one of the marker styles of the namsel ocr."""
+    if style == "circle":
+        return to_circle_number(number)
+    elif style == "tibetan":
+        return to_tib_number(number)
+    elif style == "tagged":
+        return f"<m{to_circle_number(number)}>"
+    return "#"
+
+
+def add_ocr_noise(text, noise_rate, rng):
+    """Substitute, drop or add characters of text at noise_rate per character."""
+    chars = []
+    for char in text:
+        if char != "\n" and rng.random() < noise_rate:
+            edit = rng.random()
+            if edit < 0.5:
+                chars.append(OCR_CONFUSIONS.get(char, char))
+            elif edit < 0.8:
+                continue
+            else:
+                chars.append(char + "་")
+        else:
+            chars.append(char)
+    return "".join(chars)
+
+
+def make_note(rng):
+    editions = "".join(rng.sample(EDITIONS, rng.randint(1, 4)))
+    reading = "་".join(rng.choice(SYLLABLES) for _ in range(rng.randint(1, 3)))
+    return f"{editions}{reading}།"
+
+
+def generate_volume(
+    vol_num=73, scale=1.0, note_rate=0.04, noise_rate=0.01, marker_styles=MARKER_STYLES, seed=0
+):
+    """Generate the witnesses of a synthetic volume.
+
+    Args:
+        vol_num (int): volume number written in the pedurma page numbers
+        scale (float): size as a multiple of a real volume (724 pedurma pages)
+        note_rate (float): probability of a footnote marker after each syllable
+        noise_rate (float): probability of an ocr error on each character of the namsel witnesses
+        marker_styles (dict): marker style ("circle", "tibetan", "tagged" or "hash") mapped to its weight
+        seed (int): random seed, the same arguments always give the same volume
+
+    Returns:
+        dict: body and footnotes witnesses as text, keyed like the file names, plus the
+            expected footnotes list in the footnotes.yaml format under expected_footnotes.yaml
+    """
+    rng = random.Random(seed)
+    styles, weights = zip(*marker_styles.items())
+    n_pages = max(1, round(VOLUME_PAGES * scale))
+    # volumes open on the blank first folio and the title, as data/v073
+    clean_body, namsel_body = [f"[1a]\n\n\n\n[1b]\n༄༅༅། །{TITLE}"], [f"\n\n\n\n# {TITLE}"]
+    namsel_notes, google_notes, expected_notes = [], [], []
+    folio_side = 2
+    line_no = 0
+    for page in range(1, n_pages + 1):
+        page_notes = []
+        namsel_body.append(f"{vol_num}—{page}")
+        for _ in range(LINES_PER_PAGE):
+            if line_no % LINES_PER_FOLIO_SIDE == 0:
+                folio_side += 1
+                clean_body.append(f"[{(folio_side + 1) // 2}{'ab'[(folio_side + 1) % 2]}]\n")
+            line_no += 1
+            clean_line, namsel_line = [], []
+            for _ in range(SYLLABLES_PER_LINE):
+                syllable = rng.choice(SYLLABLES) + ("། " if rng.random() < 0.08 else "་")
+                clean_line.append(syllable)
+                namsel_line.append(syllable)
+                if len(page_notes) < MAX_PAGE_NOTES and rng.random() < note_rate:
+                    style = rng.choices(styles, weights)[0]
+                    marker_num = len(page_notes) + 1
+                    namsel_line.append(make_marker(marker_num, style))
+                    page_notes.append((marker_num, make_note(rng)))
+            clean_body.append("".join(clean_line) + "\n")
+            namsel_body.append(add_ocr_noise("".join(namsel_line), noise_rate, rng) + "\n")
+        page_ref = to_tib_number(page)
+        notes = [f"{to_circle_number(num)}{note}" for num, note in page_notes]
+        namsel_notes.append(add_ocr_noise(f"{page_ref} " + " ".join(notes), noise_rate, rng) + "\n")
+        google_notes.append(f"\n\n\n\n{to_tib_number(vol_num * 10 + page)}\nབསྡུར་མཆན།\n")
+        google_notes.append(" ".join(note for _, note in page_notes) + "\n")
+        expected_notes.append(
+            [f"{page:03}-r{page_ref}"]
+            + [f"<{i},{num},{to_circle_number(num)}>{note}" for i, (num, note) in enumerate(page_notes, 1)]
+        )
+    return {
+        f"{vol_num}N-body.txt": "".join(namsel_body),
+        f"{vol_num}E-body_transfered.txt": "".join(clean_body),
+        f"{vol_num}N-footnotes.txt": "".join(namsel_notes),
+        f"{vol_num}G-footnotes.txt": "".join(google_notes),
+        "expected_footnotes.yaml": expected_notes,
+    }
+
+
+def write_volume(data_dir, vol_num=73, **kwargs):
+    """Generate a synthetic volume and write it like data/v073, see generate_volume.
+
+    The expected notes go to footnotes/expected_footnotes.yaml, as the footnotes flow writes
+    its own footnotes.yaml.
+
+    Returns:
+        path: volume directory
+    """
+    vol_path = Path(data_dir) / f"v{vol_num:03}"
+    (vol_path / "body").mkdir(parents=True, exist_ok=True)
+    (vol_path / "footnotes").mkdir(parents=True, exist_ok=True)
+    for name, content in generate_volume(vol_num, **kwargs).items():
+        part = "body" if "body" in name else "footnotes"
+        if name.endswith(".yaml"):
+            content = yaml.safe_dump(content, allow_unicode=True)
+        (vol_path / part / name).write_text(content, encoding="utf-8")
+    return vol_path
+
+
+if __name__ == "__main__":
+    for scale in [1, 2, 4]:
+        print(write_volume(Path(f"./data/synthetic-x{scale}"), scale=scale, seed=scale))
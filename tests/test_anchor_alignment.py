@@ -0,0 +1,23 @@
+import sys
+
+sys.path.append("../")
+from pathlib import Path
+
+from anchor_alignment import anchored_diff_match_patch, get_anchors
+
+
+def test_anchored_diff():
+    """Test that anchored diffs rebuild both texts and anchors are real equalities.
+
+    """
+    vol_path = Path("./test2/")
+    target = (vol_path / "input" / "a.txt").read_text(encoding="utf-8")
+    source = (vol_path / "input" / "b.txt").read_text(encoding="utf-8")
+    anchors = get_anchors(source, target)
+    assert anchors
+    for start1, start2, length in anchors:
+        assert source[start1 : start1 + length] == target[start2 : start2 + length]
+
+    diffs = anchored_diff_match_patch().diff_main(source, target)
+    assert "".join(text for type_, text in diffs if type_ != 1) == source
+    assert "".join(text for type_, text in diffs if type_ != -1) == target
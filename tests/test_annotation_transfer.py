@@ -0,0 +1,56 @@
+import sys
+
+sys.path.append("../")
+import re
+
+import annotation_transfer
+
+
+def test_tag_to_tofu():
+    """Test that all annotation types are replaced in one scan, in text order."""
+    content = "[1a]\nཀ་ཁ།\n[1b]\nག་ང།"
+    annotations = [["line_break", "(\n)"], ["pages", r"(\[\d+[ab]\])"], ["shad", "།"]]
+    tofu_content, tofu_mapping = annotation_transfer.tag_to_tofu(content, annotations)
+    tofus = [chr(annotation_transfer.tofu_lower_limit + i) for i in range(6)]
+    assert tofu_content == "{0}{1}ཀ་ཁ{2}{3}{4}ག་ང".format(*tofus)
+    assert tofu_mapping == [
+        ("pages", "[1a]"),
+        ("line_break", "\n"),
+        ("line_break", "\n"),
+        ("pages", "[1b]"),
+        ("line_break", "\n"),
+    ]
+
+
+def test_transfer():
+    """Test that line breaks and page markers are transferred to the target."""
+    source = "[1a]\nཀ་ཁ་ག་ང་\nཅ་ཆ་ཇ་ཉ་\n[1b]\nཏ་ཐ་ད་ན་"
+    target = "ཀ་ཁ་ག་ང་ཅ་ཆ་ཇ་ཉ་ཏ་ཐ་ད་ན་"
+    annotations = [["line_break", "(\n)"], ["pages", r"(\[\d+[ab]\])"]]
+    assert annotation_transfer.transfer(source, annotations, target, "txt") == source
+
+
+def test_transfer_many():
+    """Test that a prepared source gives the output of transfer for each target."""
+    source = "[1a]\nཀ་ཁ་ག་ང་\nཅ་ཆ་ཇ་ཉ་\n[1b]\nཏ་ཐ་ད་ན་པ་ཕ་བ་མ་\nཙ་ཚ་ཛ་ཝ་"
+    targets = {
+        "E": "ཀ་ཁ་ག་ང་ཅ་ཆ་ཇ་ཉ་ཏ་ཐ་ད་ན་པ་ཕ་བ་མ་ཙ་ཚ་ཛ་ཝ་",
+        "G": "ཀ་ཁ་ག་ཅ་ཆ་ཇ་ཉ་ཏ་ཐ་ད་ན་པ་ཕ་བ་ཙ་ཚ་ཛ་ཝ་",
+        "N": "ཀ་ཁ་ག་ང་ཅ་ཆ་ཇ་ཏ་ཐ་ད་ན་པ་ཕ་བ་མ་ཙ་ཚ་ཛ་",
+    }
+    annotations = [["line_break", "(\n)"], ["pages", r"(\[\d+[ab]\])"]]
+    expected = {name: annotation_transfer.transfer(source, annotations, target, "txt") for name, target in targets.items()}
+    results = dict(annotation_transfer.transfer_many(source, annotations, targets, "txt", n_workers=2))
+    assert results == expected
+    prepared = annotation_transfer.PreparedSource(source, annotations, anchored=True)
+    results = annotation_transfer.transfer_many(prepared, None, list(targets.values()), "txt", n_workers=1)
+    assert [result for _, result in sorted(results)] == list(expected.values())
+
+
+def test_start_lookahead():
+    """Test that only patterns starting with a required literal char give a lookahead."""
+    lookahead = annotation_transfer.get_start_lookahead(["(\n)", r"(\[\d+[ab]\])"])
+    assert re.findall(lookahead + "(?:\n|\\[1a\\])", "ཀ\n[1a]") == ["\n", "[1a]"]
+    assert lookahead == "(?=[" + re.escape("\n") + re.escape("[") + "])"
+    for patterns in [["(a|b)"], [r"\d"], ["(x)?y"], ["x*y"], ["(?:x)"]]:
+        assert annotation_transfer.get_start_lookahead(patterns) == ""
@@ -0,0 +1,33 @@
+import sys
+
+sys.path.append("../")
+
+import batch
+
+
+def test_parse_volumes():
+    """Test that volume numbers and ranges are expanded."""
+    assert batch.parse_volumes(["1", "5-7", "73"]) == [1, 5, 6, 7, 73]
+
+
+def test_missing_volume(tmp_path):
+    """Test that volumes missing input texts are reported with every missing part and not run."""
+    for text_type in ["body", "footnotes"]:
+        (tmp_path / "v002" / text_type).mkdir(parents=True)
+    (tmp_path / "v002" / "body" / "2N-body.txt").write_text("ཀ", encoding="utf-8")
+    (tmp_path / "v002" / "body" / "2E-body_transfered.txt").write_text("ཀ", encoding="utf-8")
+    status = batch.run_batch("W1PD96682", {1: 16, 2: 16}, data_dir=tmp_path, max_workers=1)
+    assert status == {1: "body and footnotes input texts not found", 2: "footnotes input texts not found"}
+    assert len(list((tmp_path / "v002" / "body").iterdir())) == 2
+
+
+def test_failed_parts(tmp_path):
+    """Test that the errors of both parts of a volume are reported."""
+    for text_type, google_name in [("body", "3E-body_transfered.txt"), ("footnotes", "3G-footnotes.txt")]:
+        (tmp_path / "v003" / text_type).mkdir(parents=True)
+        (tmp_path / "v003" / text_type / f"3N-{text_type}.txt").write_bytes(b"\xff")
+        (tmp_path / "v003" / text_type / google_name).write_bytes(b"\xff")
+    status = batch.run_batch("W1PD96682", {3: 16}, data_dir=tmp_path, max_workers=1)
+    errors = status[3].split("; ")
+    assert sorted(error.split(":")[0] for error in errors) == ["body", "footnotes"]
+    assert all("UnicodeDecodeError" in error for error in errors)
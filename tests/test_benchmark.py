@@ -0,0 +1,30 @@
+import sys
+
+sys.path.append("../")
+
+import benchmark
+
+
+def test_compare():
+    """Test that only slowdowns beyond the threshold and the noise floor are regressions."""
+    baseline = {"cases": {"v073": {"body.diff": {"wall_time": 1.0}, "body.filter": {"wall_time": 0.001}}}}
+    results = {
+        "cases": {
+            "v073": {
+                "body.diff": {"wall_time": 1.5},
+                "body.filter": {"wall_time": 0.003},
+                "footnotes.diff": {"error": "ConnectionError()"},
+            }
+        }
+    }
+    assert benchmark.compare(results, baseline, threshold=0.2) == [("v073", "body.diff", 1.0, 1.5)]
+    assert benchmark.compare(results, baseline, threshold=0.6) == []
+
+
+def test_print_backend(capsys):
+    """Test that the diff backends of the run and of the baseline are printed first."""
+    results = {"backend": "node", "cases": {"v073": {"body.diff": {"wall_time": 1.5}}}}
+    benchmark.print_results(results, {"backend": "anchored", "cases": {}})
+    lines = capsys.readouterr().out.splitlines()
+    assert lines[0] == "backend: node, baseline backend: anchored"
+    assert lines[1].startswith("[INFO] baseline was run with another diff backend")
@@ -0,0 +1,53 @@
+import sys
+
+sys.path.append("../")
+
+import diff_cache
+import reconstruction
+from diff_cache import CACHE_SUFFIX, DiffCache, make_key
+
+
+def test_diff_cache(tmp_path):
+    """Test that cached diffs are reused and old entries are evicted past the size limit.
+
+    """
+    cache = DiffCache(tmp_path, max_size=10 ** 6)
+    calls = []
+
+    def compute():
+        calls.append(1)
+        return [(0, "ཀ་"), (-1, "①"), (1, "ཁ")]
+
+    key = make_key("ཀ་①", "ཀ་ཁ", "python")
+    assert key != make_key("ཀ་①", "ཀ་ཁ", "syllable")
+    assert cache.get_or_compute(key, compute) == [[0, "ཀ་"], [-1, "①"], [1, "ཁ"]]
+    assert cache.get_or_compute(key, compute) == [[0, "ཀ་"], [-1, "①"], [1, "ཁ"]]
+    assert len(calls) == 1
+
+    cache.max_size = 0
+    cache.evict()
+    assert cache.get(key) is None
+
+
+def test_diff_cache_shards(tmp_path, monkeypatch):
+    """Test that sharded and unsharded diffs of the same texts are cached apart."""
+    cache = DiffCache(tmp_path)
+    calls = []
+    monkeypatch.setattr(
+        reconstruction, "get_sharded_diffs", lambda *args, **kwargs: calls.append(1) or [[0, "ཀ་"], [1, "ཁ"]]
+    )
+    assert reconstruction.get_diffs("ཀ་", "ཀ་ཁ", backend="python", cache=cache) == [[0, "ཀ་"], [1, "ཁ"]]
+    reconstruction.get_diffs("ཀ་", "ཀ་ཁ", n_workers=2, backend="python", cache=cache)
+    assert calls == [1]
+    assert len(list(tmp_path.glob(f"*{CACHE_SUFFIX}"))) == 2
+
+
+def test_backend_version(tmp_path, monkeypatch):
+    """Test that editing the source of a repo backend changes its cache keys."""
+    source_path = tmp_path / "anchor_alignment.py"
+    source_path.write_text("NGRAM_SIZE = 4\n", encoding="utf-8")
+    monkeypatch.setitem(diff_cache.BACKEND_MODULES, "anchored", str(source_path))
+    key = make_key("ཀ་①", "ཀ་ཁ", "anchored")
+    source_path.write_text("NGRAM_SIZE = 5\n", encoding="utf-8")
+    assert make_key("ཀ་①", "ཀ་ཁ", "anchored") != key
+    assert diff_cache.get_backend_version("python").startswith("python-")
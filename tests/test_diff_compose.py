@@ -0,0 +1,95 @@
+import sys
+
+sys.path.append("../")
+from pathlib import Path
+
+import annotation_transfer
+import diff_compose
+import reconstruction
+import sharding
+from diff_index import DiffIndex
+from diff_store import from_diff_store
+
+IMAGE_INFO = ["W1PD96682", 74, 18]
+
+
+def test_compose_diffs():
+    """Test that composed diffs align the first text with the last one."""
+    diffs1 = [(0, "ཀ་ཁ་"), (-1, "ག"), (1, "ང"), (0, "་ཅ་")]  # ཀ་ཁ་ག་ཅ་ -> ཀ་ཁ་ང་ཅ་
+    diffs2 = [(0, "ཀ་"), (-1, "ཁ་"), (0, "ང"), (1, "ག"), (0, "་ཅ་")]  # ཀ་ཁ་ང་ཅ་ -> ཀ་ངག་ཅ་
+    diffs = diff_compose.compose_diffs(diffs1, diffs2)
+    assert diff_compose.get_text1(diffs) == "ཀ་ཁ་ག་ཅ་"
+    assert diff_compose.get_text2(diffs) == "ཀ་ངག་ཅ་"
+    assert diff_compose.refine_diffs([(0, "ཀ"), (-1, "་ཁ"), (1, "་ག")]) == [(0, "ཀ་"), (-1, "ཁ"), (1, "ག")]
+
+
+def test_derive_transfered_diffs(tmp_path):
+    """Test that the diff derived from the transfer diff is a diff of the flow texts, mapping the same offsets."""
+    namsel_text = "ཀ་ཁ་ག་ང་\nཅ་ཆ་ཇ་ཉ་\nཏ་ཐ་ད་ན་པ་ཕ་བ་མ་\nཙ་ཚ་ཛ་ཝ་"
+    clean_text = "ཀ་ཁ་ག་ང་ཅ་ཆ་ཇ་ཏ་ཐ་ད་ན་པ་ཕ་བ་མ་ཙ་ཚ་ཛ་ཝ་ཞ་"
+    transfered_path = tmp_path / "73E-body_transfered.txt"
+    annotation_transfer.transfer_to_file(namsel_text, [["line_break", "(\n)"]], clean_text, transfered_path)
+    transfer_diffs = from_diff_store(diff_compose.get_transfer_diffs_path(transfered_path))
+    assert diff_compose.get_transfer_side(namsel_text, transfer_diffs) == "source"
+
+    transfered_text = transfered_path.read_text(encoding="utf-8").replace("ཞ", "ཟ")  # edited by a reviewer
+    diffs = diff_compose.derive_transfered_diffs(namsel_text, transfered_text, transfer_diffs)
+    assert diff_compose.get_text1(diffs) == namsel_text
+    assert diff_compose.get_text2(diffs) == transfered_text
+    assert (0, "\nཏ་ཐ་ད་ན་པ་ཕ་བ་མ་\nཙ་ཚ་ཛ་ཝ་") in diffs
+
+    # the offset maps of the chain map a namsel char to the same char of the transfered text
+    offset_maps = diff_compose.get_offset_maps(
+        diff_compose.get_transfer_chain(namsel_text, transfered_text, transfer_diffs)
+    )
+    diff_index = DiffIndex(diffs)
+    for offset, char in enumerate(namsel_text):
+        if diff_index.ops[diff_index.find(offset)] == 0:
+            assert transfered_text[diff_compose.map_offset(offset, offset_maps)] == char
+            assert diff_compose.map_offset(offset, offset_maps) == diff_index.map_offset(offset)
+
+
+def get_excerpt(tmp_path, start_cut, end_cut):
+    """Transfer the line breaks of an excerpt of the test2 namsel text onto the clean text, like the body inputs."""
+    source = Path("./test2/input/b.txt").read_text(encoding="utf-8")
+    target = Path("./test2/input/a.txt").read_text(encoding="utf-8")
+    cuts = [[0, 0]] + sharding.get_cut_points(source, target, sharding.BODY_ANCHORS)
+    (start1, start2), (end1, end2) = cuts[start_cut], cuts[end_cut]
+    namsel_text = source[start1:end1]
+    transfered_path = tmp_path / "body" / "74E-body_transfered.txt"
+    transfered_path.parent.mkdir()
+    annotation_transfer.transfer_to_file(
+        namsel_text, [["line_break", "(\n)"]], target[start2:end2].replace("\n", ""), transfered_path
+    )
+    (tmp_path / "body" / "74N-body.txt").write_text(namsel_text, encoding="utf-8")
+    return namsel_text, transfered_path
+
+
+def get_body(diffs):
+    """Filter, format and reformat body diffs like flow."""
+    diffs = [list(diff[:2]) for diff in diffs]
+    chunks = reconstruction.iter_format_diff(reconstruction.iter_filter_diffs(diffs, IMAGE_INFO), IMAGE_INFO, "body")
+    return reconstruction.reformatting_body("".join(chunks))
+
+
+def test_derived_body(tmp_path):
+    """Test that the body filtered from a derived diff is the one filtered from the dmp diff."""
+    namsel_text, transfered_path = get_excerpt(tmp_path, 0, 5)
+    transfered_text = transfered_path.read_text(encoding="utf-8")
+    transfer_diffs = from_diff_store(diff_compose.get_transfer_diffs_path(transfered_path))
+    derived_diffs = diff_compose.derive_transfered_diffs(namsel_text, transfered_text, transfer_diffs)
+    diffs = reconstruction.get_diffs(namsel_text, transfered_text, backend="python")
+    assert derived_diffs != list(diffs)
+    assert get_body(derived_diffs) == get_body(diffs)
+
+
+def test_flow_diffs(tmp_path):
+    """Test that flow diffs the body texts even when a transfer diff is stored next to them."""
+    namsel_text, transfered_path = get_excerpt(tmp_path, 1, 2)
+    transfered_text = transfered_path.read_text(encoding="utf-8")
+    assert diff_compose.get_transfer_diffs_path(transfered_path).is_file()
+    source_path = tmp_path / "body" / "74N-body.txt"
+
+    body = get_body(reconstruction.get_diffs(namsel_text, transfered_text, backend="python"))
+    reconstruction.flow(tmp_path, source_path, transfered_path, "body", IMAGE_INFO, backend="python")
+    assert (tmp_path / "body" / "result.txt").read_text(encoding="utf-8") == body
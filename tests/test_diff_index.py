@@ -0,0 +1,44 @@
+import sys
+
+sys.path.append("../")
+from pathlib import Path
+
+import diff_index
+import reconstruction
+from diff_store import DiffStore
+
+
+def test_map_offset():
+    """Test that offsets are mapped to the same chars in the other text."""
+    diffs = [[0, "ཀ་ཁ་"], [-1, "ག"], [1, "ང"], [0, "་ཅ་"], [1, "\n"]]
+    index = diff_index.DiffIndex(diffs)
+    text1, text2 = diff_index.get_text(diffs, 1), diff_index.get_text(diffs, 2)
+    for offset in range(len(text1)):
+        if index.ops[index.find(offset)] == 0:
+            assert text2[index.map_offset(offset)] == text1[offset]
+    assert index.map_offset(4) == 4  # ག only in text1 maps to where ང is
+    assert index.map_offset(5, side=2) == 5
+    assert index.find(len(text2), side=2) == len(diffs) - 1
+    assert list(index.get_range(2, 6)) == [0, 1, 2, 3]
+
+
+def test_get_page_diffs(tmp_path):
+    """Test that the diffs of a page are the ones of its span, from a list or a diff store."""
+    diffs = reconstruction.load_diffs(Path("./test2/diffs.yaml"))
+    text2 = diff_index.get_text(diffs, 2)
+    start, end = diff_index.get_page_spans(text2)["116a"]
+    page_index = diff_index.PageIndex(diffs)
+    page_diffs = page_index.get_page_diffs("116a")
+    assert text2[start:end] in diff_index.get_text(page_diffs, 2)
+    assert text2[start:end] not in diff_index.get_text(page_diffs[1:], 2)
+    assert text2[start:end] not in diff_index.get_text(page_diffs[:-1], 2)
+    reconstruction.to_store(diffs, tmp_path, type_="diffs")
+    with DiffStore(tmp_path / "diffs.bin") as store:
+        store_index = diff_index.PageIndex(store)
+        assert [diff[:2] for diff in store_index.get_page_diffs("116a")] == page_diffs
+        assert store_index.get_page_diffs("999z") == []
+    # every page is read from the same index, each one starting where its annotation is
+    for page, (start, end) in diff_index.get_page_spans(text2).items():
+        page_range = page_index.get_page_range(page)
+        assert page_index.diff_index.starts2[page_range[0]] <= start
+        assert page_range[0] in page_index.get_page_starts()
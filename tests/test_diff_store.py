@@ -0,0 +1,26 @@
+import sys
+
+sys.path.append("../")
+
+from diff_store import DiffStore, from_diff_store, to_diff_store
+
+
+def test_diff_store(tmp_path):
+    """Test the binary diff store round trip, slicing and yaml export.
+
+    """
+    diffs = [[0, "ཀ་ཁ་", ""], [-1, "<m①>", "marker"], [1, "\n", ""], [0, "<r༣>", "pg_ref"]]
+    store_path = tmp_path / "diffs.bin"
+    to_diff_store(diffs, store_path)
+    assert from_diff_store(store_path) == diffs
+    assert from_diff_store(store_path, with_tags=False) == [diff[:2] for diff in diffs]
+
+    with DiffStore(store_path) as store:
+        assert len(store) == 4
+        assert store[-1] == diffs[-1]
+        view = store[1:3]
+        assert len(view) == 2
+        assert list(view) == diffs[1:3]
+        assert view.op(0) == -1
+        store.to_yaml(tmp_path / "diffs.yaml")
+    assert "<m①>" in (tmp_path / "diffs.yaml").read_text(encoding="utf-8")
@@ -1,11 +1,27 @@
 import sys
 
 sys.path.append("../")
-import re
-from pathlib import Path
 
-import test_extraction
+import synthetic
+import text_extraction
 
 
 def test_extraction():
-    
\ No newline at end of file
+    """Test that the body of each text of a multi-text volume is located before its durchen."""
+    volumes = [synthetic.generate_volume(scale=0.05, seed=seed) for seed in range(2)]
+    namsel_text = "བཀའ་འགྱུར། ༼དཔེ་བསྡུར་མ།）\nཔོད ༧༥\n" + "དཀར་ཆག་" * 50 + "\n"
+    body_ends = []
+    for volume in volumes:
+        namsel_text += volume["73N-body.txt"]
+        body_ends.append(len(namsel_text))
+        namsel_text += "(ཤེ་བསྡུར་མཆན།\n" + volume["73N-footnotes.txt"].replace("«", "〈〈").replace("»", "〉〉")
+    clean_texts = [volume["73E-body_transfered.txt"] for volume in volumes]
+
+    spans = text_extraction.get_text_spans(namsel_text, clean_texts)
+    assert [span.body_end for span in spans] == body_ends
+    assert spans[1].body_start == spans[0].durchen_end
+    assert spans[-1].durchen_end == len(namsel_text)
+    for span in spans:
+        assert namsel_text[span.body_start :].startswith("རྒྱ་གར་སྐད་དུ།")
+    main_text = text_extraction.get_main_text(namsel_text, clean_texts[0])
+    assert main_text == namsel_text[spans[0].body_start : spans[0].body_end]
@@ -0,0 +1,93 @@
+import re
+import sys
+
+sys.path.append("../")
+from pathlib import Path
+
+import incremental
+import reconstruction
+import sharding
+from diff_index import PageIndex
+
+IMAGE_INFO = ["W1PD96682", 74, 18]
+
+
+def get_texts(n_shards):
+    """Return the first page shards of the test2 namsel and transfered texts."""
+    source = Path("./test2/input/b.txt").read_text(encoding="utf-8")
+    target = Path("./test2/input/a.txt").read_text(encoding="utf-8")
+    cut = sharding.get_cut_points(source, target, sharding.BODY_ANCHORS)[n_shards - 1]
+    return source[: cut[0]], target[: cut[1]]
+
+
+def test_split_diffs():
+    """Test that stitched page shard diffs are split back into the same shards."""
+    source, target = get_texts(6)
+    cuts = sharding.get_cut_points(source, target, sharding.BODY_ANCHORS)
+    shards = incremental.split_texts(source, target, cuts)
+    shard_diffs = [[list(diff) for diff in sharding.diff_shard((*shard, "python"))] for shard in shards]
+    diffs = sharding.stitch_diffs(shard_diffs)
+    assert incremental.split_diffs(diffs, cuts) == shard_diffs
+    page_pattern = reconstruction.get_page_pattern(IMAGE_INFO[1])
+    page_index = PageIndex(diffs, side=1, pattern=page_pattern)
+    assert incremental.get_shards_span(page_index.diff_index, cuts, 0, len(shards)) == (0, len(diffs))
+    assert incremental.get_page_diffs(page_index, IMAGE_INFO[1]) == [
+        i for i, diff in enumerate(diffs) if diff[0] == -1 and page_pattern.search(diff[1])
+    ]
+
+
+def test_update_body(tmp_path):
+    """Test that an edited page is diffed and filtered again and spliced like a full run."""
+    source, target = get_texts(6)
+    incremental_path = tmp_path / "incremental"
+    full_path = tmp_path / "full"
+    incremental_path.mkdir()
+    full_path.mkdir()
+    counts = incremental.update_body(source, target, incremental_path, IMAGE_INFO, backend="python")
+    assert counts["diffed_shards"] == counts["shards"]
+    counts = incremental.update_body(source, target, incremental_path, IMAGE_INFO, backend="python")
+    assert counts["diffed_shards"] == 0
+
+    edit = target.index("\n", len(target) // 2)
+    target = target[:edit] + "ཀཁ་" + target[edit:]
+    counts = incremental.update_body(source, target, incremental_path, IMAGE_INFO, backend="python", margin=0)
+    assert counts["diffed_shards"] == 1
+    assert counts["refiltered_pages"] == 1
+
+    incremental.update_body(source, target, full_path, IMAGE_INFO, backend="python")
+    for name in ["result.txt", "diffs.bin"]:
+        assert (incremental_path / name).read_bytes() == (full_path / name).read_bytes()
+
+
+
+def assert_full_run(incremental_path, full_path, source, target):
+    """Assert that the incremental outputs are the ones of a full run on the same texts."""
+    full_path.mkdir()
+    incremental.update_body(source, target, full_path, IMAGE_INFO, backend="python")
+    for name in ["result.txt", "diffs.bin"]:
+        assert (incremental_path / name).read_bytes() == (full_path / name).read_bytes()
+
+
+def test_update_body_boundaries(tmp_path):
+    """Test that an edit on a page boundary and a removed shard are spliced like a full run, with the default margin."""
+    source, target = get_texts(14)
+    incremental_path = tmp_path / "incremental"
+    incremental_path.mkdir()
+    counts = incremental.update_body(source, target, incremental_path, IMAGE_INFO, backend="python")
+    n_shards, n_pages = counts["shards"], counts["refiltered_pages"]
+
+    page_num = source.index("74—282")
+    source = source[:page_num] + "ཀཁ་" + source[page_num:]
+    counts = incremental.update_body(source, target, incremental_path, IMAGE_INFO, backend="python")
+    assert counts["diffed_shards"] == 1
+    assert counts["refiltered_pages"] < n_pages
+    assert_full_run(incremental_path, tmp_path / "page_boundary", source, target)
+
+    # without its folio annotation the target is not cut there anymore, two shards make one
+    folio = re.findall(r"\[\d+[ab]\]", target)[3]
+    target = target.replace(folio, "", 1)
+    counts = incremental.update_body(source, target, incremental_path, IMAGE_INFO, backend="python")
+    assert counts["shards"] == n_shards - 1
+    assert counts["diffed_shards"] == 1
+    assert counts["refiltered_pages"] < n_pages
+    assert_full_run(incremental_path, tmp_path / "removed_shard", source, target)
@@ -0,0 +1,31 @@
+import sys
+
+sys.path.append("../")
+import json
+
+import metrics
+
+
+def test_stage_report(tmp_path):
+    """Test that stages are recorded only inside a collector and reported per part."""
+
+    @metrics.measured(count=metrics.text_counts)
+    def upper(text):
+        return text.upper()
+
+    upper("outside")
+    volume_metrics = metrics.Metrics()
+    with metrics.collect(volume_metrics):
+        with metrics.stage("read", input_chars=3) as counts:
+            counts["pages"] = 1
+        upper("abc")
+    assert [record["stage"] for record in volume_metrics.stages] == ["read", "upper"]
+    assert volume_metrics.stages[0]["counts"] == {"input_chars": 3, "pages": 1}
+    assert volume_metrics.stages[1]["counts"] == {"input_chars": 3, "output_chars": 3}
+
+    report_path = tmp_path / "metrics.json"
+    metrics.update_report(report_path, "body", volume_metrics)
+    metrics.update_report(report_path, "footnotes", metrics.Metrics())
+    report = json.loads(report_path.read_text(encoding="utf-8"))
+    assert list(report) == ["body", "footnotes"]
+    assert report["body"]["stages"][0]["wall_time"] >= 0
@@ -0,0 +1,23 @@
+import sys
+
+sys.path.append("../")
+import re
+from pathlib import Path
+
+from normalizer import Normalizer
+from preprocess import NAMSEL_NOTES_NORMALIZER, preprocess_namsel_notes
+
+
+def test_normalizer():
+    """Test that the rules are applied in order, each on the output of the previous ones."""
+    normalizer = Normalizer([["《", "«"], ["a", "b"], ["b", "c"], ["<m>", "<m1>"], ["<m1>", "<m①>"]])
+    assert normalizer("《ab<m1><m>") == "«cc<m①><m①>"
+
+
+def test_preprocess_rules():
+    """Test that the compiled namsel notes rules give the output of re.sub rule by rule."""
+    text = Path("./test4/input/b.txt").read_text(encoding="utf-8")
+    expected = text
+    for pattern, template in NAMSEL_NOTES_NORMALIZER.patterns:
+        expected = re.sub(pattern, template, expected)
+    assert preprocess_namsel_notes(text) == expected
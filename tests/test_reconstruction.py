@@ -1,6 +1,7 @@
 import sys
 
 sys.path.append("../")
+import io
 import re
 import yaml
 from functools import partial
@@ -74,6 +75,70 @@ def test_reconstruction():
     # assert result == expected, "Not match"
 
 
+def test_classify_diff():
+    """Test that diff classification matches the single purpose marker helpers.
+
+    """
+    for diff in ["①", "\n༡༢ ", "<m⑧⑧>", "ཀ་#ཁ", "73—12", "ཀ་ ཁ་\n", "⑫ ཀ"]:
+        diff_marker = reconstruction.classify_diff(diff)
+        assert diff_marker.marker == (
+            reconstruction.get_abs_marker(diff) or reconstruction.get_excep_marker(diff)
+        )
+        assert diff_marker.clean == reconstruction.rm_noise(diff)
+        if diff_marker.kind == "absolute":
+            assert diff_marker.value == reconstruction.get_value(diff_marker.marker)
+    assert reconstruction.classify_diff("⑫ ཀ").value == "12"
+    assert reconstruction.classify_diff("༡༢").value == "12"
+    assert reconstruction.classify_diff("<m⑧⑧>").kind == "absolute"
+    assert reconstruction.classify_diff("ཀ་#ཁ") == ("exception", "ཀ་#ཁ", "", "ཀ#ཁ")
+
+
+def test_renumber_markers():
+    """Test that markers are numbered per page in a single pass."""
+    text = "ཀ<②>ཁ<#>\n<p73-4>ག<⑤><⑤>"
+    assert reconstruction.reformatting_body(text) == "ཀ<1,②>ཁ<2,#>\n<p73-4>ག<1,⑤><2,⑤>"
+
+
+def test_strip_ocr_headers():
+    """Test that the header scan removes what the header regex removes, page by page."""
+    pages = [
+        "༧༣༡\nབསྡུར་མཆན།\nཀ་ཁ།\n",
+        "༧༣༢\nབཀའ་འགྱུར།\nམདོ་སྡེ།\nཧི\n༧༣\nཀ་ཁ་ག་ང་ཅ་ཆ་ཇ་ཉ་ཏ་ཐ་ད་ན་པ་ཕ་བ་མ།\n",
+        "\n" * 30 + "ལས་བརྒྱ་ཐམ་པ་པ།\n\nཀ་ཁ།\n",
+        "\n\n\n\n",
+    ]
+    text = "\n\n\n\n".join(pages) + "ཀ"
+    result, headers_per_page = reconstruction.strip_ocr_headers(text)
+    assert result == re.sub(reconstruction.OCR_HEADER_PATTERN, "\n\n\n", text)
+    assert headers_per_page == [0, 1, 1, 0]
+
+
+def test_demultiply_diffs():
+    """Test that a run of any number of circled markers gives a note per marker."""
+    text = "<1,①>ཀ\n<2,①②>ཁ\n<3,①②③④⑤⑥>ག\n<67,༦༧>ང\n<4,⓪⓪>"
+    assert reconstruction.demultiply_diffs(text) == (
+        "<1,①>ཀ\n<2,①>ཁ\n<2,②>ཁ" + "".join(f"\n<3,{marker}>ག" for marker in "①②③④⑤⑥") + "\n<67,༦༧>ང\n<4,⓪⓪>"
+    )
+
+
+def test_stream_body():
+    """Test that streaming the body gives what the pre-streaming list implementation gave.
+
+    expected_filtered_diffs.yaml and expected_body.txt were captured from the list based
+    filter_diffs, format_diff and reformatting_body on test2/diffs.yaml.
+    """
+    vol_path = Path("./test2/")
+    image_info = ["W1PD96682", 73, 16]
+    diffs = reconstruction.load_diffs(vol_path / "diffs.yaml")
+    expected_filtered_diffs = yaml.safe_load(
+        (vol_path / "expected_filtered_diffs.yaml").read_text(encoding="utf-8")
+    )
+    assert list(reconstruction.iter_filter_diffs(diffs, image_info)) == expected_filtered_diffs
+    result = io.StringIO()
+    reconstruction.stream_body(diffs, image_info, result)
+    assert result.getvalue() == (vol_path / "expected_body.txt").read_text(encoding="utf-8")
+
+
 # def test_preprocessed():
 #     """Test the preprocessing of footnote being normalised or not."""
 
@@ -92,3 +157,4 @@ def test_reconstruction():
 
 if __name__ == "__main__":
     test_reconstruction()
+
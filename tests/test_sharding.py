@@ -0,0 +1,33 @@
+import sys
+
+sys.path.append("../")
+from pathlib import Path
+
+import sharding
+
+
+def test_sharded_diffs():
+    """Test that sharded diffs rebuild both texts and keep boundaries as equalities.
+
+    """
+    vol_path = Path("./test2/")
+    target = (vol_path / "input" / "a.txt").read_text(encoding="utf-8")
+    source = (vol_path / "input" / "b.txt").read_text(encoding="utf-8")
+    shards = sharding.split_shards(source, target, sharding.BODY_ANCHORS, 4)
+    assert "".join(shard[0] for shard in shards) == source
+    assert "".join(shard[1] for shard in shards) == target
+
+    diffs = sharding.get_sharded_diffs(source, target, 1, backend="python", n_shards=4)
+    assert "".join(text for type_, text in diffs if type_ != 1) == source
+    assert "".join(text for type_, text in diffs if type_ != -1) == target
+    for prev, cur in zip(diffs, diffs[1:]):
+        assert not (prev[0] == cur[0] == 0), "equality split at a shard boundary"
+
+
+def test_sync_cut():
+    """Test that snippets only need to be unique near the cut and far matches are not taken."""
+    snippet = "abcdefghijklmnopqrstuvwxyz012345"
+    filler = "." * 100000
+    text = "[1a]" + snippet + filler
+    assert sharding.sync_cut(text, text + snippet, 4, [0, 0]) == [4, 4]
+    assert sharding.sync_cut(text, filler + snippet, 4, [0, 0]) is None
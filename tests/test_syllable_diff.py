@@ -0,0 +1,20 @@
+import sys
+
+sys.path.append("../")
+from pathlib import Path
+
+from syllable_diff import syllable_diff_match_patch
+
+
+def test_syllable_diff():
+    """Test that syllable level diffs rebuild both texts like a character level diff.
+
+    """
+    vol_path = Path("./test1/")
+    target = (vol_path / "input" / "a.txt").read_text(encoding="utf-8")
+    source = (vol_path / "input" / "b.txt").read_text(encoding="utf-8")
+    diffs = syllable_diff_match_patch().diff_main(source, target)
+    assert "".join(text for type_, text in diffs if type_ != 1) == source
+    assert "".join(text for type_, text in diffs if type_ != -1) == target
+    for prev, cur in zip(diffs, diffs[1:]):
+        assert prev[0] != cur[0]
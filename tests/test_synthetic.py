@@ -0,0 +1,17 @@
+import sys
+
+sys.path.append("../")
+
+import synthetic
+
+
+def test_generate_volume():
+    """Test that synthetic volumes are reproducible and their namsel markers match the notes."""
+    volume = synthetic.generate_volume(scale=0.01, marker_styles={"circle": 1}, noise_rate=0, seed=1)
+    assert volume == synthetic.generate_volume(scale=0.01, marker_styles={"circle": 1}, noise_rate=0, seed=1)
+    n_notes = sum(len(page) - 1 for page in volume["expected_footnotes.yaml"])
+    n_markers = sum(volume["73N-body.txt"].count(synthetic.to_circle_number(i)) for i in range(1, 21))
+    assert n_notes == n_markers > 0
+    assert len(volume["expected_footnotes.yaml"]) == volume["73N-body.txt"].count("73—")
+    volume = synthetic.generate_volume(scale=0.01, note_rate=0.5, noise_rate=0, seed=1)
+    assert max(len(page) - 1 for page in volume["expected_footnotes.yaml"]) == synthetic.MAX_PAGE_NOTES
@@ -0,0 +1,37 @@
+import sys
+
+sys.path.append("../")
+
+import utils
+
+FAKE_DMP = """#!{python}
+import json
+import sys
+
+texts = [open(path, encoding="utf-8").read() for path in sys.argv[2:]]
+json.dump([[-1, texts[0]], [1, texts[1]]], sys.stdout)
+"""
+
+
+def test_dmp_pool(tmp_path, monkeypatch):
+    """Test that pools are kept per size and that big texts go through the pipes in order.
+
+    """
+    dmp_path = tmp_path / "dmp"
+    dmp_path.write_text(FAKE_DMP.format(python=sys.executable), encoding="utf-8")
+    dmp_path.chmod(0o755)
+    monkeypatch.setattr(utils, "get_dmp_exe_path", lambda: dmp_path)
+    monkeypatch.setattr(utils, "_pools", {})
+
+    pool = utils.get_dmp_pool(2)
+    assert utils.get_dmp_pool(2) is pool
+    assert utils.get_dmp_pool(3).n_workers == 3
+    assert pool.n_workers == 2
+    monkeypatch.setattr(utils, "_default_n_workers", None)
+    utils.set_dmp_workers(2)
+    assert utils.get_dmp_pool() is pool
+
+    text_pairs = [(f"ཀ་{i}\n" * (i * 100000), f"ཁ་{i}\n" * (i * 50000)) for i in range(1, 5)]
+    for (text1, text2), diffs in zip(text_pairs, pool.map(text_pairs)):
+        assert diffs == [[-1, text1], [1, text2]]
+    assert pool.diff("", "ཀ") == [[-1, ""], [1, "ཀ"]]
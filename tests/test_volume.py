@@ -0,0 +1,54 @@
+import sys
+
+sys.path.append("../")
+
+from to_docx import select_volume_span
+from volume import Volume
+
+BODY = "[1a]\nཀ་<1,#>ཁ་\n<p73-1>[1b]\nག་<1,2,②>ང་<2,#>\nཅ་<p73-2>ཆ་"
+FOOTNOTES = [["001-r༡", "<1,1,①>ཁོ"], ["002-r༢", "<1,2,②>གོ", "<2,3,③>ངོ"], ["003-r༣"]]
+IMAGE_INFO = ["W1PD96682", 73, 16]
+
+
+def test_volume():
+    """Test that the annotations are parsed once and merged footnotes are serialized back."""
+    volume = Volume.from_body(BODY)
+    assert volume.text == "[1a]\nཀ་ཁ་\n[1b]\nག་ང་\nཅ་ཆ་"
+    assert volume.pages == ["<p73-1>", "<p73-2>"]
+    assert list(volume.marker_offsets) == [7, 17, 19]
+    assert volume.to_body() == BODY
+
+    volume.merge_footnotes(FOOTNOTES)
+    link = "[https://www.tbrc.org/browser/ImageService?work=W1PD96682&igroup=I1PD96856&image={}&first=1&last=2000&fetchimg=yes]"
+    assert volume.to_combined_marker(IMAGE_INFO) == (
+        "[1a]\nཀ་<1,#;1,1,ཁོ>ཁ་\n/001-r༡/<p73-1>[1b]\n" + link.format(17) + "\n"
+        "ག་<1,2;1,2,གོ>ང་<2,#;2,3,ངོ>\nཅ་/002-r༢/<p73-2>\n" + link.format(18) + "\n"
+    )
+    assert volume.to_combined() == "\n[1a]ཀ་<ཁོ>ཁ་\n[1b]ག་<གོ>ང་<ངོ>ཅ་"
+    assert volume.to_combined(*volume.get_folio_span("1b", "1b")) == "\n[1b]ག་<གོ>ང་<ངོ>ཅ་"
+    assert volume.merge_report == [{"page": 3, "issue": "no body page", "key": "003-r༣"}]
+
+
+def test_merge_missing_page():
+    """Test that a missing footnotes page or a bad note is reported without shifting the other pages."""
+    volume = Volume.from_body(BODY)
+    volume.merge_footnotes([["002-r༢", "<1,2,②>གོ", "<2③>ངོ"]])
+    assert volume.to_combined() == "\n[1a]ཀ་<1,#>ཁ་\n[1b]ག་<གོ>ང་<2,#>ཅ་"
+    assert volume.merge_report == [
+        {"page": 1, "issue": "no footnotes page", "page_ann": "<p73-1>"},
+        {"page": 2, "issue": "note without marker", "note": "<2③>ངོ"},
+    ]
+
+
+def test_folio_span():
+    """Test that a folio span is selected by offset, with the lines of its notes in brackets."""
+    volume = Volume.from_body(BODY.replace("ཅ་<p73-2>", "[ཞུས་]ཅ་<p73-2>[2a]\n"))
+    volume.merge_footnotes(FOOTNOTES)
+    assert volume.get_folios() == [("1a", 0), ("1b", 10), ("2a", 28)]
+    assert volume.get_folio_span("1a", "1a") == (0, 10)
+    assert volume.get_folio_span("1b", "1b") == (10, 28)
+    assert volume.get_folio_span("1b", "3a") == (10, len(volume.text))
+    assert volume.get_folio_span("3a", "3b") is None
+    # the bracketed line has no folio number but belongs to 1b
+    assert select_volume_span(volume, ["1b", "1b"]) == "\n\n[1b]ག་<གོ>ང་<ངོ>\n\n[ཞུས་]ཅ་"
+    assert select_volume_span(volume, ["3a", "3b"]) == ""
@@ -0,0 +1,66 @@
+import sys
+
+sys.path.append("../")
+
+from volume import Volume
+from volume_store import VolumeStore, get_variants
+
+BODY = "[1a]\nཀ་<1,#>ཁ་\n<p73-1>[1b]\nག་<1,2,②>ང་<2,#>\nཅ་<p73-2>ཆ་"
+FOOTNOTES = [["001-r༡", "<1,1,①>«པེ་»«སྣར་»ཁོ"], ["002-r༢", "<1,2,②>«ཅོ་»གོ", "<2,3,③>«པེ་»«སྣར་»ཁོ"]]
+IMAGE_INFO = ["W1PD96682", 73, 16]
+
+
+def test_get_variants():
+    """Test that a note is split into its readings and the editions giving them."""
+    assert get_variants("«པེ་»«སྣར་»ཁོ«ཅོ་»གོ") == [(["པེ་", "སྣར་"], "ཁོ"), (["ཅོ་"], "གོ")]
+
+
+def test_volume_store(tmp_path):
+    """Test that a merged volume is stored and a page is read back by page number and by folio."""
+    volume = Volume.from_body(BODY)
+    volume.merge_footnotes(FOOTNOTES)
+    with VolumeStore(tmp_path / "store.db") as store:
+        store.write_body(volume, IMAGE_INFO)
+        store.write_footnotes(FOOTNOTES, IMAGE_INFO)
+        # writing a volume again replaces it
+        store.write_body(volume, IMAGE_INFO)
+
+    with VolumeStore(tmp_path / "store.db") as store:
+        page = store.get_page("W1PD96682", 73, 2)
+        assert page["text"] == "[1b]\nག་ང་\nཅ་"
+        assert [marker["offset"] for marker in page["markers"]] == [7, 9]
+        assert [marker["note"] for marker in page["markers"]] == ["«ཅོ་»གོ", "«པེ་»«སྣར་»ཁོ"]
+        assert page["markers"][1]["editions"] == ["པེ་", "སྣར་"]
+        assert page["markers"][1]["footnote"] == "2,3"
+
+        folio = store.get_page("W1PD96682", 73, "1a")
+        assert folio["text"] == "[1a]\nཀ་ཁ་\n"
+        # the same note on two pages is stored once
+        assert folio["markers"][0]["note"] == page["markers"][1]["note"]
+        assert store.conn.execute("SELECT COUNT(*) FROM notes").fetchone()[0] == 2
+        assert store.conn.execute("SELECT COUNT(*) FROM footnotes").fetchone()[0] == 3
+        assert store.get_page("W1PD96682", 73, 5) is None
+        assert store.get_page("W1PD96682", 74, 1) is None
+
+
+def test_store_rewrite(tmp_path):
+    """Test that rewriting a volume drops the notes it no longer uses and a page reads its editions at once."""
+    volume = Volume.from_body(BODY)
+    volume.merge_footnotes(FOOTNOTES)
+    new_footnotes = [FOOTNOTES[0], ["002-r༢", "<1,2,②>«ཞོལ་»ཆོ", "<2,3,③>«པེ་»«སྣར་»ཁོ"]]
+    new_volume = Volume.from_body(BODY)
+    new_volume.merge_footnotes(new_footnotes)
+    with VolumeStore(tmp_path / "store.db") as store:
+        store.write_body(volume, IMAGE_INFO)
+        store.write_footnotes(FOOTNOTES, IMAGE_INFO)
+        store.write_body(new_volume, IMAGE_INFO)
+        store.write_footnotes(new_footnotes, IMAGE_INFO)
+        notes = [note for (note,) in store.conn.execute("SELECT note FROM notes ORDER BY note")]
+        assert notes == sorted(["«པེ་»«སྣར་»ཁོ", "«ཞོལ་»ཆོ"])
+        assert store.conn.execute("SELECT COUNT(*) FROM variants").fetchone()[0] == 3
+
+        queries = []
+        store.conn.set_trace_callback(queries.append)
+        page = store.get_page("W1PD96682", 73, 2)
+        assert [marker["editions"] for marker in page["markers"]] == [["ཞོལ་"], ["པེ་", "སྣར་"]]
+        assert sum("FROM variants" in query for query in queries) == 1
@@ -1,57 +1,130 @@
-"""This module is to extract body text of namsel orc text by excluding durchen(footnote)."""
+"""This module is to extract body text of namsel orc text by excluding durchen(footnote).
+
+The body of each text of a namsel volume is located by its sync points: the start is where
+the first syllables of the clean etext are found, the end is where its last syllables are
+found before the durchen, whose first edition mark 〈〈…〉〉 bounds the search. Both are
+found with unique syllable n-gram anchors inside small windows, DMP only refines the few
+characters between the outermost anchor and the text boundary, so a volume is cut in
+milliseconds whatever its size.
+"""
 
 import re
+from collections import namedtuple
 from pathlib import Path
 
 from diff_match_patch import diff_match_patch
 
+from anchor_alignment import get_anchors
 
-def get_start_sync_point(namsel_text, clean_text):
-    """Compute the starting sync point in namselOCRed text.
+DURCHEN_PATTERN = re.compile(r"〈〈\S+?〉〉")
+SYNC_WINDOW = 5000  # namsel chars searched for a sync point at once
+SYNC_TEXT_LEN = 1000  # clean chars at the start or end of the text searched in the window
+MIN_ANCHORED_LEN = 100  # anchored chars needed to accept a window, durchen notes quote short readings
+REFINE_SLACK = 32  # namsel chars diffed beyond the clean chars left to align
 
-    Args:
-        namsel_text (str): first 5000 characters of namselOCRed text
-        basetext (str): first 5000 charachets of clean etext text
+TextSpan = namedtuple("TextSpan", ["body_start", "body_end", "durchen_end"])
 
-    Returns:
-        (int): start sync index
-    """
+
+def refine_diffs(text1, text2, cleanup=True):
     dmp = diff_match_patch()
     dmp.Diff_Timeout = 0
-    start_diffs = dmp.diff_main(namsel_text, clean_text)
-    dmp.diff_cleanupSemantic(start_diffs)
-    starting_noise = start_diffs[0][1]
-    return len(starting_noise)
+    diffs = dmp.diff_main(text1, text2)
+    if cleanup:
+        dmp.diff_cleanupSemantic(diffs)
+    return diffs
 
 
-def get_end_sync_point(namsel_text, clean_text):
+def get_start_sync_point(namsel_text, clean_text, search_from=0):
+    """Compute the starting sync point in namselOCRed text.
+
+    Windows of the namsel text are searched from search_from, half a window apart, for the
+    first syllables of the clean text.
+
+    Args:
+        namsel_text (str): namsel ocr text
+        clean_text (str): clean etext of the text whose start is searched
+        search_from (int): namsel offset the text starts after
+
+    Returns:
+        (int): start sync index, None if the text is not found
+    """
+    clean_start = clean_text[:SYNC_TEXT_LEN]
+    for window_start in range(search_from, max(len(namsel_text), search_from + 1), SYNC_WINDOW // 2):
+        window = namsel_text[window_start : window_start + SYNC_WINDOW]
+        anchors = get_anchors(window, clean_start)
+        if sum(length for _, _, length in anchors) < MIN_ANCHORED_LEN:
+            continue
+        namsel_pos, clean_pos, _ = anchors[0]
+        if clean_pos == 0:
+            return window_start + namsel_pos
+        # starting noise of the namsel text before the clean chars preceding the first anchor
+        gap_start = max(0, namsel_pos - 2 * clean_pos - REFINE_SLACK)
+        start_diffs = refine_diffs(window[gap_start:namsel_pos], clean_start[:clean_pos])
+        starting_noise = start_diffs[0][1] if start_diffs[0][0] == -1 else ""
+        return window_start + gap_start + len(starting_noise)
+    return None
+
+
+def get_end_sync_point(namsel_text, clean_text, start=0):
     """Compute end sync point of namsel text to exclude durchen.
 
+    The last syllables of the clean text are searched in the window before the first edition
+    mark of the durchen following start, or at the end of the namsel text if there is none.
+
     Args:
-        namsel_text (str): contents namsel ocr text
-        clean_text (str): contents clean etext
+        namsel_text (str): namsel ocr text
+        clean_text (str): clean etext of the text whose end is searched
+        start (int): start sync index of the text
 
     Returns:
         (int): end sync index
+        (int): start of the first durchen edition mark, None if no durchen is found
     """
-    end_noise = ""
-    durchen = re.search("〈〈\S+?〉〉", namsel_text)
-    dmp.Diff_Timeout = 0
-    clean_end = clean_text[-1000:]
-    durchen = re.search("〈〈\S+?〉〉", namsel_text)
+    durchen = DURCHEN_PATTERN.search(namsel_text, start)
     if durchen:
-        durchen_start = durchen.start() - 100
-        nam_end = namsel_text[durchen_start:]
-        end_diffs = dmp.diff_main(nam_end, clean_end)
-        dmp.diff_cleanupSemantic(end_diffs)
-        # print(len(end_diffs))
-        for end_diff in end_diffs:
-            if end_diff[0] == -1:
-                end_noise += end_diff[1]
-        return len(end_noise)
+        window_end = durchen.start()
     else:
-        print("No Durchen found")
-        return 0
+        print("[INFO] No Durchen found")
+        window_end = len(namsel_text)
+    window_start = max(start, window_end - SYNC_WINDOW)
+    window = namsel_text[window_start:window_end]
+    clean_end = clean_text[-SYNC_TEXT_LEN:]
+    anchors = get_anchors(window, clean_end)
+    if not anchors:
+        return window_end, durchen and durchen.start()
+    namsel_pos, clean_pos, length = anchors[-1]
+    namsel_pos, clean_pos = namsel_pos + length, clean_pos + length
+    # ending noise of the namsel text after the clean chars following the last anchor, without
+    # semantic cleanup which would align a final newline of the body with one of the durchen
+    gap = window[namsel_pos : namsel_pos + 2 * (len(clean_end) - clean_pos) + REFINE_SLACK]
+    end_diffs = refine_diffs(gap, clean_end[clean_pos:], cleanup=False)
+    ending_noise = end_diffs[-1][1] if end_diffs and end_diffs[-1][0] == -1 else ""
+    return window_start + namsel_pos + len(gap) - len(ending_noise), durchen and durchen.start()
+
+
+def get_text_spans(namsel_text, clean_texts):
+    """Locate the body and durchen of each text of a namsel volume.
+
+    Args:
+        namsel_text (str): namsel ocr text of the whole volume
+        clean_texts (list): clean etext of each text of the volume, in order
+
+    Returns:
+        (list): TextSpan of each text found, the durchen of a text runs from its body end to
+            the start of the next text or the end of the volume
+    """
+    bodies = []
+    search_from = 0
+    for clean_text in clean_texts:
+        body_start = get_start_sync_point(namsel_text, clean_text, search_from)
+        if body_start is None:
+            print(f"[INFO] Text starting with {clean_text[:20]} not found")
+            continue
+        body_end, durchen_start = get_end_sync_point(namsel_text, clean_text, body_start)
+        bodies.append((body_start, body_end))
+        search_from = durchen_start or body_end
+    durchen_ends = [body_start for body_start, _ in bodies[1:]] + [len(namsel_text)]
+    return [TextSpan(start, end, durchen_end) for (start, end), durchen_end in zip(bodies, durchen_ends)]
 
 
 def get_main_text(namsel_text, clean_text):
@@ -64,19 +137,14 @@ def get_main_text(namsel_text, clean_text):
     Returns:
         (str): body text
     """
-    main_text = ""
-    start_point = get_start_sync_point(namsel_text, basetext)
-    print(start_point)
-    end_point = get_end_sync_point(namsel_text, basetext)
-    print(end_point)
-    main_text = namsel_text[start_point:-end_point]
+    spans = get_text_spans(namsel_text, [clean_text])
+    if not spans:
+        return ""
+    main_text = namsel_text[spans[0].body_start : spans[0].body_end]
     return main_text
 
 
 if __name__ == "__main__":
-    namsel_text = Path("./input/namselORCed_text/v073.txt").read_text()
-    clean_text = Path("./input/body_text/cleantext/v073.txt").read_text()
-    body_text = get_body_text(namsel_text, clean_text)
-    vol_num = 73
-    with open(f"./input/body_text/ocred_text/{vol_num}.txt", "w+") as f:
-        f.write(body_text)
+    namsel_text = Path("./data/v073/body/73N-body.txt").read_text(encoding="utf-8")
+    clean_text = Path("./data/v073/body/73E-body.txt").read_text(encoding="utf-8")
+    print(get_text_spans(namsel_text, [clean_text]))
@@ -3,6 +3,8 @@ from pathlib import Path
 import re
 from horology import timed
 
+from volume import load_volume
+
 @timed(unit="min")
 def split_text(content):
 
@@ -27,32 +29,24 @@ def create_docx(chunks, page_span, path):
 
     p = path.parent / 'docx'
     p.mkdir(parents=True, exist_ok=True)
-    out_path = path.parent / 'docx' / f'{source_path.stem}_{page_span[0]}-{page_span[1]}.docx'
+    out_path = path.parent / 'docx' / f'{path.stem}_{page_span[0]}-{page_span[1]}.docx'
     document.save(str(out_path))
 
 @timed(unit="min")
-def select_span(content, page_span):
-    selection = ''
-    trans = ''.maketrans('abcdefgxyz', '0123456789')
-    start = int(page_span[0].translate(trans))
-    end = int(page_span[1].translate(trans))
-    for line in content.splitlines():
-        if re.search('\[(\d+[abcdefgxyz])\]', line):
-            page = re.search('\[(.+?)\]', line).group(1)
-            current = int(page.translate(trans))
-        else:
-            current = 0
-        if current >= start and current <= end:
-            selection += f'\n\n{line}'
-        elif current > end:
-            break
-    return selection
+def select_volume_span(volume, page_span):
+    """Select the combined text of the folios of page_span from a merged volume, by offset."""
+    span = volume.get_folio_span(*page_span)
+    if span is None:
+        return ''
+    lines = volume.to_combined(*span).splitlines()
+    return ''.join(f'\n\n{line}' for line in lines if line)
 
 if __name__ == "__main__":
     vol = 73
     page_span = ['12a','12a']
-    source_path = Path(f'data/v{vol:03}/{vol}_combined.txt')
-    content = source_path.read_text(encoding='utf-8')
-    selection = select_span(content, page_span)
+    vol_path = Path(f'data/v{vol:03}')
+    source_path = vol_path / f'{vol}_combined.txt'
+    volume = load_volume(vol_path / 'body' / 'result.txt', vol_path / 'footnotes' / 'footnotes.yaml')
+    selection = select_volume_span(volume, page_span)
     chunks = split_text(selection)
     create_docx(chunks, page_span, source_path)
\ No newline at end of file
@@ -1,10 +1,13 @@
 import io
 import json
+import os
 import platform
 import stat
 import subprocess
 import tempfile
+import threading
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 
 import requests
@@ -67,23 +70,129 @@ def get_dmp_exe_path():
     return str(binary_path)
 
 
-class optimized_diff_match_patch:
-    def __init__(self):
+def _write_fd(fd, text):
+    """Write text to a pipe and close it, ignoring a reader that exits early."""
+    try:
+        with os.fdopen(fd, "wb") as pipe:
+            pipe.write(text.encode("utf-8"))
+    except BrokenPipeError:
+        pass
+
+
+class DmpWorkerPool:
+    """Fixed size pool of node-dmp workers.
+
+    Texts are handed to the dmp binary through pipes, so concurrent jobs from threads or processes
+    never share any file. At most `n_workers` dmp processes run at a time per pool.
+    """
+
+    def __init__(self, n_workers=None):
         self.binary_path = get_dmp_exe_path()
+        self.n_workers = n_workers or os.cpu_count() or 1
+        self._slots = threading.BoundedSemaphore(self.n_workers)
+        self._executor = ThreadPoolExecutor(max_workers=self.n_workers)
 
     @staticmethod
     def _save_text(text1, text2):
-        tmpdir = Path(tempfile.gettempdir())
-        text1_path = tmpdir / "text1.txt"
-        text2_path = tmpdir / "text2.txt"
-        text1_path.write_text(text1, encoding="utf-8")
-        text2_path.write_text(text2, encoding="utf-8")
-        return str(text1_path), str(text2_path)
+        """Write texts to unique temp files, used where pipes can't be passed as paths."""
+        paths = []
+        for text in [text1, text2]:
+            fd, path = tempfile.mkstemp(suffix=".txt")
+            _write_fd(fd, text)
+            paths.append(path)
+        return paths
+
+    def _run_with_pipes(self, text1, text2):
+        read1, write1 = os.pipe()
+        read2, write2 = os.pipe()
+        try:
+            process = subprocess.Popen(
+                [str(self.binary_path), "diff", f"/dev/fd/{read1}", f"/dev/fd/{read2}"],
+                stdout=subprocess.PIPE,
+                pass_fds=(read1, read2),
+            )
+        except Exception:
+            for fd in [write1, write2]:
+                os.close(fd)
+            raise
+        finally:
+            os.close(read1)
+            os.close(read2)
+        writers = [
+            threading.Thread(target=_write_fd, args=(write1, text1)),
+            threading.Thread(target=_write_fd, args=(write2, text2)),
+        ]
+        for writer in writers:
+            writer.start()
+        stdout = process.communicate()[0]
+        for writer in writers:
+            writer.join()
+        return process.returncode, stdout
 
-    @staticmethod
-    def _delete_text(text1_path, text2_path):
-        Path(text1_path).unlink()
-        Path(text2_path).unlink()
+    def _run_with_files(self, text1, text2):
+        text1_path, text2_path = self._save_text(text1, text2)
+        try:
+            process = subprocess.Popen(
+                [str(self.binary_path), "diff", text1_path, text2_path], stdout=subprocess.PIPE
+            )
+            stdout = process.communicate()[0]
+        finally:
+            Path(text1_path).unlink()
+            Path(text2_path).unlink()
+        return process.returncode, stdout
+
+    def diff(self, text1, text2):
+        """Compute diff between text1 and text2 on one of the pool workers.
+
+        Args:
+            text1 (str): source text
+            text2 (str): target text
+
+        Returns:
+            list: list of diffs
+        """
+        with self._slots:
+            if "Windows" in PLATFORM_TYPE:
+                returncode, stdout = self._run_with_files(text1, text2)
+            else:
+                returncode, stdout = self._run_with_pipes(text1, text2)
+        if returncode != 0:
+            raise RuntimeError(f"dmp exited with status {returncode}")
+        return json.loads(stdout.decode("utf-8"))
+
+    def map(self, text_pairs):
+        """Diff every (text1, text2) pair on the pool, yielding the diffs in input order."""
+        return self._executor.map(lambda pair: self.diff(*pair), text_pairs)
+
+
+_pools = {}
+_pool_lock = threading.Lock()
+_default_n_workers = None
+
+
+def set_dmp_workers(n_workers):
+    """Set the size of the pools asked for without a size in the current process.
+
+    The pool semaphore only bounds one process, so a process pool running flows gives each
+    worker its share of the cpus to keep the node-dmp processes of all workers within them.
+    """
+    global _default_n_workers
+    _default_n_workers = n_workers
+
+
+def get_dmp_pool(n_workers=None):
+    """Return the worker pool of n_workers shared by the current process, creating it on first use."""
+    n_workers = n_workers or _default_n_workers or os.cpu_count() or 1
+    with _pool_lock:
+        if n_workers not in _pools:
+            _pools[n_workers] = DmpWorkerPool(n_workers)
+    return _pools[n_workers]
+
+
+class optimized_diff_match_patch:
+    def __init__(self, n_workers=None):
+        self.pool = get_dmp_pool(n_workers)
+        self.binary_path = self.pool.binary_path
 
     @staticmethod
     def _unescape_lr(diffs):
@@ -95,12 +204,34 @@ class optimized_diff_match_patch:
                 yield (diff_type, diff_text.replace("\\n", "\n"))
 
     def diff_main(self, text1, text2):
-        text1_path, text2_path = self._save_text(text1, text2)
-        process = subprocess.Popen(
-            [str(self.binary_path), "diff", text1_path, text2_path], stdout=subprocess.PIPE
-        )
-        stdout = process.communicate()[0]
-        diffs = json.loads(stdout, encoding="utf-8")
-        diffs = self._unescape_lr(diffs)
-        self._delete_text(text1_path, text2_path)
-        return diffs
+        diffs = self.pool.diff(text1, text2)
+        return self._unescape_lr(diffs)
+
+
+def get_dmp(backend="node"):
+    """Return a diff engine exposing diff_main for the given backend.
+
+    Args:
+        backend (str): "node" for node-dmp, "python" for google's dmp, "syllable" for the
+            syllable-then-character diff or "anchored" for dmp run between unique anchors
+
+    Returns:
+        obj: diff engine
+    """
+    if backend == "node":
+        return optimized_diff_match_patch()
+    elif backend == "python":
+        from diff_match_patch import diff_match_patch
+
+        dmp = diff_match_patch()
+        dmp.Diff_Timeout = 0  # compute diff till end of file
+        return dmp
+    elif backend == "syllable":
+        from syllable_diff import syllable_diff_match_patch
+
+        return syllable_diff_match_patch()
+    elif backend == "anchored":
+        from anchor_alignment import anchored_diff_match_patch
+
+        return anchored_diff_match_patch()
+    raise ValueError(f"unknown diff backend: {backend}")
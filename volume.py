@@ -0,0 +1,351 @@
+# coding='utf-8'
+
+"""
+Volume document model
+A reconstructed volume held as its plain body text and the annotations on it, instead of one
+string with inline markup parsed again by every stage. The body result is parsed once: the
+pedurma page annotations and the markers are removed from the text and kept as offsets in
+arrays, with the parsed content of each marker. Merge, image links and docx selection work
+on these arrays, and the inline markup is only written back by the to_* serializers.
+"""
+import re
+from array import array
+from bisect import bisect_left, bisect_right
+
+import yaml
+
+from metrics import measured
+
+BODY_ANN_PATTERN = re.compile("<.+?>")
+PAGE_NUM_PATTERN = re.compile(r"<p\d+-(\d+)>")
+FOLIO_PATTERN = re.compile(r"\[(\d+[abcdefgxyz])\]")
+BRACKET_PATTERN = re.compile(r"(\[.+?\])")
+FOLIO_NUMBERS = "".maketrans("abcdefgxyz", "0123456789")
+
+
+def get_page_number(page_ann):
+    """Return the pedurma page number of a page annotation like <p73-12>, None if it has none.
+
+    Numbers of more than 3 digits are ocr noise after the page number, only 3 are kept.
+    """
+    pg_no = PAGE_NUM_PATTERN.search(page_ann)
+    if not pg_no:
+        return None
+    pg_no = pg_no.group(1)
+    return int(pg_no[:3] if len(pg_no) > 3 else pg_no)
+
+
+def get_footnotes_page_number(page_key):
+    """Return the pedurma page number of a footnotes page key like 012-r༡༢, None if it has none."""
+    pg_no = page_key.split("-")[0]
+    return int(pg_no) if pg_no.isdigit() else None
+
+
+def get_image_link(page_ann, image_info):
+    """Return the link of the source image of a pedurma page.
+
+    Args:
+        page_ann (str): pedurma page annotation like <p73-12>
+        image_info (list): contains work_id, volume number and image source offset
+
+    Returns:
+        str: image link, None if page_ann has no page number
+    """
+    pg_no = get_page_number(page_ann)
+    if pg_no is None:
+        return None
+    work, vol, offset = image_info
+    pref = f"I{work[1:-3]}"
+    igroup = f"{pref}{783+vol}" if work == "W1PD96682" else f"{pref}{845+vol}"
+    pg_no += offset
+    return f"[https://www.tbrc.org/browser/ImageService?work={work}&igroup={igroup}&image={pg_no}&first=1&last=2000&fetchimg=yes]"
+
+
+def parse_footnote(foot_note):
+    """Split a footnote like '<1,1,①>note' into its incremental number, its value and its note."""
+    footnotes_parts = foot_note.split(">")
+    footnotes_incremental = footnotes_parts[0].split(",")[0][1:]
+    footnotes_value = footnotes_parts[0].split(",")[1]
+    note = footnotes_parts[1]
+    return footnotes_incremental, footnotes_value, note
+
+
+def get_folio_number(folio):
+    return int(folio.translate(FOLIO_NUMBERS))
+
+
+class Volume:
+    """Body text of a volume with its pages, markers and merged footnotes.
+
+    A marker or a page annotation at an offset comes before the char of the text at that
+    offset. Page i runs from the end of page i - 1 to page_ends[i], where its annotation is.
+
+    Attributes:
+        text (str): body text without page annotations and markers
+        pages (list): pedurma page annotation of each page, like <p73-12>
+        page_ends (array): offset of each page annotation in text
+        markers (list): content of each marker, like 2,2,②
+        marker_offsets (array): offset of each marker in text
+        marker_pages (array): page of each marker
+        page_keys (list): key of the footnotes page joined to each page, None if it has none
+        notes (list): (incremental number, value, note) of the footnote of each marker, None
+            if it has none
+        merge_report (list): pages and notes which could not be merged, as dicts
+    """
+
+    def __init__(self, text="", pages=None, page_ends=None, markers=None, marker_offsets=None, marker_pages=None):
+        self.text = text
+        self.pages = pages or []
+        self.page_ends = page_ends or array("Q")
+        self.markers = markers or []
+        self.marker_offsets = marker_offsets or array("Q")
+        self.marker_pages = marker_pages or array("I")
+        self.page_keys = [None] * len(self.pages)
+        self.notes = [None] * len(self.markers)
+        self.merge_report = []
+        self._folios = None
+
+    @classmethod
+    def from_body(cls, body_text):
+        """Parse the annotations of a body result in a single scan.
+
+        Args:
+            body_text (str): reformatted body with <p73-12> page annotations and <1,…> markers
+
+        Returns:
+            Volume: the parsed volume
+        """
+        chunks = []
+        text_len = 0
+        walker = 0
+        pages, page_ends = [], array("Q")
+        markers, marker_offsets, marker_pages = [], array("Q"), array("I")
+        for ann in BODY_ANN_PATTERN.finditer(body_text):
+            chunk = body_text[walker : ann.start()]
+            chunks.append(chunk)
+            text_len += len(chunk)
+            walker = ann.end()
+            if ann[0].startswith("<p"):
+                pages.append(ann[0])
+                page_ends.append(text_len)
+            else:
+                markers.append(ann[0][1:-1])
+                marker_offsets.append(text_len)
+                marker_pages.append(len(pages))
+        chunks.append(body_text[walker:])
+        return cls("".join(chunks), pages, page_ends, markers, marker_offsets, marker_pages)
+
+    def get_page_span(self, page):
+        """Return the (start, end) offsets of a page in text, page len(pages) is the text after the last one."""
+        start = self.page_ends[page - 1] if page else 0
+        return start, self.page_ends[page] if page < len(self.pages) else len(self.text)
+
+    def get_page_markers(self, page):
+        """Return the range of the markers of a page."""
+        return range(bisect_left(self.marker_pages, page), bisect_right(self.marker_pages, page))
+
+    def merge_footnotes(self, footnotes):
+        """Merge the footnotes of each page on the markers of the page, in order.
+
+        Footnotes pages are joined to the body pages by page number, so a page missing on
+        either side only leaves that page without notes. Mismatches are listed in merge_report.
+
+        Args:
+            footnotes (list): footnotes of each page as made by postprocess_footnotes, the page
+                key followed by the notes
+        """
+        self.page_keys = [None] * len(self.pages)
+        self.notes = [None] * len(self.markers)
+        self.merge_report = []
+        footnotes_index = {}
+        for page_footnotes in footnotes:
+            pg_no = get_footnotes_page_number(page_footnotes[0]) if page_footnotes else None
+            if pg_no in footnotes_index:
+                self.merge_report.append({"page": pg_no, "issue": "duplicate footnotes page", "key": page_footnotes[0]})
+            elif pg_no is None:
+                self.merge_report.append({"page": None, "issue": "footnotes page without number", "footnotes": page_footnotes})
+            else:
+                footnotes_index[pg_no] = page_footnotes
+        for page, page_ann in enumerate(self.pages):
+            pg_no = get_page_number(page_ann)
+            page_footnotes = footnotes_index.pop(pg_no, None)
+            if page_footnotes is None:
+                self.merge_report.append({"page": pg_no, "issue": "no footnotes page", "page_ann": page_ann})
+                continue
+            self.page_keys[page] = page_footnotes[0]
+            self.merge_page_footnotes(page, pg_no, page_footnotes[1:])
+        for pg_no, page_footnotes in footnotes_index.items():
+            self.merge_report.append({"page": pg_no, "issue": "no body page", "key": page_footnotes[0]})
+
+    def merge_page_footnotes(self, page, pg_no, page_notes):
+        """Merge the notes of a page on its markers, in order."""
+        markers = self.get_page_markers(page)
+        if len(markers) != len(page_notes):
+            self.merge_report.append(
+                {"page": pg_no, "issue": "marker count", "markers": len(markers), "notes": len(page_notes)}
+            )
+        for marker, foot_note in zip(markers, page_notes):
+            if "," not in self.markers[marker]:
+                self.merge_report.append({"page": pg_no, "issue": "marker without value", "marker": self.markers[marker]})
+                continue
+            try:
+                self.notes[marker] = parse_footnote(foot_note)
+            except IndexError:
+                self.merge_report.append({"page": pg_no, "issue": "note without marker", "note": foot_note})
+
+    def iter_page(self, page, with_marker=True):
+        """Yield the text and the markers of a page in order.
+
+        Args:
+            page (int): page index
+            with_marker (bool): write merged markers with the body and footnote markers, or
+                only with the note
+
+        Yields:
+            str: text chunk or marker
+        """
+        walker, page_end = self.get_page_span(page)
+        for marker in self.get_page_markers(page):
+            offset = self.marker_offsets[marker]
+            yield self.text[walker:offset]
+            walker = offset
+            yield self.format_marker(marker, with_marker)
+        yield self.text[walker:page_end]
+
+    def format_marker(self, marker, with_marker=True):
+        content = self.markers[marker]
+        if self.notes[marker] is None:
+            return f"<{content}>"
+        footnotes_incremental, footnotes_value, note = self.notes[marker]
+        if not with_marker:
+            return f"<{note}>"
+        body_incremental, body_value = content.split(",")[:2]
+        return f"<{body_incremental},{body_value};{footnotes_incremental},{footnotes_value},{note}>"
+
+    def to_body(self):
+        """Serialize the volume back to the body result markup."""
+        chunks = []
+        for page in range(len(self.pages) + 1):
+            chunks += self.iter_page(page)
+            chunks.append(self.pages[page] if page < len(self.pages) else "")
+        return "".join(chunks)
+
+    def to_combined_marker(self, image_info=None):
+        """Serialize the volume with its merged markers, the page key of the footnotes and the page annotations.
+
+        Args:
+            image_info (list): contains work_id, volume number and image source offset, the
+                link of the source image is added after the line of each page annotation if given
+
+        Returns:
+            str: combined text with markers
+        """
+        chunks = []
+        page_ann_ends = []
+        for page, page_ann in enumerate(self.pages):
+            chunks += self.iter_page(page)
+            if self.page_keys[page]:
+                chunks.append(f"/{self.page_keys[page]}/")
+            chunks.append(page_ann)
+            page_ann_ends.append((len(chunks), page_ann))
+        if image_info is None:
+            return "".join(chunks)
+        return self.add_links(chunks, page_ann_ends, image_info)
+
+    def add_links(self, chunks, page_ann_ends, image_info):
+        """Add the image link of the first page annotation of a line after that line."""
+        result = []
+        walker = 0
+        linked = False  # whether the current line already has its link
+        for chunk_end, page_ann in page_ann_ends + [(len(chunks), None)]:
+            for chunk in chunks[walker:chunk_end]:
+                while "\n" in chunk and linked:
+                    line_end, chunk = chunk.split("\n", 1)
+                    result.append(f"{line_end}\n{linked}\n")
+                    linked = False
+                result.append(chunk)
+            walker = chunk_end
+            if page_ann and not linked:
+                linked = get_image_link(page_ann, image_info) or False
+        text = "".join(result)
+        if linked:
+            text += f"\n{linked}"
+        if text and not text.endswith("\n"):
+            text += "\n"
+        return text
+
+    def to_combined(self, start=0, end=None):
+        """Serialize the volume with the notes in place of the markers, a line per folio.
+
+        Args:
+            start (int): offset in text of the first char
+            end (int): offset in text after the last char, the end of text by default
+
+        Returns:
+            str: combined text
+        """
+        end = len(self.text) + 1 if end is None else end  # with the markers after the last char
+        chunks = []
+        for page in range(len(self.pages)):
+            page_start, page_end = self.get_page_span(page)
+            if page_end < start or page_start >= end:
+                continue
+            walker = max(page_start, start)
+            for marker in self.get_page_markers(page):
+                offset = self.marker_offsets[marker]
+                if not start <= offset < end:
+                    continue
+                chunks.append(self.text[walker:offset])
+                walker = offset
+                chunks.append(self.format_marker(marker, with_marker=False))
+            chunks.append(self.text[walker : min(page_end, end)])
+        combined = "".join(chunks).replace("\n", "")
+        return BRACKET_PATTERN.sub(r"\n\1", combined)
+
+    def get_folios(self):
+        """Return the (name, offset) of each folio annotation like [12a] of the text."""
+        if self._folios is None:
+            self._folios = [(folio.group(1), folio.start()) for folio in FOLIO_PATTERN.finditer(self.text)]
+        return self._folios
+
+    def get_folio_span(self, start_folio, end_folio):
+        """Return the (start, end) offsets in text of the folios from start_folio to end_folio.
+
+        Args:
+            start_folio (str): first folio like 12a
+            end_folio (str): last folio
+
+        Returns:
+            tuple: offsets, None if no folio is in the span
+        """
+        first, last = get_folio_number(start_folio), get_folio_number(end_folio)
+        span_start = None
+        for folio, offset in self.get_folios():
+            number = get_folio_number(folio)
+            if span_start is None and first <= number <= last:
+                span_start = offset
+            elif span_start is not None and number > last:
+                return span_start, offset
+        if span_start is None:
+            return None
+        return span_start, len(self.text)
+
+
+@measured(count=lambda volume, *args: {"pages": len(volume.pages), "markers": len(volume.markers)})
+def load_volume(body_text_path, footnote_yaml_path):
+    """Parse the body result of a volume once and merge its footnotes on it.
+
+    Args:
+        body_text_path (obj): body text path path object
+        footnote_yaml_path (obj): footnote yaml path object
+
+    Returns:
+        Volume: volume with its footnotes merged
+    """
+    volume = Volume.from_body(body_text_path.read_text(encoding="utf-8"))
+    footnotes = list(yaml.safe_load(footnote_yaml_path.read_text(encoding="utf-8")))
+    print(f"Page found {len(volume.pages)} Footnotes page found {len(footnotes)}")
+    volume.merge_footnotes(footnotes)
+    if volume.merge_report:
+        print(f"[INFO] {len(volume.merge_report)} pages or notes not merged, see merge_report.yaml")
+    return volume
@@ -0,0 +1,307 @@
+# coding='utf-8'
+
+"""
+SQLite reconstruction store
+Optional store of the reconstructed volumes of a collection in one sqlite database, written
+by flow and merge_volume next to the text outputs. Pages, body markers, footnotes and the
+edition variants of the notes are indexed by volume, page and marker number, notes and
+edition names are interned as integer ids. A page with its notes is read with a few indexed
+queries, without loading or parsing the volume.
+"""
+import re
+import sqlite3
+from pathlib import Path
+
+from volume import Volume, get_footnotes_page_number, get_page_number, parse_footnote
+
+VARIANT_PATTERN = re.compile("((?:«[^«»]+»)+)([^«]*)")
+EDITION_PATTERN = re.compile("«([^«»]+)»")
+MARKERS_QUERY = (
+    "SELECT offset, content, footnote_num, footnote_value, note_id, note FROM markers"
+    " LEFT JOIN notes ON notes.id = markers.note_id"
+)
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS volumes (
+    id INTEGER PRIMARY KEY, work_id TEXT NOT NULL, vol_num INTEGER NOT NULL, UNIQUE (work_id, vol_num)
+);
+CREATE TABLE IF NOT EXISTS pages (
+    volume_id INTEGER NOT NULL, page_index INTEGER NOT NULL, page_num INTEGER, page_ann TEXT,
+    footnotes_key TEXT, start INTEGER NOT NULL, end INTEGER NOT NULL, text TEXT NOT NULL,
+    PRIMARY KEY (volume_id, page_index)
+);
+CREATE INDEX IF NOT EXISTS pages_num ON pages (volume_id, page_num);
+CREATE INDEX IF NOT EXISTS pages_start ON pages (volume_id, start);
+CREATE TABLE IF NOT EXISTS folios (
+    volume_id INTEGER NOT NULL, folio TEXT NOT NULL, start INTEGER NOT NULL, end INTEGER NOT NULL,
+    PRIMARY KEY (volume_id, folio)
+);
+CREATE TABLE IF NOT EXISTS markers (
+    volume_id INTEGER NOT NULL, page_index INTEGER NOT NULL, marker_num INTEGER NOT NULL,
+    offset INTEGER NOT NULL, content TEXT NOT NULL, footnote_num TEXT, footnote_value TEXT, note_id INTEGER,
+    PRIMARY KEY (volume_id, page_index, marker_num)
+);
+CREATE INDEX IF NOT EXISTS markers_offset ON markers (volume_id, offset);
+CREATE INDEX IF NOT EXISTS markers_note ON markers (note_id);
+CREATE TABLE IF NOT EXISTS footnotes (
+    volume_id INTEGER NOT NULL, page_num INTEGER, footnotes_key TEXT NOT NULL, note_index INTEGER NOT NULL,
+    footnote_num TEXT, footnote_value TEXT, note_id INTEGER NOT NULL,
+    PRIMARY KEY (volume_id, footnotes_key, note_index)
+);
+CREATE INDEX IF NOT EXISTS footnotes_num ON footnotes (volume_id, page_num, note_index);
+CREATE INDEX IF NOT EXISTS footnotes_note ON footnotes (note_id);
+CREATE TABLE IF NOT EXISTS notes (id INTEGER PRIMARY KEY, note TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS editions (id INTEGER PRIMARY KEY, name TEXT NOT NULL UNIQUE);
+CREATE TABLE IF NOT EXISTS variants (
+    note_id INTEGER NOT NULL, variant_index INTEGER NOT NULL, edition_id INTEGER NOT NULL, reading TEXT NOT NULL,
+    PRIMARY KEY (note_id, variant_index, edition_id)
+);
+CREATE INDEX IF NOT EXISTS variants_edition ON variants (edition_id);
+"""
+
+
+def get_variants(note):
+    """Split a note into its variant readings and the editions giving them.
+
+    Args:
+        note (str): note like «གཡུང་»«ལི་»-པ།
+
+    Returns:
+        list: (edition names, reading) of each variant
+    """
+    return [(EDITION_PATTERN.findall(editions), reading) for editions, reading in VARIANT_PATTERN.findall(note)]
+
+
+class VolumeStore:
+    """Reconstructed volumes of a collection in a sqlite database.
+
+    Args:
+        path (path): database path, created with its tables if needed
+    """
+
+    def __init__(self, path):
+        self.path = Path(path)
+        # volumes run in parallel by batch.py write to the same database
+        self.conn = sqlite3.connect(str(self.path), timeout=60)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.executescript(SCHEMA)
+        self._note_ids = {}
+        self._edition_ids = {}
+
+    def close(self):
+        self.conn.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def get_volume_id(self, work_id, vol_num):
+        self.conn.execute("INSERT OR IGNORE INTO volumes (work_id, vol_num) VALUES (?, ?)", (work_id, vol_num))
+        return self.conn.execute(
+            "SELECT id FROM volumes WHERE work_id = ? AND vol_num = ?", (work_id, vol_num)
+        ).fetchone()[0]
+
+    def _intern(self, table, column, value, ids):
+        if value not in ids:
+            self.conn.execute(f"INSERT OR IGNORE INTO {table} ({column}) VALUES (?)", (value,))
+            ids[value] = self.conn.execute(f"SELECT id FROM {table} WHERE {column} = ?", (value,)).fetchone()[0]
+        return ids[value]
+
+    def get_note_id(self, note):
+        """Return the id of a note, storing it with its edition variants the first time it is seen."""
+        if note in self._note_ids:
+            return self._note_ids[note]
+        known = self.conn.execute("SELECT id FROM notes WHERE note = ?", (note,)).fetchone()
+        note_id = self._intern("notes", "note", note, self._note_ids)
+        if known is None:
+            variants = []
+            for variant_index, (editions, reading) in enumerate(get_variants(note)):
+                for edition in editions:
+                    edition_id = self._intern("editions", "name", edition, self._edition_ids)
+                    variants.append((note_id, variant_index, edition_id, reading))
+            self.conn.executemany("INSERT OR IGNORE INTO variants VALUES (?, ?, ?, ?)", variants)
+        return note_id
+
+    def _get_note_ids(self, table, volume_id):
+        """Return the ids of the notes used by a volume in the markers or footnotes table.
+
+        Notes interned by another process may have been pruned since, so the note id cache is
+        also cleared here, once the write transaction holds the database.
+        """
+        self._note_ids = {}
+        return [
+            note_id
+            for (note_id,) in self.conn.execute(
+                f"SELECT DISTINCT note_id FROM {table} WHERE volume_id = ? AND note_id IS NOT NULL", (volume_id,)
+            )
+        ]
+
+    def _prune_notes(self, note_ids):
+        """Delete the notes among note_ids no longer used by any marker or footnote, with their variants."""
+        self.conn.executemany(
+            "DELETE FROM notes WHERE id = ? AND NOT EXISTS (SELECT 1 FROM markers WHERE note_id = ?)"
+            " AND NOT EXISTS (SELECT 1 FROM footnotes WHERE note_id = ?)",
+            [(note_id, note_id, note_id) for note_id in note_ids],
+        )
+        self.conn.executemany(
+            "DELETE FROM variants WHERE note_id = ? AND NOT EXISTS (SELECT 1 FROM notes WHERE id = ?)",
+            [(note_id, note_id) for note_id in note_ids],
+        )
+        self._note_ids = {}
+
+    def write_body(self, volume, image_info):
+        """Replace the pages, folios and markers of a volume, with their notes if merged.
+
+        Args:
+            volume (Volume): parsed body, merged with its footnotes or not
+            image_info (list): contains work_id, volume number and image source offset
+        """
+        with self.conn:
+            volume_id = self.get_volume_id(*image_info[:2])
+            old_note_ids = self._get_note_ids("markers", volume_id)
+            for table in ["pages", "folios", "markers"]:
+                self.conn.execute(f"DELETE FROM {table} WHERE volume_id = ?", (volume_id,))
+            pages = []
+            markers = []
+            for page, page_ann in enumerate(volume.pages + [None]):
+                start, end = volume.get_page_span(page)
+                page_key = volume.page_keys[page] if page_ann else None
+                page_num = get_page_number(page_ann) if page_ann else None
+                pages.append((volume_id, page, page_num, page_ann, page_key, start, end, volume.text[start:end]))
+                for marker_num, marker in enumerate(volume.get_page_markers(page), 1):
+                    footnote_num = footnote_value = note_id = None
+                    if volume.notes[marker] is not None:
+                        footnote_num, footnote_value, note = volume.notes[marker]
+                        note_id = self.get_note_id(note)
+                    offset = volume.marker_offsets[marker]
+                    markers.append(
+                        (volume_id, page, marker_num, offset, volume.markers[marker], footnote_num, footnote_value, note_id)
+                    )
+            self.conn.executemany("INSERT INTO pages VALUES (?, ?, ?, ?, ?, ?, ?, ?)", pages)
+            self.conn.executemany("INSERT INTO markers VALUES (?, ?, ?, ?, ?, ?, ?, ?)", markers)
+            folios = volume.get_folios()
+            ends = [offset for _, offset in folios[1:]] + [len(volume.text)]
+            self.conn.executemany(
+                "INSERT OR IGNORE INTO folios VALUES (?, ?, ?, ?)",
+                [(volume_id, folio, start, end) for (folio, start), end in zip(folios, ends)],
+            )
+            self._prune_notes(old_note_ids)
+
+    def write_footnotes(self, footnotes, image_info):
+        """Replace the footnotes of a volume.
+
+        Args:
+            footnotes (list): footnotes of each page as made by postprocess_footnotes
+            image_info (list): contains work_id, volume number and image source offset
+        """
+        with self.conn:
+            volume_id = self.get_volume_id(*image_info[:2])
+            old_note_ids = self._get_note_ids("footnotes", volume_id)
+            self.conn.execute("DELETE FROM footnotes WHERE volume_id = ?", (volume_id,))
+            rows = []
+            for page_footnotes in footnotes:
+                if not page_footnotes:
+                    continue
+                page_key = page_footnotes[0]
+                page_num = get_footnotes_page_number(page_key)
+                for note_index, foot_note in enumerate(page_footnotes[1:], 1):
+                    try:
+                        footnote_num, footnote_value, note = parse_footnote(foot_note)
+                    except IndexError:
+                        footnote_num = footnote_value = None
+                        note = foot_note
+                    rows.append(
+                        (volume_id, page_num, page_key, note_index, footnote_num, footnote_value, self.get_note_id(note))
+                    )
+            self.conn.executemany("INSERT OR IGNORE INTO footnotes VALUES (?, ?, ?, ?, ?, ?, ?)", rows)
+            self._prune_notes(old_note_ids)
+
+    def get_page(self, work_id, vol_num, page):
+        """Fetch a page of a volume with its markers and their notes.
+
+        Args:
+            work_id (str): kangyur W1PD96682 or tengyur W1PD95844
+            vol_num (int): volume number
+            page (int or str): pedurma page number like 12 or folio like 12a
+
+        Returns:
+            dict: text of the page, and each marker with its offset in that text, its content,
+                its note and the editions of the note, None if the page is not found
+        """
+        volume = self.conn.execute(
+            "SELECT id FROM volumes WHERE work_id = ? AND vol_num = ?", (work_id, vol_num)
+        ).fetchone()
+        if volume is None:
+            return None
+        volume_id = volume[0]
+        if isinstance(page, str):
+            span = self.conn.execute(
+                "SELECT start, end FROM folios WHERE volume_id = ? AND folio = ?", (volume_id, page)
+            ).fetchone()
+            if span is None:
+                return None
+            start, end = span
+            chunks = [
+                text[max(start - page_start, 0) : end - page_start]
+                for page_start, text in self.conn.execute(
+                    "SELECT start, text FROM pages WHERE volume_id = ? AND start < ? AND end > ? ORDER BY page_index",
+                    (volume_id, end, start),
+                )
+            ]
+            rows = self.conn.execute(
+                MARKERS_QUERY + " WHERE volume_id = ? AND offset >= ? AND offset < ? ORDER BY page_index, marker_num",
+                (volume_id, start, end),
+            ).fetchall()
+        else:
+            row = self.conn.execute(
+                "SELECT page_index, start, text FROM pages WHERE volume_id = ? AND page_num = ?", (volume_id, page)
+            ).fetchone()
+            if row is None:
+                return None
+            page_index, start, text = row
+            chunks = [text]
+            rows = self.conn.execute(
+                MARKERS_QUERY + " WHERE volume_id = ? AND page_index = ? ORDER BY marker_num", (volume_id, page_index)
+            ).fetchall()
+        editions = self.get_editions([row[4] for row in rows if row[4] is not None])
+        markers = []
+        for offset, content, footnote_num, footnote_value, note_id, note in rows:
+            markers.append(
+                {
+                    "offset": offset - start,
+                    "marker": content,
+                    "footnote": None if note_id is None else f"{footnote_num},{footnote_value}",
+                    "note": note,
+                    "editions": editions.get(note_id, []),
+                }
+            )
+        return {"text": "".join(chunks), "markers": markers}
+
+    def get_editions(self, note_ids):
+        """Return the names of the editions of the variants of each note, fetched in one query.
+
+        Args:
+            note_ids (list): note ids
+
+        Returns:
+            dict: note id mapped to its edition names in variant order
+        """
+        editions = {}
+        note_ids = sorted(set(note_ids))
+        if not note_ids:
+            return editions
+        query = (
+            "SELECT note_id, name FROM variants JOIN editions ON editions.id = variants.edition_id"
+            f" WHERE note_id IN ({', '.join('?' * len(note_ids))}) ORDER BY note_id, variant_index"
+        )
+        for note_id, name in self.conn.execute(query, note_ids):
+            editions.setdefault(note_id, []).append(name)
+        return editions
+
+
+def write_body_result(store_path, body_text, image_info):
+    """Store the body result written by flow, before its footnotes are merged."""
+    with VolumeStore(store_path) as store:
+        store.write_body(Volume.from_body(body_text), image_info)